@@ -2,11 +2,16 @@
 AI API endpoints for demand forecasting and email generation
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict, Any
 from loguru import logger
 from app.services.ai_service import ai_service
+from app.services.ai_scheduler import ai_scheduler
+from app.services.llm_cache import llm_cache
 from app.services.forecast_service import forecast_service
+from app.services.job_queue import job_queue
 from app.api.auth import get_current_user
 from app.database import auth_db
 
@@ -22,7 +27,10 @@ async def get_ai_health():
             "status": "healthy" if health_status else "unhealthy",
             "ai_service": "operational" if health_status else "error",
             "model": ai_service.model_name,
-            "message": "AI service is working correctly" if health_status else "AI service error"
+            "message": "AI service is working correctly" if health_status else "AI service error",
+            "http_client": ai_service.http_stats(),
+            "scheduler": ai_scheduler.stats(),
+            "response_cache": llm_cache.stats()
         }
     except Exception as e:
         logger.error(f"AI health check failed: {e}")
@@ -30,7 +38,10 @@ async def get_ai_health():
             "status": "unhealthy",
             "ai_service": "error",
             "model": ai_service.model_name,
-            "message": f"AI service error: {str(e)}"
+            "message": f"AI service error: {str(e)}",
+            "http_client": ai_service.http_stats(),
+            "scheduler": ai_scheduler.stats(),
+            "response_cache": llm_cache.stats()
         }
 
 
@@ -39,12 +50,14 @@ async def get_demand_forecast(
     forecast_period: str = Query("30d", description="Forecast period (7d, 30d, 90d, 6m, 1y)"),
     category_filter: Optional[str] = Query(None, description="Category filter"),
     force_regenerate: bool = Query(False, description="Force regeneration of forecast"),
+    engine: Optional[str] = Query(None, pattern="^(ai|statistical)$", description="Forecast engine (defaults to FORECAST_ENGINE)"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
     Get AI-powered demand forecast with caching
     
     - Uses cached forecast for the day unless force_regenerate=True
+    - engine=statistical forecasts every item from transaction history instead of asking the LLM
     - Returns comprehensive forecast data with charts and insights
     - Includes stock alerts and immediate actions
     """
@@ -55,38 +68,78 @@ async def get_demand_forecast(
         if not organization_id:
             raise HTTPException(status_code=400, detail="User organization not found")
         
-        # Get or create forecast using the forecast service
-        forecast_data = await forecast_service.get_or_create_forecast(
+        # Get or create forecast using the forecast service (JSON text, sent without re-serializing)
+        forecast_json = await forecast_service.get_forecast_json(
             organization_id=organization_id,
             forecast_period=forecast_period,
             category_filter=category_filter,
-            force_regenerate=force_regenerate
+            force_regenerate=force_regenerate,
+            engine=engine
         )
         
-        if not forecast_data:
-            raise HTTPException(status_code=500, detail="Failed to generate forecast")
-        
-        # Log the forecast generation
-        logger.info(f"Generated demand forecast for {len(forecast_data.get('forecasts', []))} items")
-        
-        return forecast_data
+        return Response(content=forecast_json, media_type="application/json")
         
     except Exception as e:
         logger.error(f"Error in demand forecast API: {e}")
         raise HTTPException(status_code=500, detail=f"Forecast generation failed: {str(e)}")
 
 
-@router.post("/forecast/regenerate")
+@router.get("/forecast/demand/stream")
+async def stream_demand_forecast(
+    forecast_period: str = Query("30d", description="Forecast period (7d, 30d, 90d, 6m, 1y)"),
+    category_filter: Optional[str] = Query(None, description="Category filter"),
+    force_regenerate: bool = Query(False, description="Force regeneration of forecast"),
+    engine: Optional[str] = Query(None, pattern="^(ai|statistical)$", description="Forecast engine (defaults to FORECAST_ENGINE)"),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson or sse"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Stream the demand forecast item by item
+    
+    - Each forecast item is sent as soon as the model has produced it
+    - The last event ("complete") carries the full forecast, as returned by /forecast/demand
+    - format=ndjson sends one JSON event per line; format=sse sends server-sent events
+    """
+    organization_id = current_user.get('organization_id')
+    
+    if not organization_id:
+        raise HTTPException(status_code=400, detail="User organization not found")
+    
+    async def events():
+        async for event in forecast_service.stream_forecast(
+            organization_id=organization_id,
+            forecast_period=forecast_period,
+            category_filter=category_filter,
+            force_regenerate=force_regenerate,
+            engine=engine
+        ):
+            if format == "sse":
+                yield f"event: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+            else:
+                yield json.dumps(event) + "\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream" if format == "sse" else "application/x-ndjson",
+        # Keep proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/forecast/regenerate", status_code=202)
 async def regenerate_forecast(
     forecast_period: str = Query("30d", description="Forecast period"),
     category_filter: Optional[str] = Query(None, description="Category filter"),
+    engine: Optional[str] = Query(None, pattern="^(ai|statistical)$", description="Forecast engine (defaults to FORECAST_ENGINE)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
     Force regeneration of demand forecast
     
-    - Always generates a new forecast regardless of existing cache
-    - Useful for testing or when new data is available
+    - Queues a background job that generates a new forecast regardless of existing cache
+    - Returns the job at once; poll /api/jobs/{job_id} and re-read /forecast/demand when it has succeeded
+    - Repeated requests for the same forecast while one is queued or running return that job
     """
     try:
         organization_id = current_user.get('organization_id')
@@ -94,24 +147,33 @@ async def regenerate_forecast(
         if not organization_id:
             raise HTTPException(status_code=400, detail="User organization not found")
         
-        # Force regeneration
-        forecast_data = await forecast_service.get_or_create_forecast(
-            organization_id=organization_id,
-            forecast_period=forecast_period,
-            category_filter=category_filter,
-            force_regenerate=True
-        )
-        
-        if not forecast_data:
-            raise HTTPException(status_code=500, detail="Failed to regenerate forecast")
+        # Keys are global in the queue; namespace a client's key by organization so another
+        # tenant sending the same key cannot pick up (or suppress) this one
+        if idempotency_key:
+            idempotency_key = f"forecast.regenerate:{organization_id}:{idempotency_key}"
         
-        logger.info(f"Regenerated demand forecast for {len(forecast_data.get('forecasts', []))} items")
+        job = await job_queue.enqueue(
+            "forecast.regenerate",
+            {
+                "organization_id": organization_id,
+                "forecast_period": forecast_period,
+                "category_filter": category_filter,
+                "engine": engine
+            },
+            priority=5,
+            idempotency_key=idempotency_key or f"forecast.regenerate:{organization_id}:{forecast_period}:{category_filter or 'all'}:{engine or 'default'}",
+            organization_id=organization_id
+        )
         
         return {
-            "message": "Forecast regenerated successfully",
-            "forecast": forecast_data
+            "message": "Forecast regeneration queued",
+            "job_id": job['id'],
+            "status": job['status'],
+            "status_url": f"/api/jobs/{job['id']}"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in forecast regeneration API: {e}")
         raise HTTPException(status_code=500, detail=f"Forecast regeneration failed: {str(e)}")
@@ -153,11 +215,15 @@ async def get_forecast_history(
 async def generate_bid_request_email(
     bid_request: Dict[str, Any],
     supplier: Dict[str, Any],
+    force_regenerate: bool = Query(False, description="Bypass the AI response cache"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Generate bid request email using AI"""
     try:
-        email_content = await ai_service.generate_bid_request_email(bid_request, supplier)
+        email_content = await ai_service.generate_bid_request_email(
+            bid_request, supplier, organization_id=current_user.get('organization_id'),
+            force_regenerate=force_regenerate
+        )
         
         # Create audit log
         await auth_db.create_audit_log(
@@ -181,11 +247,15 @@ async def generate_bid_request_email(
 async def parse_supplier_response(
     email_content: str,
     bid_request_id: str,
+    force_regenerate: bool = Query(False, description="Bypass the AI response cache"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Parse supplier response email using AI"""
     try:
-        parsed_response = await ai_service.parse_supplier_response(email_content, bid_request_id)
+        parsed_response = await ai_service.parse_supplier_response(
+            email_content, bid_request_id, organization_id=current_user.get('organization_id'),
+            force_regenerate=force_regenerate
+        )
         
         # Create audit log
         await auth_db.create_audit_log(
@@ -5,7 +5,7 @@ Handles login, signup, token refresh, logout, and user management.
 
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Dict, Any
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Request, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from loguru import logger
 
@@ -20,6 +20,9 @@ from app.models.auth import (
     TokenData, AuditLogCreate
 )
 from app.services.auth_service import auth_service
+from app.services.exports import export_response
+from app.services.user_cache import user_cache
+from app.services.activity_batcher import activity_batcher
 
 # Create router
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
@@ -47,14 +50,17 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        # Get user from database
-        user = await auth_db.get_user_by_id(token_data.user_id)
+        # Get user from cache, falling back to the database
+        user = user_cache.get(token_data.user_id, token_data.issued_at)
         if user is None:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="User not found",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
+            user = await auth_db.get_user_by_id(token_data.user_id)
+            if user is None:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found",
+                    headers={"WWW-Authenticate": "Bearer"},
+                )
+            user_cache.set(token_data.user_id, token_data.issued_at, user)
         
         # Check if user is active
         if user.get('status') != UserStatus.ACTIVE.value:
@@ -64,8 +70,8 @@ async def get_current_user(
                 headers={"WWW-Authenticate": "Bearer"},
             )
         
-        # Update last activity
-        await auth_db.update_user_login_info(user['id'], last_login=datetime.now(timezone.utc))
+        # Record last activity (written in batches by the activity batcher)
+        activity_batcher.touch_user(user['id'])
         
         # Add token data to user
         user['token_data'] = token_data
@@ -88,7 +94,7 @@ async def get_current_active_user(
     """Get current active user (convenience dependency)"""
     return current_user
 
-async def require_role(required_role: UserRole):
+def require_role(required_role: UserRole):
     """Dependency factory for role-based access control"""
     async def role_checker(current_user: Dict[str, Any] = Depends(get_current_user)):
         user_role = UserRole(current_user.get('role'))
@@ -100,7 +106,7 @@ async def require_role(required_role: UserRole):
         return current_user
     return role_checker
 
-async def require_permission(permission: str):
+def require_permission(permission: str):
     """Dependency factory for permission-based access control"""
     async def permission_checker(current_user: Dict[str, Any] = Depends(get_current_user)):
         token_data = current_user.get('token_data')
@@ -560,6 +566,53 @@ async def change_password(
             detail="Password change failed"
         )
 
+# =====================================================
+# AUDIT LOG ENDPOINTS
+# =====================================================
+
+@router.get("/audit-log/export")
+async def export_audit_log(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False, description="Compress the download (.gz)"),
+    user_id: Optional[str] = Query(None),
+    action: Optional[str] = Query(None),
+    resource_type: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None, description="Only entries at or after this time"),
+    end_date: Optional[datetime] = Query(None, description="Only entries at or before this time"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Download the organization's audit log, oldest first (streamed, no page limit)
+    
+    Hospital administrators and auditors only
+    """
+    user_role = UserRole(current_user.get('role'))
+    if user_role != UserRole.AUDITOR and not auth_service.check_role_hierarchy(user_role, UserRole.HOSPITAL_ADMIN):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Insufficient permissions to export the audit log"
+        )
+    
+    organization_id = current_user.get('organization_id')
+    if not organization_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User organization not found")
+    
+    try:
+        rows = db.export_rows('user_audit_log', organization_id, {
+            'user_id': user_id,
+            'action': action,
+            'resource_type': resource_type,
+            'start_date': start_date,
+            'end_date': end_date
+        })
+        return await export_response('user_audit_log', rows, export_format, gzip)
+    except Exception as e:
+        logger.error(f"Audit log export failed for organization {organization_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Audit log export failed"
+        )
+
 # =====================================================
 # SYSTEM ENDPOINTS
 # =====================================================
@@ -572,5 +625,6 @@ async def auth_health():
     return {
         "service": "authentication",
         "status": "healthy",
+        "user_cache": user_cache.stats(),
         "timestamp": datetime.now(timezone.utc).isoformat()
     }
\ No newline at end of file
@@ -3,16 +3,16 @@ Bidding system API endpoints
 Handles automated supplier bidding workflow with AI agents
 """
 
-from fastapi import APIRouter, HTTPException, Query, Path, BackgroundTasks
-from typing import Optional, List
-import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from typing import Optional, List, Dict, Any
+from loguru import logger
 from datetime import datetime, date
 
 from app.database import db
+from app.api.auth import get_current_user
 from app.config import settings
-
-# Set up logging
-logger = logging.getLogger(__name__)
+from app.services.exports import export_response
+from app.services.job_queue import job_queue
 
 # Create router
 router = APIRouter()
@@ -41,9 +41,18 @@ async def get_bid_requests(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     status: Optional[str] = Query(None),
-    category: Optional[str] = Query(None)
+    category: Optional[str] = Query(None),
+    include_total: bool = Query(True),
+    count: str = Query("exact", pattern="^(exact|estimated)$"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (replaces skip)"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Get bid requests with pagination and filtering"""
+    """Get the organization's bid requests with pagination and filtering"""
+    organization_id = current_user.get('organization_id')
+    
+    if not organization_id:
+        raise HTTPException(status_code=400, detail="User organization not found")
+    
     try:
         filters = {}
         if status:
@@ -51,16 +60,49 @@ async def get_bid_requests(
         if category:
             filters['category'] = category
             
-        result = await db.get_bid_requests(skip=skip, limit=limit, filters=filters)
+        result = await db.get_bid_requests(
+            skip=skip, limit=limit, filters=filters, include_total=include_total, count=count,
+            cursor=cursor, organization_id=organization_id
+        )
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get bid requests: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/requests/export")
+async def export_bid_requests(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = Query(False, description="Compress the download (.gz)"),
+    status: Optional[str] = Query(None),
+    category: Optional[str] = Query(None),
+    start_date: Optional[datetime] = Query(None, description="Only requests created at or after this time"),
+    end_date: Optional[datetime] = Query(None, description="Only requests created at or before this time"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Download the organization's bid requests, oldest first (streamed, no page limit)"""
+    organization_id = current_user.get('organization_id')
+    
+    if not organization_id:
+        raise HTTPException(status_code=400, detail="User organization not found")
+    
+    try:
+        rows = db.export_rows('bid_requests', organization_id, {
+            'status': status,
+            'category': category,
+            'start_date': start_date,
+            'end_date': end_date
+        })
+        return await export_response('bid_requests', rows, export_format, gzip)
+    except Exception as e:
+        logger.error(f"Failed to export bid requests: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.post("/requests")
 async def create_bid_request(
     request: BidRequestCreate,
-    background_tasks: BackgroundTasks
+    current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
     Create new bid request and trigger AI agent workflow
@@ -71,19 +113,26 @@ async def create_bid_request(
         request_data = request.dict()
         request_data['status'] = 'active'
         request_data['items'] = request_data['items']  # Convert to JSON
+        request_data['organization_id'] = current_user.get('organization_id')
         
         # Create bid request in database
         created_request = await db.create_bid_request(request_data)
         
         # YOUR SPECIFIC WORKFLOW: Trigger AI agent to send emails
-        # background_tasks.add_task(trigger_ai_email_agent, created_request['id'])
+        job = await job_queue.enqueue(
+            "bidding.email_suppliers",
+            {"bid_request_id": created_request['id'], "organization_id": request_data['organization_id']},
+            idempotency_key=f"bidding.email_suppliers:{created_request['id']}",
+            organization_id=request_data['organization_id']
+        )
         
-        logger.info(f"Created bid request {created_request['id']} - AI email agent will be triggered")
+        logger.info(f"Created bid request {created_request['id']} - AI email agent queued as job {job['id']}")
         
         return {
             "success": True,
             "message": "Bid request created successfully. AI agent will send emails to suppliers.",
-            "data": created_request
+            "data": created_request,
+            "job_id": job['id']
         }
         
     except Exception as e:
@@ -91,10 +140,13 @@ async def create_bid_request(
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/requests/{request_id}/bids")
-async def get_request_bids(request_id: str):
-    """Get all bids for a specific request"""
+async def get_request_bids(
+    request_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get all bids for one of the organization's requests"""
     try:
-        bids = await db.get_bids_for_request(request_id)
+        bids = await db.get_bids_for_request(request_id, organization_id=current_user.get('organization_id'))
         return {
             "request_id": request_id,
             "bids": bids,
@@ -123,13 +175,21 @@ async def make_bid_decision(
     bid_id: str,
     decision: bool = Query(..., description="True to accept, False to reject"),
     notes: Optional[str] = Query(None, description="Decision notes"),
-    background_tasks: BackgroundTasks = None
+    current_user: Dict[str, Any] = Depends(get_current_user)
 ):
     """
     Make decision on bid (accept/reject)
     YOUR REQUIREMENT: "yes and no option then agent confirms and takes forward"
     """
     try:
+        organization_id = current_user.get('organization_id')
+        if not organization_id:
+            raise HTTPException(status_code=400, detail="User organization not found")
+        
+        # Only bids on the caller's own requests can be decided
+        if not await db.get_bid(bid_id, organization_id):
+            raise HTTPException(status_code=404, detail=f"Bid {bid_id} not found")
+        
         # Update bid status
         status = "accepted" if decision else "rejected"
         
@@ -147,17 +207,23 @@ async def make_bid_decision(
             raise HTTPException(status_code=404, detail=f"Bid {bid_id} not found")
         
         # YOUR SPECIFIC WORKFLOW: Trigger AI agent confirmation
-        if background_tasks:
-            # background_tasks.add_task(trigger_ai_confirmation_agent, bid_id, decision)
-            pass
+        # Decisions outrank bulk supplier emails in the queue
+        job = await job_queue.enqueue(
+            "bidding.send_confirmation",
+            {"bid_id": bid_id, "decision": decision, "organization_id": organization_id},
+            priority=10,
+            idempotency_key=f"bidding.send_confirmation:{bid_id}:{status}",
+            organization_id=organization_id
+        )
         
         action = "accepted" if decision else "rejected"
-        logger.info(f"Bid {bid_id} {action} - AI agent will send confirmation")
+        logger.info(f"Bid {bid_id} {action} - AI confirmation agent queued as job {job['id']}")
         
         return {
             "success": True,
             "message": f"Bid {action} successfully. AI agent will send confirmation to supplier.",
-            "data": result.data[0]
+            "data": result.data[0],
+            "job_id": job['id']
         }
         
     except HTTPException:
@@ -228,10 +294,15 @@ async def handle_whatsapp_response(message_data: dict):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/suppliers")
-async def get_suppliers(active_only: bool = Query(True)):
-    """Get available suppliers for bidding"""
+async def get_suppliers(
+    active_only: bool = Query(True),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get the organization's available suppliers for bidding"""
     try:
-        suppliers = await db.get_suppliers(active_only=active_only)
+        suppliers = await db.get_suppliers(
+            active_only=active_only, organization_id=current_user.get('organization_id')
+        )
         return {
             "suppliers": suppliers,
             "total": len(suppliers)
@@ -255,15 +326,3 @@ async def bidding_health_check():
     except Exception as e:
         logger.error(f"Bidding health check failed: {e}")
         raise HTTPException(status_code=503, detail="Service unhealthy")
-
-# Placeholder functions for AI agent integration (to be implemented)
-async def trigger_ai_email_agent(bid_request_id: str):
-    """Trigger AI agent to send emails to suppliers"""
-    # This will be implemented with actual AI agent
-    logger.info(f"AI Email Agent triggered for bid request {bid_request_id}")
-
-async def trigger_ai_confirmation_agent(bid_id: str, decision: bool):
-    """Trigger AI agent to send confirmation to supplier"""
-    # This will be implemented with actual AI agent
-    action = "acceptance" if decision else "rejection"
-    logger.info(f"AI Confirmation Agent triggered for bid {bid_id} - sending {action}")
\ No newline at end of file
@@ -2,14 +2,14 @@
 Equipment management and predictive maintenance API endpoints
 """
 
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
-import logging
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional, Dict, Any
+from loguru import logger
 from datetime import datetime
 
 from app.database import db
+from app.api.auth import get_current_user
 
-logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.get("/")
@@ -17,9 +17,18 @@ async def get_equipment(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     status: Optional[str] = Query(None),
-    equipment_type: Optional[str] = Query(None)
+    equipment_type: Optional[str] = Query(None),
+    include_total: bool = Query(True),
+    count: str = Query("exact", pattern="^(exact|estimated)$"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (replaces skip)"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Get equipment with pagination and filtering"""
+    """Get the organization's equipment with pagination and filtering"""
+    organization_id = current_user.get('organization_id')
+    
+    if not organization_id:
+        raise HTTPException(status_code=400, detail="User organization not found")
+    
     try:
         filters = {}
         if status:
@@ -27,8 +36,13 @@ async def get_equipment(
         if equipment_type:
             filters['type'] = equipment_type
             
-        result = await db.get_equipment(skip=skip, limit=limit, filters=filters)
+        result = await db.get_equipment(
+            skip=skip, limit=limit, filters=filters, include_total=include_total, count=count,
+            cursor=cursor, organization_id=organization_id
+        )
         return result
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to get equipment: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -3,11 +3,19 @@ Inventory API endpoints for MedInventory
 Handles inventory items, expiry tracking, and related operations
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from typing import Optional, Dict, Any, List
 from loguru import logger
-from app.api.auth import get_current_user
+from datetime import datetime
+import os
+from app.api.auth import get_current_user, require_role
+from app.config import settings
 from app.database import db
+from app.models.auth import UserRole
+from app.models.inventory import StockMovementBatch
+from app.services.exports import export_response
+from app.services.inventory_import import IMPORT_FILE_TYPES, store_upload
+from app.services.job_queue import job_queue
 
 router = APIRouter(tags=["Inventory Management"])
 
@@ -18,10 +26,13 @@ async def get_inventory_items(
     limit: int = Query(50, description="Maximum number of items to return"),
     category: Optional[str] = Query(None, description="Filter by category"),
     status: Optional[str] = Query(None, description="Filter by status"),
-    search: Optional[str] = Query(None, description="Search in item names"),
+    search: Optional[str] = Query(None, description="Search name, category, batch number and supplier (word prefixes)"),
+    include_total: bool = Query(True, description="Count the matching rows (set false to skip the count)"),
+    count: str = Query("exact", pattern="^(exact|estimated)$", description="exact, or estimated (planner estimate on large tables)"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (replaces skip)"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Get inventory items with filtering and pagination"""
+    """Get inventory items with filtering and pagination (offset or cursor)"""
     try:
         organization_id = current_user.get('organization_id')
         
@@ -41,101 +52,321 @@ async def get_inventory_items(
         result = await db.get_inventory_items(
             skip=skip, 
             limit=limit, 
-            filters=filters
+            filters=filters,
+            include_total=include_total,
+            count=count,
+            cursor=cursor,
+            organization_id=organization_id
         )
         
         return {
             "items": result['items'],
             "total": result['total'],
             "skip": result['skip'],
-            "limit": result['limit']
+            "limit": result['limit'],
+            "next_cursor": result['next_cursor']
         }
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting inventory items: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve inventory items: {str(e)}")
 
 
+@router.get("/search")
+async def search_inventory_items(
+    q: str = Query(..., min_length=1, max_length=200, description="Search text; each word matches as a prefix"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum number of matches to return"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Typeahead: best-matching items by name, category, batch number or supplier"""
+    try:
+        organization_id = current_user.get('organization_id')
+        
+        if not organization_id:
+            raise HTTPException(status_code=400, detail="User organization not found")
+        
+        results = await db.search_inventory_items(organization_id, q, limit=limit)
+        
+        return {
+            "query": q,
+            "results": results
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching inventory items: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to search inventory items: {str(e)}")
+
+
+@router.get("/transactions")
+async def get_inventory_transactions(
+    item_id: Optional[str] = Query(None, description="Filter by inventory item"),
+    transaction_type: Optional[str] = Query(None, pattern="^(add|subtract|adjust)$"),
+    limit: int = Query(50, ge=1, le=500, description="Maximum number of transactions to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = Query(False, description="Count the matching rows"),
+    count: str = Query("estimated", pattern="^(exact|estimated)$"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get stock movements, newest first, paged by cursor"""
+    try:
+        organization_id = current_user.get('organization_id')
+        
+        if not organization_id:
+            raise HTTPException(status_code=400, detail="User organization not found")
+        
+        filters = {}
+        if item_id:
+            filters['item_id'] = item_id
+        if transaction_type:
+            filters['transaction_type'] = transaction_type
+        
+        return await db.get_inventory_transactions(
+            limit=limit,
+            filters=filters,
+            include_total=include_total,
+            count=count,
+            cursor=cursor,
+            organization_id=organization_id
+        )
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting inventory transactions: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve inventory transactions: {str(e)}")
+
+
+@router.get("/items/export")
+async def export_inventory_items(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="csv, or ndjson (one JSON object per line)"),
+    gzip: bool = Query(False, description="Compress the download (.gz)"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    status: Optional[str] = Query(None, description="Filter by status"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Download every matching inventory item, by name (streamed, no page limit)"""
+    try:
+        organization_id = current_user.get('organization_id')
+        
+        if not organization_id:
+            raise HTTPException(status_code=400, detail="User organization not found")
+        
+        rows = db.export_rows('inventory_items', organization_id, {'category': category, 'status': status})
+        return await export_response('inventory_items', rows, export_format, gzip)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting inventory items: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to export inventory items: {str(e)}")
+
+
+@router.get("/transactions/export")
+async def export_inventory_transactions(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$", description="csv, or ndjson (one JSON object per line)"),
+    gzip: bool = Query(False, description="Compress the download (.gz)"),
+    item_id: Optional[str] = Query(None, description="Filter by inventory item"),
+    transaction_type: Optional[str] = Query(None, pattern="^(add|subtract|adjust)$"),
+    start_date: Optional[datetime] = Query(None, description="Only transactions at or after this time"),
+    end_date: Optional[datetime] = Query(None, description="Only transactions at or before this time"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Download stock movements, oldest first (streamed, no page limit)"""
+    try:
+        organization_id = current_user.get('organization_id')
+        
+        if not organization_id:
+            raise HTTPException(status_code=400, detail="User organization not found")
+        
+        rows = db.export_rows('inventory_transactions', organization_id, {
+            'item_id': item_id,
+            'transaction_type': transaction_type,
+            'start_date': start_date,
+            'end_date': end_date
+        })
+        return await export_response('inventory_transactions', rows, export_format, gzip)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error exporting inventory transactions: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to export inventory transactions: {str(e)}")
+
+
+@router.post("/movements/batch")
+async def apply_stock_movements(
+    batch: StockMovementBatch,
+    current_user: Dict[str, Any] = Depends(require_role(UserRole.STAFF_USER))
+):
+    """
+    Apply many stock movements (dispensing, goods receipt) in one transaction
+    
+    Staff users and above; viewers and auditors are read-only
+    """
+    try:
+        organization_id = current_user.get('organization_id')
+        
+        if not organization_id:
+            raise HTTPException(status_code=400, detail="User organization not found")
+        
+        movements = [movement.dict() for movement in batch.movements]
+        for movement in movements:
+            movement['transaction_type'] = movement['transaction_type'].value
+            if movement['reference_type']:
+                movement['reference_type'] = movement['reference_type'].value
+        
+        results = await db.apply_stock_movements(movements, organization_id)
+        
+        return {
+            "applied": len(results),
+            "results": results
+        }
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error applying stock movements: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to apply stock movements: {str(e)}")
+
+
+@router.post("/import", status_code=202)
+async def import_inventory(
+    file: UploadFile = File(..., description="CSV or XLSX file with a header row"),
+    current_user: Dict[str, Any] = Depends(require_role(UserRole.INVENTORY_MANAGER))
+):
+    """
+    Import inventory items from a CSV or XLSX file
+    
+    - Columns are the item fields: name, category and unit are required; quantity, batch_number,
+      expiry_date, price, location, reorder_level, ... are optional
+    - A row matching an item's name and batch number updates it (blank cells keep the current
+      value); any other row creates an item
+    - Returns a job at once; poll /api/jobs/{job_id} for progress, then the counts and rejected rows
+    - Inventory managers and above
+    """
+    try:
+        organization_id = current_user.get('organization_id')
+        
+        if not organization_id:
+            raise HTTPException(status_code=400, detail="User organization not found")
+        
+        file_type = os.path.splitext(file.filename or "")[1].lower().lstrip(".")
+        if file_type not in IMPORT_FILE_TYPES or file_type not in settings.ALLOWED_FILE_TYPES:
+            raise HTTPException(status_code=400, detail="Only CSV and XLSX files can be imported")
+        if file.size is not None and file.size > settings.MAX_FILE_SIZE:
+            raise HTTPException(status_code=413, detail=f"File is larger than {settings.MAX_FILE_SIZE // (1024 * 1024)} MB")
+        
+        # Stored in Postgres when the job may run in another process (see store_upload)
+        upload = await store_upload(file.file, file_type, organization_id)
+        
+        # One attempt: the upload is removed after the run, and a failed run wrote nothing
+        job = await job_queue.enqueue(
+            "inventory.import",
+            {
+                **upload,
+                "file_type": file_type,
+                "organization_id": organization_id,
+                "filename": file.filename
+            },
+            priority=3,
+            organization_id=organization_id,
+            max_attempts=1
+        )
+        
+        return {
+            "message": "Inventory import queued",
+            "job_id": job['id'],
+            "status": job['status'],
+            "status_url": f"/api/jobs/{job['id']}"
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error queueing inventory import: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to queue inventory import: {str(e)}")
+
+
 @router.get("/expiry")
 async def get_expiry_items(
-    status: Optional[str] = Query(None, description="Filter by expiry status: expired, expiring-soon, ok"),
-    days_threshold: int = Query(30, description="Days threshold for expiring soon"),
+    status: Optional[str] = Query(None, pattern="^(expired|expiring-soon|ok)$", description="Filter by expiry status: expired, expiring-soon, ok"),
+    days_threshold: int = Query(30, ge=0, description="Days threshold for expiring soon"),
+    limit: int = Query(100, ge=1, le=500, description="Maximum number of items to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """Get items with expiry information"""
+    """Get items with expiry information, soonest expiry first, paged by cursor"""
     try:
         organization_id = current_user.get('organization_id')
         
         if not organization_id:
             raise HTTPException(status_code=400, detail="User organization not found")
         
-        # Get all inventory items
-        result = await db.get_inventory_items(limit=1000)
-        items = result['items']
-        
-        # Process expiry information
-        from datetime import datetime, timedelta
-        today = datetime.now().date()
+        # Filtering, bucketing, sorting and counting all happen in the database
+        result = await db.get_expiry_items(
+            organization_id,
+            days_threshold=days_threshold,
+            status=status,
+            limit=limit,
+            cursor=cursor
+        )
         
         processed_items = []
-        for item in items:
-            if not item.get('expiry_date'):
-                continue
-                
-            try:
-                expiry_date = datetime.strptime(item['expiry_date'], '%Y-%m-%d').date()
-                days_until_expiry = (expiry_date - today).days
-                
-                # Determine status
-                if days_until_expiry < 0:
-                    expiry_status = "expired"
-                    days_text = f"{abs(days_until_expiry)} days ago"
-                elif days_until_expiry <= days_threshold:
-                    expiry_status = "expiring-soon"
-                    days_text = f"{days_until_expiry} days"
-                else:
-                    expiry_status = "ok"
-                    days_text = f"{days_until_expiry} days"
-                
-                # Apply status filter if specified
-                if status and expiry_status != status:
-                    continue
-                
-                processed_item = {
-                    "id": item['id'],
-                    "name": item['name'],
-                    "category": item.get('category', 'Unknown'),
-                    "batch_number": item.get('batch_number', 'N/A'),
-                    "expiry_date": item['expiry_date'],
-                    "quantity": item.get('quantity', 0),
-                    "supplier": item.get('supplier', 'Unknown'),
-                    "location": item.get('location', 'Unknown'),
-                    "alert_days": item.get('alert_days', 30),
-                    "alert_enabled": item.get('alert_enabled', False),
-                    "extended_date": item.get('extended_date'),
-                    "notes": item.get('notes'),
-                    "expiry_status": expiry_status,
-                    "days_until_expiry": days_until_expiry,
-                    "days_text": days_text
-                }
-                
-                processed_items.append(processed_item)
-                
-            except Exception as e:
-                logger.warning(f"Error processing expiry date for item {item.get('id')}: {e}")
-                continue
-        
-        # Sort by expiry date (closest first)
-        processed_items.sort(key=lambda x: x['days_until_expiry'])
+        for item in result['items']:
+            days_until_expiry = item['days_until_expiry']
+            if days_until_expiry < 0:
+                days_text = f"{abs(days_until_expiry)} days ago"
+            else:
+                days_text = f"{days_until_expiry} days"
+            
+            processed_items.append({
+                "id": item['id'],
+                "name": item['name'],
+                "category": item.get('category') or 'Unknown',
+                "batch_number": item.get('batch_number') or 'N/A',
+                "expiry_date": item['expiry_date'],
+                "quantity": item.get('quantity', 0),
+                "supplier": item.get('supplier_name') or 'Unknown',
+                "location": item.get('location') or 'Unknown',
+                "alert_days": item.get('alert_days', 30),
+                "alert_enabled": item.get('alert_enabled', False),
+                "extended_date": item.get('extended_date'),
+                "notes": item.get('notes'),
+                "expiry_status": item['expiry_status'],
+                "days_until_expiry": days_until_expiry,
+                "days_text": days_text
+            })
+        
+        counts = {
+            "expired": result['expired_count'],
+            "expiring-soon": result['expiring_soon_count'],
+            "ok": result['ok_count']
+        }
         
         return {
             "items": processed_items,
-            "total": len(processed_items),
-            "expired_count": len([i for i in processed_items if i['expiry_status'] == 'expired']),
-            "expiring_soon_count": len([i for i in processed_items if i['expiry_status'] == 'expiring-soon']),
-            "ok_count": len([i for i in processed_items if i['expiry_status'] == 'ok'])
+            "total": counts[status] if status else sum(counts.values()),
+            "expired_count": result['expired_count'],
+            "expiring_soon_count": result['expiring_soon_count'],
+            "ok_count": result['ok_count'],
+            "limit": limit,
+            "next_cursor": result['next_cursor']
         }
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting expiry items: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to retrieve expiry items: {str(e)}")
@@ -0,0 +1,74 @@
+"""
+Background job status API endpoints
+"""
+
+import uuid
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional, Dict, Any
+from loguru import logger
+from app.services.job_queue import job_queue
+from app.api.auth import get_current_user
+
+router = APIRouter()
+
+
+async def _get_organization_job(job_id: str, current_user: Dict[str, Any]) -> Dict[str, Any]:
+    """Fetch a job; jobs of other organizations are reported as missing"""
+    try:
+        uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    job = await job_queue.get(job_id)
+    if not job or (job.get('organization_id') and job['organization_id'] != current_user.get('organization_id')):
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.get("")
+async def list_jobs(
+    status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed|cancelled)$"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """List the organization's most recent jobs"""
+    organization_id = current_user.get('organization_id')
+
+    if not organization_id:
+        raise HTTPException(status_code=400, detail="User organization not found")
+
+    try:
+        jobs = await job_queue.list(organization_id=organization_id, status=status, limit=limit)
+        return {"jobs": jobs, "total": len(jobs)}
+    except Exception as e:
+        logger.error(f"Error listing jobs: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to list jobs: {str(e)}")
+
+
+@router.get("/{job_id}")
+async def get_job(
+    job_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    Get a job's status
+
+    - status is queued, running, succeeded, failed or cancelled
+    - progress is what a long job (such as an inventory import) has reported so far
+    - result holds the handler's output once the job has succeeded; last_error the latest failure
+    """
+    return await _get_organization_job(job_id, current_user)
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(
+    job_id: str,
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Cancel a job that has not started yet"""
+    await _get_organization_job(job_id, current_user)
+
+    job = await job_queue.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=409, detail="Only queued jobs can be cancelled")
+
+    return job
@@ -3,9 +3,21 @@ Configuration settings for MedInventory backend
 """
 
 import os
+import tempfile
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from typing import Optional
 
+# The backend directory; relative paths in settings are taken from here, not from wherever
+# the process was started
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def backend_path(path: str) -> str:
+    """Resolve a settings path against BACKEND_DIR (absolute paths are kept)"""
+    return os.path.join(BACKEND_DIR, os.path.expanduser(path))
+
+
 class Settings(BaseSettings):
     # Application settings
     APP_NAME: str = "MedInventory API"
@@ -18,6 +30,17 @@ class Settings(BaseSettings):
     SUPABASE_ANON_KEY: str = os.getenv("SUPABASE_ANON_KEY", "")
     SUPABASE_SERVICE_ROLE_KEY: str = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
     
+    # Direct Postgres pool (hot paths bypass PostgREST when DATABASE_URL is set)
+    DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
+    PG_POOL_MIN_SIZE: int = int(os.getenv("PG_POOL_MIN_SIZE", "2"))
+    PG_POOL_MAX_SIZE: int = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+    PG_POOL_ACQUIRE_TIMEOUT: float = float(os.getenv("PG_POOL_ACQUIRE_TIMEOUT", "5.0"))
+    PG_POOL_MAX_IDLE_SECONDS: float = float(os.getenv("PG_POOL_MAX_IDLE_SECONDS", "300"))
+    PG_COMMAND_TIMEOUT: float = float(os.getenv("PG_COMMAND_TIMEOUT", "30"))
+    # Set to 0 when connecting through PgBouncer in transaction mode
+    PG_STATEMENT_CACHE_SIZE: int = int(os.getenv("PG_STATEMENT_CACHE_SIZE", "100"))
+    DB_MAX_CONNECTIONS: int = int(os.getenv("DB_MAX_CONNECTIONS", "60"))  # Server-side connection limit
+    
     # AI Services
     OPENAI_API_KEY: Optional[str] = os.getenv("OPENAI_API_KEY")
     ANTHROPIC_API_KEY: Optional[str] = os.getenv("ANTHROPIC_API_KEY")
@@ -36,6 +59,42 @@ class Settings(BaseSettings):
     # Redis for Celery
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379")
     
+    # Forecast result cache ("local" or "redis"; redis shares forecasts across workers)
+    FORECAST_CACHE_BACKEND: str = os.getenv("FORECAST_CACHE_BACKEND", "local")
+    FORECAST_CACHE_TTL_SECONDS: float = float(os.getenv("FORECAST_CACHE_TTL_SECONDS", "3600"))
+    FORECAST_CACHE_LOCAL_TTL_SECONDS: float = float(os.getenv("FORECAST_CACHE_LOCAL_TTL_SECONDS", "60"))
+    FORECAST_CACHE_MAX_ENTRIES: int = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "128"))
+    FORECAST_LOCK_TIMEOUT_SECONDS: float = float(os.getenv("FORECAST_LOCK_TIMEOUT_SECONDS", "120"))  # Longest expected generation
+    
+    # Forecast engine ("ai" or "statistical"; statistical forecasts every item from inventory_transactions)
+    FORECAST_ENGINE: str = os.getenv("FORECAST_ENGINE", "ai")
+    FORECAST_HISTORY_DAYS: int = int(os.getenv("FORECAST_HISTORY_DAYS", "365"))
+    FORECAST_SMOOTHING_ALPHA: float = float(os.getenv("FORECAST_SMOOTHING_ALPHA", "0.1"))
+    FORECAST_SERVICE_LEVEL: float = float(os.getenv("FORECAST_SERVICE_LEVEL", "0.95"))  # Drives safety stock
+    FORECAST_LEAD_TIME_DAYS: float = float(os.getenv("FORECAST_LEAD_TIME_DAYS", "7"))
+    
+    # AI forecasts cover the whole catalogue in prompt-sized chunks, several at a time
+    FORECAST_CHUNK_SIZE: int = int(os.getenv("FORECAST_CHUNK_SIZE", "10"))
+    FORECAST_MAX_PARALLEL_CHUNKS: int = int(os.getenv("FORECAST_MAX_PARALLEL_CHUNKS", "4"))
+    # A forecast with more than this share of chunks on the fallback is not stored or cached
+    FORECAST_MAX_FALLBACK_FRACTION: float = float(os.getenv("FORECAST_MAX_FALLBACK_FRACTION", "0.5"))
+    
+    # Nightly forecast pre-computation (runs wherever background jobs run)
+    FORECAST_PRECOMPUTE_ENABLED: bool = os.getenv("FORECAST_PRECOMPUTE_ENABLED", "true").lower() == "true"
+    FORECAST_PRECOMPUTE_HOUR: int = int(os.getenv("FORECAST_PRECOMPUTE_HOUR", "2"))  # Server local time
+    FORECAST_PRECOMPUTE_PERIODS: str = os.getenv("FORECAST_PRECOMPUTE_PERIODS", "7d,30d,90d,6m,1y")
+    FORECAST_PRECOMPUTE_STAGGER_SECONDS: float = float(os.getenv("FORECAST_PRECOMPUTE_STAGGER_SECONDS", "10"))
+    
+    # Background jobs ("memory" or "postgres"; postgres jobs are run by worker.py)
+    JOB_QUEUE_BACKEND: str = os.getenv("JOB_QUEUE_BACKEND", "memory")
+    JOB_WORKER_IN_PROCESS: bool = os.getenv("JOB_WORKER_IN_PROCESS", "false").lower() == "true"  # Also run jobs in the API process
+    JOB_WORKER_CONCURRENCY: int = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BASE_DELAY: float = float(os.getenv("JOB_RETRY_BASE_DELAY", "5"))
+    JOB_RETRY_MAX_DELAY: float = float(os.getenv("JOB_RETRY_MAX_DELAY", "300"))
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "600"))  # Longest expected job run
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+    
     # Email settings
     DEFAULT_FROM_EMAIL: str = os.getenv("DEFAULT_FROM_EMAIL", "noreply@medinventory.com")
     DEFAULT_FROM_NAME: str = os.getenv("DEFAULT_FROM_NAME", "MedInventory System")
@@ -44,13 +103,26 @@ class Settings(BaseSettings):
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB
     ALLOWED_FILE_TYPES: list = ["pdf", "doc", "docx", "xls", "xlsx", "csv"]
     
+    # Inventory import. With JOB_QUEUE_BACKEND=postgres uploads wait for the import job in the
+    # import_uploads table (workers may run on other hosts); IMPORT_UPLOAD_DIR is only used by
+    # the in-memory queue, whose jobs run in the API process itself
+    IMPORT_UPLOAD_DIR: str = os.getenv("IMPORT_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "medinventory-imports"))
+    IMPORT_BATCH_SIZE: int = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))  # Rows validated and loaded per COPY
+    
     # API settings
     API_V1_STR: str = "/api"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10080"))  # 7 days
     
+    # Authenticated user cache and activity batching
+    USER_CACHE_TTL_SECONDS: float = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+    USER_CACHE_MAX_ENTRIES: int = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: float = float(os.getenv("ACTIVITY_FLUSH_INTERVAL_SECONDS", "30"))
+    ACTIVITY_FLUSH_MAX_ENTRIES: int = int(os.getenv("ACTIVITY_FLUSH_MAX_ENTRIES", "500"))
+    
     # Pagination
     DEFAULT_PAGE_SIZE: int = int(os.getenv("DEFAULT_PAGE_SIZE", "20"))
     MAX_PAGE_SIZE: int = int(os.getenv("MAX_PAGE_SIZE", "100"))
+    EXACT_COUNT_THRESHOLD: int = int(os.getenv("EXACT_COUNT_THRESHOLD", "10000"))  # Estimated totals below this are counted exactly
     
     # AI Agent Settings
     AI_MODEL: str = os.getenv("AI_MODEL", "gpt-4")
@@ -69,6 +141,41 @@ class Settings(BaseSettings):
     AI_MAX_TOKENS: int = int(os.getenv("AI_MAX_TOKENS", "2048"))
     AI_TEMPERATURE: float = float(os.getenv("AI_TEMPERATURE", "0.7"))
     
+    # AI HTTP client (one pooled keep-alive client per worker)
+    AI_HTTP2: bool = os.getenv("AI_HTTP2", "true").lower() == "true"
+    AI_MAX_CONNECTIONS: int = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+    AI_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("AI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+    AI_KEEPALIVE_EXPIRY: float = float(os.getenv("AI_KEEPALIVE_EXPIRY", "60"))
+    AI_CONNECT_TIMEOUT: float = float(os.getenv("AI_CONNECT_TIMEOUT", "5"))
+    AI_READ_TIMEOUT: float = float(os.getenv("AI_READ_TIMEOUT", "30"))  # The old per-request client timeout
+    AI_WRITE_TIMEOUT: float = float(os.getenv("AI_WRITE_TIMEOUT", "10"))
+    AI_POOL_TIMEOUT: float = float(os.getenv("AI_POOL_TIMEOUT", "10"))  # Wait for a free connection
+    
+    # AI call scheduling (concurrency caps, rate limit, retries, circuit breaker)
+    AI_MAX_CONCURRENT_CALLS: int = int(os.getenv("AI_MAX_CONCURRENT_CALLS", "8"))
+    AI_MAX_CONCURRENT_CALLS_PER_ORG: int = int(os.getenv("AI_MAX_CONCURRENT_CALLS_PER_ORG", "2"))
+    AI_RATE_LIMIT_PER_SECOND: float = float(os.getenv("AI_RATE_LIMIT_PER_SECOND", "2"))  # 0 disables
+    AI_RATE_LIMIT_BURST: int = int(os.getenv("AI_RATE_LIMIT_BURST", "5"))
+    AI_MAX_RETRIES: int = int(os.getenv("AI_MAX_RETRIES", "3"))
+    AI_RETRY_BASE_DELAY: float = float(os.getenv("AI_RETRY_BASE_DELAY", "0.5"))
+    AI_RETRY_MAX_DELAY: float = float(os.getenv("AI_RETRY_MAX_DELAY", "8"))
+    AI_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("AI_BREAKER_FAILURE_THRESHOLD", "5"))
+    AI_BREAKER_RESET_SECONDS: float = float(os.getenv("AI_BREAKER_RESET_SECONDS", "30"))
+    
+    # Local data files (caches); relative to the backend directory unless absolute
+    DATA_DIR: str = backend_path(os.getenv("DATA_DIR", ".cache"))
+    
+    # LLM response cache (SQLite, shared by workers on the same host; 0 entries disables)
+    LLM_CACHE_PATH: str = backend_path(os.getenv("LLM_CACHE_PATH", os.path.join(DATA_DIR, "llm_responses.sqlite3")))
+    LLM_CACHE_MAX_ENTRIES: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+    LLM_CACHE_TTL_SECONDS: float = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+    
+    @field_validator("DATA_DIR", "LLM_CACHE_PATH")
+    @classmethod
+    def _resolve_path(cls, value: str) -> str:
+        # Values read from the environment or .env bypass the defaults above
+        return backend_path(value)
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
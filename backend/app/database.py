@@ -3,27 +3,32 @@ Database connection and utilities for MedInventory
 Uses Supabase as the primary database
 """
 
-from supabase import create_client, Client
+from supabase import AsyncClient
 from app.config import settings
+from app.pg_pool import pg_pool, record_to_dict
+from app.pagination import decode_cursor, keyset_condition, postgrest_after, split_page
+from app.search import prefix_tsquery
 import asyncio
-from typing import Dict, List, Any, Optional
-import logging
-
-# Set up logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+from datetime import date
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional
+from loguru import logger
 
 class SupabaseClient:
-    """Singleton Supabase client wrapper"""
+    """Singleton async Supabase client wrapper
+    
+    Every query is awaited on the event loop instead of blocking it, so a slow
+    PostgREST round-trip no longer stalls the other requests in the worker.
+    """
     
-    _instance: Optional[Client] = None
+    _instance: Optional[AsyncClient] = None
     
     @classmethod
-    def get_client(cls) -> Client:
+    def get_client(cls) -> AsyncClient:
         """Get or create Supabase client"""
         if cls._instance is None:
             try:
-                cls._instance = create_client(
+                # The constructor does no I/O, so it is safe to call at import time
+                cls._instance = AsyncClient(
                     settings.SUPABASE_URL,
                     settings.SUPABASE_SERVICE_ROLE_KEY  # Using service role for full access
                 )
@@ -32,9 +37,259 @@ class SupabaseClient:
                 logger.error(f"❌ Failed to initialize Supabase client: {e}")
                 raise
         return cls._instance
+    
+    @classmethod
+    async def close(cls):
+        """Close the pooled HTTP connections held by the client"""
+        if cls._instance is not None:
+            try:
+                await cls._instance.postgrest.aclose()
+            except Exception as e:
+                logger.warning(f"Failed to close Supabase client: {e}")
+            cls._instance = None
 
 # Global client instance
-supabase: Client = SupabaseClient.get_client()
+supabase: AsyncClient = SupabaseClient.get_client()
+
+def _sql_filters(filters: Dict = None, equals: tuple = (), args: List = None) -> tuple:
+    """Build a parameterised WHERE clause for the direct Postgres path"""
+    args = args if args is not None else []
+    conditions = []
+    for column in equals:
+        if filters and filters.get(column):
+            args.append(filters[column])
+            conditions.append(f"{column} = ${len(args)}")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, args
+
+# Searches matching at most this many items filter by their ids
+SEARCH_ID_LIMIT = 1000
+
+async def _pg_item_search(conn, where: str, args: List, term: str, organization_id: str) -> tuple:
+    """Add an inventory_item_search match for `term` to a WHERE clause
+    
+    The planner cannot estimate prefix searches, so for a rare term it walks the whole name
+    index probing for matches; rare terms are resolved to their item ids first instead.
+    Common terms keep the subquery, where the name-ordered walk fills a page quickly.
+    """
+    tsquery = prefix_tsquery(term)
+    args = list(args)
+    if not tsquery:
+        condition = "FALSE"
+    else:
+        ids = await conn.fetchval(
+            f"SELECT array_agg(item_id) FROM (SELECT item_id FROM inventory_item_search "
+            f"WHERE organization_id = $2 AND search_vector @@ to_tsquery('simple', $1) LIMIT {SEARCH_ID_LIMIT + 1}) matches",
+            tsquery, _require_tenant(organization_id)
+        ) or []
+        if len(ids) <= SEARCH_ID_LIMIT:
+            args.append(ids)
+            condition = f"id = ANY(${len(args)}::uuid[])"
+        else:
+            args.extend([organization_id, tsquery])
+            condition = (
+                f"id IN (SELECT item_id FROM inventory_item_search "
+                f"WHERE organization_id = ${len(args) - 1} AND search_vector @@ to_tsquery('simple', ${len(args)}))"
+            )
+    return (f"{where} AND {condition}" if where else f"WHERE {condition}"), args
+
+def _require_tenant(organization_id: Optional[str]) -> str:
+    """Fail closed: a read without an organization would return every tenant's rows"""
+    if not organization_id:
+        raise ValueError("organization_id is required; reads are scoped to one organization")
+    return organization_id
+
+def _tenant_filters(filters: Dict, organization_id: str) -> Dict:
+    """Filters with the tenant first, so it leads the WHERE clause like it leads the indexes"""
+    return {'organization_id': _require_tenant(organization_id), **(filters or {})}
+
+def _scoped(query, organization_id: str):
+    """Restrict a PostgREST query to one organization"""
+    return query.eq('organization_id', _require_tenant(organization_id))
+
+async def _pg_page(conn, table: str, where: str, args: List, order_by: str, skip: int, limit: int,
+                   include_total: bool = True, count: str = "exact",
+                   after: Optional[str] = None, after_args: List = ()) -> tuple:
+    """One page of rows plus the total for the same filters, for the direct Postgres path
+    
+    count="exact" computes the total in the page query itself, so it costs no extra
+    round-trip; count="estimated" reads the planner's row estimate (counting exactly when
+    it is below EXACT_COUNT_THRESHOLD). Without include_total the total is None.
+    `after` is a keyset condition (placeholders numbered after `args`) that limits the
+    page, but not the total, to rows following a cursor.
+    """
+    page_args = [*args, *after_args]
+    page_where = where
+    if after:
+        page_where = f"{where} AND {after}" if where else f"WHERE {after}"
+    page = f"LIMIT ${len(page_args) + 1} OFFSET ${len(page_args) + 2}"
+    if include_total and count == "exact":
+        # An uncorrelated subquery runs once and keeps the top-N sort for the page;
+        # count(*) OVER () would sort every matching row instead
+        rows = await conn.fetch(
+            f"SELECT (SELECT count(*) FROM {table} {where}) AS _total, page.* "
+            f"FROM (SELECT * FROM {table} {page_where} ORDER BY {order_by} {page}) page",
+            *page_args, limit, skip
+        )
+        if rows:
+            total = rows[0]['_total']
+        elif skip or after:
+            # Past the last page there is no row to carry the total
+            total = await conn.fetchval(f"SELECT count(*) FROM {table} {where}", *args)
+        else:
+            total = 0
+        items = [record_to_dict(row) for row in rows]
+        for item in items:
+            del item['_total']
+        return items, total
+    
+    rows = await conn.fetch(
+        f"SELECT * FROM {table} {page_where} ORDER BY {order_by} {page}", *page_args, limit, skip
+    )
+    total = await _pg_estimated_count(conn, table, where, args) if include_total else None
+    return [record_to_dict(row) for row in rows], total
+
+async def _pg_estimated_count(conn, table: str, where: str, args: List) -> int:
+    """Planner row estimate for the filtered table; small results are counted exactly"""
+    plan = await conn.fetchval(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} {where}", *args)
+    estimate = int(plan[0]['Plan']['Plan Rows'])
+    if estimate < settings.EXACT_COUNT_THRESHOLD:
+        return await conn.fetchval(f"SELECT count(*) FROM {table} {where}", *args)
+    return estimate
+
+# Keyset sort keys: unique, and backed by composite indexes (init_database.sql)
+NAME_ORDER = ('name', 'id')
+NEWEST_FIRST = ('created_at', 'id')
+EXPIRY_ORDER = ('expiry_date', 'id')
+
+EXPIRY_COUNTS = ('expired_count', 'expiring_soon_count', 'ok_count')
+
+# Organization-wide counts inventory_dashboard() puts on every category row
+DASHBOARD_COUNTS = ('expired_items', 'expiring_soon_items', 'suppliers_count', 'active_bids', 'equipment_operational')
+
+# Exports: the columns written (in order), the key rows stream in and the columns that can be
+# filtered on; every export is scoped to one organization and can be limited by created_at
+EXPORTS = {
+    'inventory_items': {
+        'columns': ('id', 'name', 'category', 'quantity', 'unit', 'batch_number', 'batch_id', 'expiry_date',
+                    'supplier_id', 'price', 'location', 'reorder_level', 'status', 'created_at', 'updated_at'),
+        'order': NAME_ORDER,
+        'filters': ('category', 'status'),
+    },
+    'inventory_transactions': {
+        'columns': ('id', 'item_id', 'transaction_type', 'quantity', 'reference_type', 'reference_id', 'notes',
+                    'performed_by', 'created_at'),
+        'order': NEWEST_FIRST,
+        'filters': ('item_id', 'transaction_type'),
+    },
+    'bid_requests': {
+        'columns': ('id', 'title', 'description', 'category', 'items', 'quantity', 'estimated_value', 'deadline',
+                    'status', 'created_by', 'created_at', 'updated_at'),
+        'order': NEWEST_FIRST,
+        'filters': ('status', 'category'),
+    },
+    'user_audit_log': {
+        'columns': ('id', 'user_id', 'action', 'resource_type', 'resource_id', 'old_values', 'new_values',
+                    'ip_address', 'user_agent', 'session_id', 'created_at'),
+        'order': NEWEST_FIRST,
+        'filters': ('user_id', 'action', 'resource_type'),
+    },
+}
+
+# Rows per cursor fetch (or PostgREST page) while exporting
+EXPORT_BATCH_SIZE = 2000
+
+# Inventory import: columns of the per-transaction staging table, in COPY order
+IMPORT_COLUMNS = ('source_row', 'name', 'category', 'quantity', 'unit', 'batch_number', 'batch_id',
+                  'expiry_date', 'supplier_id', 'price', 'location', 'reorder_level')
+
+IMPORT_STAGING_TABLE = """
+    CREATE TEMP TABLE inventory_import_staging (
+        source_row INTEGER NOT NULL,
+        name VARCHAR(200) NOT NULL,
+        category VARCHAR(100) NOT NULL,
+        quantity INTEGER,
+        unit VARCHAR(50) NOT NULL,
+        batch_number VARCHAR(100),
+        batch_id VARCHAR(50),
+        expiry_date DATE,
+        supplier_id TEXT,
+        price DECIMAL(10,2),
+        location VARCHAR(200),
+        reorder_level INTEGER
+    ) ON COMMIT DROP
+"""
+
+# Rows naming a supplier outside the organization (or not a supplier id at all) are rejected
+IMPORT_REJECT_UNKNOWN_SUPPLIERS = """
+    DELETE FROM inventory_import_staging st
+    WHERE st.supplier_id IS NOT NULL
+    AND lower(st.supplier_id) NOT IN (SELECT id::text FROM suppliers WHERE organization_id = $1)
+    RETURNING st.source_row
+"""
+
+# Items are matched on (name, batch_number) within the organization. Matched items take the
+# imported values, with blank cells keeping the current ones, and quantity changes are logged
+# like any other adjustment; unmatched rows become new items.
+IMPORT_MERGE = """
+    WITH staged AS (
+        -- A key repeated within the batch: the last row wins
+        SELECT DISTINCT ON (name, batch_number) *
+        FROM inventory_import_staging
+        ORDER BY name, batch_number, source_row DESC
+    ), updated AS (
+        UPDATE inventory_items i
+        SET category = s.category,
+            quantity = COALESCE(s.quantity, i.quantity),
+            unit = s.unit,
+            batch_id = COALESCE(s.batch_id, i.batch_id),
+            expiry_date = COALESCE(s.expiry_date, i.expiry_date),
+            supplier_id = COALESCE(s.supplier_id::uuid, i.supplier_id),
+            price = COALESCE(s.price, i.price),
+            location = COALESCE(s.location, i.location),
+            reorder_level = COALESCE(s.reorder_level, i.reorder_level),
+            status = CASE WHEN COALESCE(s.quantity, i.quantity) = 0 THEN 'out_of_stock'
+                          WHEN COALESCE(s.quantity, i.quantity) <= COALESCE(s.reorder_level, i.reorder_level) THEN 'low_stock'
+                          ELSE 'in_stock' END
+        FROM staged s, inventory_items old
+        WHERE i.organization_id = $1 AND i.name = s.name
+        AND i.batch_number IS NOT DISTINCT FROM s.batch_number
+        AND old.id = i.id
+        RETURNING i.id, old.quantity AS quantity_before, i.quantity AS quantity_after
+    ), inserted AS (
+        INSERT INTO inventory_items (organization_id, name, category, quantity, unit, batch_number, batch_id,
+                                     expiry_date, supplier_id, price, location, reorder_level, status)
+        SELECT $1, s.name, s.category, COALESCE(s.quantity, 0), s.unit, s.batch_number, s.batch_id,
+               s.expiry_date, s.supplier_id::uuid, s.price, s.location, COALESCE(s.reorder_level, 0),
+               CASE WHEN COALESCE(s.quantity, 0) = 0 THEN 'out_of_stock'
+                    WHEN COALESCE(s.quantity, 0) <= COALESCE(s.reorder_level, 0) THEN 'low_stock'
+                    ELSE 'in_stock' END
+        FROM staged s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM inventory_items i
+            WHERE i.organization_id = $1 AND i.name = s.name
+            AND i.batch_number IS NOT DISTINCT FROM s.batch_number
+        )
+        RETURNING id
+    ), logged AS (
+        INSERT INTO inventory_transactions (item_id, organization_id, transaction_type, quantity, reference_type, notes)
+        SELECT id, $1, CASE WHEN quantity_after > quantity_before THEN 'add' ELSE 'subtract' END,
+               abs(quantity_after - quantity_before), 'adjustment',
+               'Quantity changed from ' || quantity_before || ' to ' || quantity_after || ' by import'
+        FROM updated
+        WHERE quantity_after <> quantity_before
+    )
+    SELECT (SELECT count(*) FROM inserted) AS inserted, (SELECT count(*) FROM updated) AS updated
+"""
+
+def _count_option(include_total: bool, count: str) -> Optional[str]:
+    """PostgREST count option for a list query, or None without include_total
+    
+    The option is passed through as is: with "estimated" PostgREST itself counts exactly up
+    to its db-max-rows setting and returns the planner estimate beyond it (the direct
+    Postgres path does the same with EXACT_COUNT_THRESHOLD, see _pg_estimated_count).
+    """
+    return count if include_total else None
 
 class DatabaseService:
     """Database service with common operations"""
@@ -45,17 +300,36 @@ class DatabaseService:
     async def execute_query(self, query: str, params: Dict = None) -> List[Dict[str, Any]]:
         """Execute raw SQL query"""
         try:
-            result = self.client.rpc('execute_sql', {'query': query, 'params': params or {}})
+            result = await self.client.rpc('execute_sql', {'query': query, 'params': params or {}}).execute()
             return result.data
         except Exception as e:
             logger.error(f"Database query failed: {e}")
             raise
     
     # Inventory Operations
-    async def get_inventory_items(self, skip: int = 0, limit: int = 20, filters: Dict = None) -> Dict:
-        """Get inventory items with pagination and filters"""
+    async def get_inventory_items(self, skip: int = 0, limit: int = 20, filters: Dict = None,
+                                  include_total: bool = True, count: str = "exact",
+                                  cursor: Optional[str] = None, *, organization_id: str) -> Dict:
+        """Get inventory items with pagination and filters, sorted by name
+        
+        Only organization_id's rows are read; a missing organization_id raises ValueError.
+        The total counts the filtered rows: exactly, estimated (count="estimated",
+        cheap on large tables), or not at all (include_total=False, total is None).
+        Pass the returned next_cursor as `cursor` for the next page (skip is then ignored);
+        next_cursor is None on the last page. Raises ValueError for an invalid cursor.
+        """
+        after = decode_cursor(cursor, NAME_ORDER) if cursor else None
         try:
-            query = self.client.table('inventory_items').select('*')
+            if pg_pool.enabled:
+                return await self._pg_get_inventory_items(
+                    skip, limit, _tenant_filters(filters, organization_id), include_total, count, after
+                )
+            
+            # Searching inner-joins each item's search vector (the embed adds no columns)
+            searching = bool(filters and filters.get('search'))
+            columns = '*, inventory_item_search!inner()' if searching else '*'
+            query = self.client.table('inventory_items').select(columns, count=_count_option(include_total, count))
+            query = _scoped(query, organization_id)
             
             # Apply filters
             if filters:
@@ -63,95 +337,440 @@ class DatabaseService:
                     query = query.eq('category', filters['category'])
                 if filters.get('status'):
                     query = query.eq('status', filters['status'])
-                if filters.get('search'):
-                    query = query.ilike('name', f"%{filters['search']}%")
-            
-            # Apply pagination
-            result = query.range(skip, skip + limit - 1).execute()
+                if searching:
+                    query = query.filter(
+                        'inventory_item_search.search_vector', 'fts(simple)',
+                        prefix_tsquery(filters['search']) or "''"
+                    )
             
-            # Get total count
-            count_result = self.client.table('inventory_items').select('id', count='exact').execute()
+            # Apply pagination (the total comes back with the page; one extra row tells whether more follow)
+            if after:
+                query, skip = postgrest_after(query, NAME_ORDER, after), 0
+            result = await query.order('name').order('id').range(skip, skip + limit).execute()
+            items, next_cursor = split_page(result.data, limit, NAME_ORDER)
             
             return {
-                'items': result.data,
-                'total': count_result.count,
+                'items': items,
+                'total': result.count,
                 'skip': skip,
-                'limit': limit
+                'limit': limit,
+                'next_cursor': next_cursor
             }
         except Exception as e:
             logger.error(f"Failed to get inventory items: {e}")
             raise
     
+    async def _pg_get_inventory_items(self, skip: int, limit: int, filters: Dict = None,
+                                      include_total: bool = True, count: str = "exact",
+                                      after: Optional[List[str]] = None) -> Dict:
+        """Direct Postgres variant of get_inventory_items"""
+        where, args = _sql_filters(filters, equals=('organization_id', 'category', 'status'))
+        if after:
+            skip = 0
+        async with pg_pool.acquire() as conn:
+            if filters and filters.get('search'):
+                where, args = await _pg_item_search(
+                    conn, where, args, filters['search'], filters.get('organization_id')
+                )
+            keyset = keyset_condition(NAME_ORDER, ('text', 'uuid'), len(args) + 1) if after else None
+            rows, total = await _pg_page(
+                conn, 'inventory_items', where, args, 'name, id', skip, limit + 1, include_total, count,
+                keyset, after or ()
+            )
+        items, next_cursor = split_page(rows, limit, NAME_ORDER)
+        return {
+            'items': items,
+            'total': total,
+            'skip': skip,
+            'limit': limit,
+            'next_cursor': next_cursor
+        }
+    
+    async def search_inventory_items(self, organization_id: str, term: str, limit: int = 10) -> List[Dict]:
+        """An organization's top `limit` items matching every word of `term` as a word prefix
+
+        Matches name, category, batch number and supplier name, best match (name) first,
+        via the search_inventory_items() function in init_database.sql.
+        """
+        tsquery = prefix_tsquery(term)
+        if not tsquery:
+            return []
+        try:
+            if pg_pool.enabled:
+                return await pg_pool.fetch(
+                    "SELECT * FROM search_inventory_items($1, $2, $3)", organization_id, tsquery, limit
+                )
+
+            result = await self.client.rpc('search_inventory_items', {
+                'p_organization_id': organization_id,
+                'p_query': tsquery,
+                'p_limit': limit
+            }).execute()
+            return result.data
+        except Exception as e:
+            logger.error(f"Failed to search inventory items: {e}")
+            raise
+
+    async def get_expiry_items(self, organization_id: str, days_threshold: int = 30, status: Optional[str] = None,
+                               limit: int = 50, cursor: Optional[str] = None, today: Optional[date] = None) -> Dict:
+        """An organization's dated items, soonest expiry first, bucketed by the database
+        
+        Each item carries expiry_status (expired, expiring-soon within days_threshold days,
+        or ok) and days_until_expiry; `status` limits the page to one bucket. The bucket
+        counts cover all of the organization's dated items. Pages by cursor like the other
+        lists; raises ValueError for an invalid cursor.
+        """
+        after_date, after_id = decode_cursor(cursor, EXPIRY_ORDER) if cursor else (None, None)
+        today = today or date.today()
+        try:
+            if pg_pool.enabled:
+                rows = await pg_pool.fetch(
+                    "SELECT * FROM inventory_expiry($1, $2, $3, $4, $5::text::date, $6::text::uuid, $7)",
+                    organization_id, today, days_threshold, status, after_date, after_id, limit + 1
+                )
+            else:
+                result = await self.client.rpc('inventory_expiry', {
+                    'p_organization_id': organization_id,
+                    'p_today': today.isoformat(),
+                    'p_days_threshold': days_threshold,
+                    'p_status': status,
+                    'p_after_date': after_date,
+                    'p_after_id': after_id,
+                    'p_limit': limit + 1
+                }).execute()
+                rows = result.data
+            
+            # Every row carries the counts; a row without an id only carries them
+            counts = {key: rows[0][key] if rows else 0 for key in EXPIRY_COUNTS}
+            items = [
+                {key: value for key, value in row.items() if key not in EXPIRY_COUNTS}
+                for row in rows if row['id'] is not None
+            ]
+            items, next_cursor = split_page(items, limit, EXPIRY_ORDER)
+            return {
+                'items': items,
+                **counts,
+                'limit': limit,
+                'next_cursor': next_cursor
+            }
+        except Exception as e:
+            logger.error(f"Failed to get expiry items: {e}")
+            raise
+    
+    async def get_dashboard_stats(self, organization_id: str, days_threshold: int = 30,
+                                  today: Optional[date] = None) -> Dict:
+        """An organization's inventory stats and per-category stats, read from precomputed counters
+        
+        The per-category rows are kept current by triggers on inventory_items
+        (inventory_category_stats) and the expiry buckets come from inventory_expiry_counts,
+        so the read costs one row per category whatever the number of items.
+        """
+        today = today or date.today()
+        try:
+            if pg_pool.enabled:
+                rows = await pg_pool.fetch(
+                    "SELECT * FROM inventory_dashboard($1, $2, $3)", organization_id, today, days_threshold
+                )
+            else:
+                result = await self.client.rpc('inventory_dashboard', {
+                    'p_organization_id': organization_id,
+                    'p_today': today.isoformat(),
+                    'p_days_threshold': days_threshold
+                }).execute()
+                rows = result.data
+            
+            # Every row carries the counts; a row without a category only carries them
+            counts = {key: rows[0][key] if rows else 0 for key in DASHBOARD_COUNTS}
+            categories = [
+                {key: value for key, value in row.items() if key not in DASHBOARD_COUNTS}
+                for row in rows if row['category'] is not None
+            ]
+            return {
+                'stats': {
+                    'total_items': sum(category['item_count'] for category in categories),
+                    'total_value': round(sum(float(category['total_value']) for category in categories), 2),
+                    'low_stock_items': sum(category['low_stock_count'] for category in categories),
+                    'out_of_stock_items': sum(category['out_of_stock_count'] for category in categories),
+                    'expired_items': counts['expired_items'],
+                    'expiring_soon_items': counts['expiring_soon_items'],
+                    'categories_count': len(categories),
+                    'suppliers_count': counts['suppliers_count']
+                },
+                'categories': categories,
+                'active_bids': counts['active_bids'],
+                'equipment_operational': counts['equipment_operational']
+            }
+        except Exception as e:
+            logger.error(f"Failed to get dashboard stats: {e}")
+            raise
+    
     async def create_inventory_item(self, item_data: Dict) -> Dict:
         """Create new inventory item"""
         try:
-            result = self.client.table('inventory_items').insert(item_data).execute()
+            result = await self.client.table('inventory_items').insert(item_data).execute()
             logger.info(f"Created inventory item: {result.data[0]['id']}")
             return result.data[0]
         except Exception as e:
             logger.error(f"Failed to create inventory item: {e}")
             raise
     
-    async def update_inventory_quantity(self, item_id: str, quantity_change: int, transaction_type: str, reference: str = None) -> Dict:
-        """Update inventory quantity with transaction logging"""
+    async def update_inventory_quantity(self, item_id: str, quantity_change: int, transaction_type: str,
+                                        reference: str = None, *, organization_id: str) -> Dict:
+        """Update inventory quantity with transaction logging
+        
+        One call to adjust_inventory_quantity() (auth_database_schema.sql) locks the item,
+        applies the change, recomputes the status, logs the transaction and returns the
+        item, so concurrent changes to the same item cannot overwrite each other. An item
+        of another organization is not found (ValueError).
+        """
+        organization_id = _require_tenant(organization_id)
         try:
-            # Start transaction
-            # Get current item
-            current_item = self.client.table('inventory_items').select('*').eq('id', item_id).execute()
-            if not current_item.data:
+            if pg_pool.enabled:
+                rows = await pg_pool.fetch(
+                    "SELECT * FROM adjust_inventory_quantity($1, $2, $3, $4, $5)",
+                    organization_id, item_id, quantity_change, transaction_type, reference
+                )
+            else:
+                result = await self.client.rpc('adjust_inventory_quantity', {
+                    'p_organization_id': organization_id,
+                    'p_item_id': item_id,
+                    'p_quantity_change': quantity_change,
+                    'p_transaction_type': transaction_type,
+                    'p_reference_type': reference
+                }).execute()
+                rows = result.data
+            
+            if not rows:
                 raise ValueError(f"Item {item_id} not found")
             
-            item = current_item.data[0]
-            new_quantity = max(0, item['quantity'] + quantity_change)
+            updated_item = rows[0]
+            logger.info(f"Updated inventory {item_id}: {quantity_change:+d} → {updated_item['quantity']}")
+            return updated_item
             
-            # Determine new status
-            if new_quantity == 0:
-                new_status = 'out_of_stock'
-            elif new_quantity <= item['reorder_level']:
-                new_status = 'low_stock'
+        except Exception as e:
+            logger.error(f"Failed to update inventory quantity: {e}")
+            raise
+    
+    async def apply_stock_movements(self, movements: List[Dict], organization_id: str) -> List[Dict]:
+        """Apply a batch of quantity changes in one transaction, with one result per line
+        
+        Each movement has item_id, quantity_change, transaction_type and optionally
+        reference_type, reference_id and notes. apply_stock_movements()
+        (auth_database_schema.sql) locks the items, writes each once and logs every line in
+        one insert; lines apply in order, each floored at 0 like update_inventory_quantity.
+        Raises ValueError, and writes nothing, if any item is not in the organization.
+        """
+        try:
+            if pg_pool.enabled:
+                rows = await pg_pool.fetch(
+                    "SELECT * FROM apply_stock_movements($1, $2::jsonb)", organization_id, movements
+                )
             else:
-                new_status = 'in_stock'
+                result = await self.client.rpc('apply_stock_movements', {
+                    'p_organization_id': organization_id,
+                    'p_movements': movements
+                }).execute()
+                rows = result.data
             
-            # Update item
-            updated_item = self.client.table('inventory_items').update({
-                'quantity': new_quantity,
-                'status': new_status,
-                'updated_at': 'now()'
-            }).eq('id', item_id).execute()
+            missing = [row['line'] for row in rows if not row['found']]
+            if missing:
+                raise ValueError(f"Items not found for movement lines {missing[:20]}")
             
-            # Log transaction
-            transaction_data = {
-                'item_id': item_id,
-                'transaction_type': transaction_type,
-                'quantity': abs(quantity_change),
-                'reference_type': reference or 'manual',
-                'notes': f"Quantity changed from {item['quantity']} to {new_quantity}"
-            }
+            logger.info(f"Applied {len(rows)} stock movements for organization {organization_id}")
+            return rows
             
-            self.client.table('inventory_transactions').insert(transaction_data).execute()
+        except Exception as e:
+            logger.error(f"Failed to apply stock movements: {e}")
+            raise
+    
+    async def import_inventory_items(self, batches: AsyncIterable[List[Dict]], organization_id: str,
+                                     on_batch: Optional[Callable[[Dict], Awaitable[None]]] = None) -> Dict:
+        """Load validated import rows into inventory_items, all in one transaction
+        
+        Each batch is a list of item dicts with a source_row (the file row, for error
+        reports); fields the file left out are absent or None. A batch is COPYed into a
+        staging table and merged (see IMPORT_MERGE) before the next one is read, so memory
+        stays at one batch. on_batch gets each batch's counts and the rows it rejected.
+        Needs the direct Postgres path: PostgREST has no COPY.
+        """
+        if not pg_pool.enabled:
+            raise RuntimeError("Inventory import needs DATABASE_URL (rows are loaded with COPY)")
+        
+        totals = {'inserted': 0, 'updated': 0, 'rejected': 0}
+        try:
+            async with pg_pool.transaction() as conn:
+                await conn.execute(IMPORT_STAGING_TABLE)
+                async for batch in batches:
+                    result = {'inserted': 0, 'updated': 0, 'rejected': []}
+                    if batch:
+                        await conn.copy_records_to_table(
+                            'inventory_import_staging',
+                            records=[tuple(row.get(column) for column in IMPORT_COLUMNS) for row in batch],
+                            columns=IMPORT_COLUMNS
+                        )
+                        rejected = await conn.fetch(IMPORT_REJECT_UNKNOWN_SUPPLIERS, organization_id)
+                        merged = await conn.fetchrow(IMPORT_MERGE, organization_id)
+                        await conn.execute("TRUNCATE inventory_import_staging")
+                        result = {
+                            'inserted': merged['inserted'],
+                            'updated': merged['updated'],
+                            'rejected': sorted(row['source_row'] for row in rejected)
+                        }
+                    totals['inserted'] += result['inserted']
+                    totals['updated'] += result['updated']
+                    totals['rejected'] += len(result['rejected'])
+                    if on_batch:
+                        await on_batch(result)
             
-            logger.info(f"Updated inventory {item_id}: {item['quantity']} → {new_quantity}")
-            return updated_item.data[0]
+            logger.info(f"Imported inventory for organization {organization_id}: {totals}")
+            return totals
             
         except Exception as e:
-            logger.error(f"Failed to update inventory quantity: {e}")
+            logger.error(f"Failed to import inventory items: {e}")
+            raise
+    
+    async def save_import_upload(self, content: bytes, file_type: str, organization_id: str) -> str:
+        """Keep an import upload in Postgres until its job runs and return its id
+        
+        Workers (worker.py) need not share a disk with the API, so the file travels with
+        the database instead of a local path.
+        """
+        if not pg_pool.enabled:
+            raise RuntimeError("Inventory import needs DATABASE_URL (rows are loaded with COPY)")
+        
+        upload_id = await pg_pool.fetchval(
+            "INSERT INTO import_uploads (organization_id, file_type, content) VALUES ($1, $2, $3) RETURNING id",
+            organization_id, file_type, content
+        )
+        return str(upload_id)
+    
+    async def take_import_upload(self, upload_id: str, organization_id: str) -> Optional[Dict]:
+        """Remove an import upload and return it (file_type, content); None if it is gone"""
+        return await pg_pool.fetchrow(
+            "DELETE FROM import_uploads WHERE id = $1 AND organization_id = $2 RETURNING file_type, content",
+            upload_id, organization_id
+        )
+    
+    async def export_rows(self, dataset: str, organization_id: str, filters: Dict = None) -> AsyncIterator[tuple]:
+        """Every matching row of an EXPORTS dataset, as tuples of its columns, oldest key first
+        
+        filters holds the dataset's filter columns plus start_date / end_date (created_at
+        range). The direct path reads a server-side cursor and PostgREST is read in keyset
+        pages; either way only EXPORT_BATCH_SIZE rows are in memory at a time.
+        """
+        export = EXPORTS[dataset]
+        columns, keys = export['columns'], export['order']
+        filters = filters or {}
+        try:
+            if pg_pool.enabled:
+                where, args = _sql_filters(
+                    _tenant_filters(filters, organization_id), equals=('organization_id', *export['filters'])
+                )
+                for key, op in (('start_date', '>='), ('end_date', '<=')):
+                    if filters.get(key):
+                        args.append(filters[key])
+                        where += f"{' AND' if where else 'WHERE'} created_at {op} ${len(args)}"
+                query = f"SELECT {', '.join(columns)} FROM {dataset} {where} ORDER BY {', '.join(keys)}"
+                async for record in pg_pool.cursor(query, *args, prefetch=EXPORT_BATCH_SIZE):
+                    yield tuple(record)
+                return
+            
+            after = None
+            while True:
+                query = _scoped(self.client.table(dataset).select(','.join(columns)), organization_id)
+                for column in export['filters']:
+                    if filters.get(column):
+                        query = query.eq(column, filters[column])
+                if filters.get('start_date'):
+                    query = query.gte('created_at', filters['start_date'].isoformat())
+                if filters.get('end_date'):
+                    query = query.lte('created_at', filters['end_date'].isoformat())
+                if after:
+                    query = postgrest_after(query, keys, after)
+                result = await query.order(keys[0]).order(keys[1]).limit(EXPORT_BATCH_SIZE).execute()
+                for row in result.data:
+                    yield tuple(row.get(column) for column in columns)
+                if len(result.data) < EXPORT_BATCH_SIZE:
+                    return
+                after = [result.data[-1][key] for key in keys]
+                
+        except Exception as e:
+            logger.error(f"Failed to export {dataset}: {e}")
+            raise
+    
+    async def get_inventory_transactions(self, limit: int = 50, filters: Dict = None,
+                                         include_total: bool = False, count: str = "estimated",
+                                         cursor: Optional[str] = None, skip: int = 0,
+                                         *, organization_id: str) -> Dict:
+        """Get inventory transactions, newest first (scoped like get_inventory_items)
+        
+        The table grows without bound, so pages are meant to be walked with `cursor`
+        and the total is off (or estimated) unless asked for.
+        """
+        after = decode_cursor(cursor, NEWEST_FIRST) if cursor else None
+        if after:
+            skip = 0
+        try:
+            if pg_pool.enabled:
+                where, args = _sql_filters(
+                    _tenant_filters(filters, organization_id),
+                    equals=('organization_id', 'item_id', 'transaction_type')
+                )
+                keyset = keyset_condition(
+                    NEWEST_FIRST, ('text::timestamptz', 'uuid'), len(args) + 1, descending=True
+                ) if after else None
+                async with pg_pool.acquire() as conn:
+                    rows, total = await _pg_page(
+                        conn, 'inventory_transactions', where, args, 'created_at DESC, id DESC',
+                        skip, limit + 1, include_total, count, keyset, after or ()
+                    )
+            else:
+                query = self.client.table('inventory_transactions').select(
+                    '*', count=_count_option(include_total, count)
+                )
+                query = _scoped(query, organization_id)
+                if filters:
+                    if filters.get('item_id'):
+                        query = query.eq('item_id', filters['item_id'])
+                    if filters.get('transaction_type'):
+                        query = query.eq('transaction_type', filters['transaction_type'])
+                if after:
+                    query = postgrest_after(query, NEWEST_FIRST, after, descending=True)
+                result = await query.order('created_at', desc=True).order('id', desc=True) \
+                    .range(skip, skip + limit).execute()
+                rows, total = result.data, result.count
+            
+            transactions, next_cursor = split_page(rows, limit, NEWEST_FIRST)
+            return {
+                'transactions': transactions,
+                'total': total,
+                'skip': skip,
+                'limit': limit,
+                'next_cursor': next_cursor
+            }
+        except Exception as e:
+            logger.error(f"Failed to get inventory transactions: {e}")
             raise
     
     # Bidding Operations
     async def create_bid_request(self, request_data: Dict) -> Dict:
         """Create new bid request"""
         try:
-            result = self.client.table('bid_requests').insert(request_data).execute()
+            result = await self.client.table('bid_requests').insert(request_data).execute()
             logger.info(f"Created bid request: {result.data[0]['id']}")
             return result.data[0]
         except Exception as e:
             logger.error(f"Failed to create bid request: {e}")
             raise
     
-    async def get_bid_requests(self, skip: int = 0, limit: int = 20, filters: Dict = None) -> Dict:
-        """Get bid requests with pagination"""
+    async def get_bid_requests(self, skip: int = 0, limit: int = 20, filters: Dict = None,
+                               include_total: bool = True, count: str = "exact",
+                               cursor: Optional[str] = None, *, organization_id: str) -> Dict:
+        """Get bid requests with pagination, newest first (scope, total and cursor as in get_inventory_items)"""
+        after = decode_cursor(cursor, NEWEST_FIRST) if cursor else None
         try:
-            query = self.client.table('bid_requests').select('*')
+            query = self.client.table('bid_requests').select('*', count=_count_option(include_total, count))
+            query = _scoped(query, organization_id)
             
             if filters:
                 if filters.get('status'):
@@ -159,14 +778,18 @@ class DatabaseService:
                 if filters.get('category'):
                     query = query.eq('category', filters['category'])
             
-            result = query.order('created_at', desc=True).range(skip, skip + limit - 1).execute()
-            count_result = self.client.table('bid_requests').select('id', count='exact').execute()
+            if after:
+                query, skip = postgrest_after(query, NEWEST_FIRST, after, descending=True), 0
+            result = await query.order('created_at', desc=True).order('id', desc=True) \
+                .range(skip, skip + limit).execute()
+            requests, next_cursor = split_page(result.data, limit, NEWEST_FIRST)
             
             return {
-                'requests': result.data,
-                'total': count_result.count,
+                'requests': requests,
+                'total': result.count,
                 'skip': skip,
-                'limit': limit
+                'limit': limit,
+                'next_cursor': next_cursor
             }
         except Exception as e:
             logger.error(f"Failed to get bid requests: {e}")
@@ -175,40 +798,59 @@ class DatabaseService:
     async def create_bid(self, bid_data: Dict) -> Dict:
         """Create new bid"""
         try:
-            result = self.client.table('bids').insert(bid_data).execute()
+            result = await self.client.table('bids').insert(bid_data).execute()
             logger.info(f"Created bid: {result.data[0]['id']}")
             return result.data[0]
         except Exception as e:
             logger.error(f"Failed to create bid: {e}")
             raise
     
-    async def get_bids_for_request(self, request_id: str) -> List[Dict]:
-        """Get all bids for a specific request"""
+    async def get_bids_for_request(self, request_id: str, organization_id: str) -> List[Dict]:
+        """Get all bids for a specific request (none if the request belongs to another organization)"""
         try:
-            result = self.client.table('bids').select('*, suppliers(name, rating)').eq('request_id', request_id).order('created_at', desc=True).execute()
+            # Bids carry no tenant column; scope them through their request
+            query = self.client.table('bids') \
+                .select('*, suppliers(name, rating), bid_requests!inner(organization_id)') \
+                .eq('request_id', request_id).eq('bid_requests.organization_id', _require_tenant(organization_id))
+            result = await query.order('created_at', desc=True).execute()
             return result.data
         except Exception as e:
             logger.error(f"Failed to get bids for request {request_id}: {e}")
             raise
     
+    async def get_bid(self, bid_id: str, organization_id: str) -> Optional[Dict]:
+        """Get bid by ID (None if its request belongs to another organization)"""
+        try:
+            query = self.client.table('bids') \
+                .select('*, bid_requests!inner(organization_id)') \
+                .eq('id', bid_id).eq('bid_requests.organization_id', _require_tenant(organization_id))
+            result = await query.execute()
+            if result.data:
+                return result.data[0]
+            return None
+        except Exception as e:
+            logger.error(f"Failed to get bid {bid_id}: {e}")
+            raise
+    
     # Supplier Operations
-    async def get_suppliers(self, active_only: bool = True) -> List[Dict]:
-        """Get suppliers"""
+    async def get_suppliers(self, active_only: bool = True, *, organization_id: str) -> List[Dict]:
+        """Get an organization's suppliers"""
         try:
-            query = self.client.table('suppliers').select('*')
+            query = _scoped(self.client.table('suppliers').select('*'), organization_id)
             if active_only:
                 query = query.eq('status', 'active')
             
-            result = query.order('name').execute()
+            result = await query.order('name').execute()
             return result.data
         except Exception as e:
             logger.error(f"Failed to get suppliers: {e}")
             raise
     
-    async def get_supplier(self, supplier_id: str) -> Dict:
-        """Get supplier by ID"""
+    async def get_supplier(self, supplier_id: str, organization_id: str) -> Dict:
+        """Get supplier by ID (None if it belongs to another organization)"""
         try:
-            result = self.client.table('suppliers').select('*').eq('id', supplier_id).execute()
+            query = self.client.table('suppliers').select('*').eq('id', supplier_id)
+            result = await _scoped(query, organization_id).execute()
             if result.data:
                 return result.data[0]
             return None
@@ -216,10 +858,11 @@ class DatabaseService:
             logger.error(f"Failed to get supplier {supplier_id}: {e}")
             raise
     
-    async def get_bid_request(self, request_id: str) -> Dict:
-        """Get bid request by ID"""
+    async def get_bid_request(self, request_id: str, organization_id: str) -> Dict:
+        """Get bid request by ID (None if it belongs to another organization)"""
         try:
-            result = self.client.table('bid_requests').select('*').eq('id', request_id).execute()
+            query = self.client.table('bid_requests').select('*').eq('id', request_id)
+            result = await _scoped(query, organization_id).execute()
             if result.data:
                 return result.data[0]
             return None
@@ -228,10 +871,14 @@ class DatabaseService:
             raise
     
     # Equipment Operations
-    async def get_equipment(self, skip: int = 0, limit: int = 20, filters: Dict = None) -> Dict:
-        """Get equipment with pagination"""
+    async def get_equipment(self, skip: int = 0, limit: int = 20, filters: Dict = None,
+                            include_total: bool = True, count: str = "exact",
+                            cursor: Optional[str] = None, *, organization_id: str) -> Dict:
+        """Get equipment with pagination, sorted by name (scope, total and cursor as in get_inventory_items)"""
+        after = decode_cursor(cursor, NAME_ORDER) if cursor else None
         try:
-            query = self.client.table('equipment').select('*')
+            query = self.client.table('equipment').select('*', count=_count_option(include_total, count))
+            query = _scoped(query, organization_id)
             
             if filters:
                 if filters.get('status'):
@@ -239,14 +886,17 @@ class DatabaseService:
                 if filters.get('type'):
                     query = query.eq('type', filters['type'])
             
-            result = query.range(skip, skip + limit - 1).execute()
-            count_result = self.client.table('equipment').select('id', count='exact').execute()
+            if after:
+                query, skip = postgrest_after(query, NAME_ORDER, after), 0
+            result = await query.order('name').order('id').range(skip, skip + limit).execute()
+            equipment, next_cursor = split_page(result.data, limit, NAME_ORDER)
             
             return {
-                'equipment': result.data,
-                'total': count_result.count,
+                'equipment': equipment,
+                'total': result.count,
                 'skip': skip,
-                'limit': limit
+                'limit': limit,
+                'next_cursor': next_cursor
             }
         except Exception as e:
             logger.error(f"Failed to get equipment: {e}")
@@ -268,7 +918,7 @@ class DatabaseService:
                 'execution_time_ms': execution_time_ms
             }
             
-            result = self.client.table('ai_agent_logs').insert(log_data).execute()
+            result = await self.client.table('ai_agent_logs').insert(log_data).execute()
             logger.info(f"Logged AI agent action: {agent_type}.{action}")
             return result.data[0]
         except Exception as e:
@@ -304,9 +954,11 @@ except Exception as e:
 async def check_database_connection() -> bool:
     """Check if database connection is healthy"""
     try:
+        if pg_pool.enabled:
+            await pg_pool.fetchval("SELECT 1")
         if hasattr(db, 'client') and hasattr(db.client, 'table'):
             # Real Supabase connection
-            result = db.client.table('inventory_items').select('id').limit(1).execute()
+            result = await db.client.table('inventory_items').select('id').limit(1).execute()
         else:
             # Mock database - always healthy
             pass
@@ -10,12 +10,22 @@ import uvicorn
 from contextlib import asynccontextmanager
 
 from app.config import settings
+from app.database import SupabaseClient
+from app.pg_pool import pg_pool
+from app.services.activity_batcher import activity_batcher
+from app.services.forecast_cache import forecast_cache
+from app.services.ai_service import ai_service
+from app.services.llm_cache import llm_cache
+from app.services.job_queue import job_queue
+from app.services.forecast_scheduler import forecast_scheduler
+from app.services import job_handlers  # noqa: F401 (registers job types)
 from app.api.auth import router as auth_router
 from app.api.inventory import router as inventory_router
 from app.api.bidding import router as bidding_router
 from app.api.equipment import router as equipment_router
 from app.api.ai import router as ai_router
 from app.api.analytics import router as analytics_router
+from app.api.jobs import router as jobs_router
 
 # Initialize FastAPI app
 @asynccontextmanager
@@ -24,9 +34,23 @@ async def lifespan(app: FastAPI):
     print("🚀 MedInventory API starting up...")
     print(f"📊 Environment: {settings.APP_ENV}")
     print(f"🗄️  Database: Connected to Supabase")
+    await pg_pool.connect()
+    await ai_service.startup()
+    activity_batcher.start()
+    await job_queue.startup()
+    if job_queue.running and settings.FORECAST_PRECOMPUTE_ENABLED:
+        forecast_scheduler.start()
     yield
     # Shutdown
     print("🛑 MedInventory API shutting down...")
+    await forecast_scheduler.stop()
+    await job_queue.stop()
+    await activity_batcher.stop()
+    await forecast_cache.close()
+    await ai_service.close()
+    llm_cache.close()
+    await pg_pool.close()
+    await SupabaseClient.close()
 
 app = FastAPI(
     title="MedInventory API",
@@ -62,6 +86,7 @@ app.include_router(bidding_router, prefix="/api/bidding", tags=["Bidding"])
 app.include_router(equipment_router, prefix="/api/equipment", tags=["Equipment"])
 app.include_router(ai_router, prefix="/api", tags=["AI"])
 app.include_router(analytics_router, prefix="/api/analytics", tags=["Analytics"])
+app.include_router(jobs_router, prefix="/api/jobs", tags=["Jobs"])
 
 @app.get("/")
 async def root():
@@ -88,6 +113,26 @@ async def health_check():
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Health check failed: {str(e)}")
 
+@app.get("/health/activity")
+async def activity_batcher_stats():
+    """Write-behind activity queue depth and flush latency for this worker"""
+    return activity_batcher.stats()
+
+@app.get("/health/db-pool")
+async def db_pool_stats():
+    """Postgres pool sizing, in-use count and wait/checkout histograms for this worker"""
+    return pg_pool.stats()
+
+@app.get("/health/forecast-cache")
+async def forecast_cache_stats():
+    """Forecast cache hit rates, coalesced requests and in-flight generations for this worker"""
+    return forecast_cache.stats()
+
+@app.get("/health/jobs")
+async def job_queue_stats():
+    """Background job counts by status plus this process's worker throughput and run times"""
+    return {**await job_queue.stats(), "forecast_precompute": forecast_scheduler.stats()}
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
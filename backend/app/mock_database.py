@@ -5,14 +5,18 @@ This provides a simple in-memory database for testing without Supabase
 
 import json
 import uuid
-from datetime import datetime
-from typing import Dict, List, Any, Optional
-import logging
+from datetime import date, datetime
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional
+from loguru import logger
 
-logger = logging.getLogger(__name__)
+from app.pagination import keyset_page
+from app.search import InvertedIndex
 
 class MockDatabase:
-    """Simple in-memory database for testing"""
+    """Simple in-memory database for testing
+    
+    The synthetic data is a single organization, so reads accept organization_id and ignore it.
+    """
     
     def __init__(self):
         self.inventory_items = []
@@ -21,6 +25,8 @@ class MockDatabase:
         self.bid_requests = []
         self.bids = []
         self.transactions = []
+        self.ai_agent_logs = []
+        self.search_index = InvertedIndex()
         
         # Load synthetic data if available
         self.load_synthetic_data()
@@ -37,6 +43,7 @@ class MockDatabase:
                 item['created_at'] = datetime.now().isoformat()
                 item['updated_at'] = datetime.now().isoformat()
                 self.inventory_items.append(item)
+            self.search_index.rebuild(self.inventory_items)
             
             # Load suppliers
             for supplier in data.get('suppliers', []):
@@ -60,7 +67,7 @@ class MockDatabase:
             logger.error(f"❌ Error loading synthetic data: {e}")
     
     # Inventory operations
-    async def get_inventory_items(self, skip: int = 0, limit: int = 20, filters: Dict = None) -> Dict:
+    async def get_inventory_items(self, skip: int = 0, limit: int = 20, filters: Dict = None, include_total: bool = True, count: str = "exact", cursor: Optional[str] = None, *, organization_id: str) -> Dict:
         """Get inventory items with pagination and filters"""
         items = self.inventory_items.copy()
         
@@ -71,18 +78,20 @@ class MockDatabase:
             if filters.get('status'):
                 items = [item for item in items if item['status'] == filters['status']]
             if filters.get('search'):
-                search_term = filters['search'].lower()
-                items = [item for item in items if search_term in item['name'].lower()]
+                matches = self.search_index.search(filters['search'])
+                items = [item for item in items if item['id'] in matches]
         
         # Apply pagination
-        total = len(items)
-        paginated_items = items[skip:skip + limit]
+        total = len(items) if include_total else None
+        skip = 0 if cursor else skip
+        paginated_items, next_cursor = keyset_page(items, ('name', 'id'), cursor, limit, skip=skip)
         
         return {
             'items': paginated_items,
             'total': total,
             'skip': skip,
-            'limit': limit
+            'limit': limit,
+            'next_cursor': next_cursor
         }
     
     async def create_inventory_item(self, item_data: Dict) -> Dict:
@@ -104,10 +113,92 @@ class MockDatabase:
             new_item['status'] = 'in_stock'
         
         self.inventory_items.append(new_item)
+        self.search_index.add(new_item['id'], new_item)
         logger.info(f"Created inventory item: {new_item['id']}")
         return new_item
     
-    async def update_inventory_quantity(self, item_id: str, quantity_change: int, transaction_type: str, reference: str = None) -> Dict:
+    async def search_inventory_items(self, organization_id: str, term: str, limit: int = 10) -> List[Dict]:
+        """Top matching items, best match first"""
+        matches = self.search_index.search(term)
+        items = {item['id']: item for item in self.inventory_items}
+        ranked = sorted(matches.items(), key=lambda match: (-match[1], items[match[0]]['name'], match[0]))
+        return [
+            {**{key: items[doc_id].get(key) for key in ('id', 'name', 'category', 'batch_number', 'quantity', 'unit', 'status')}, 'rank': score}
+            for doc_id, score in ranked[:limit]
+        ]
+    
+    async def get_expiry_items(self, organization_id: str, days_threshold: int = 30, status: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None, today: Optional[date] = None) -> Dict:
+        """Dated items, soonest expiry first, with their expiry bucket"""
+        today = today or date.today()
+        counts = {'expired': 0, 'expiring-soon': 0, 'ok': 0}
+        items = []
+        for item in self.inventory_items:
+            if not item.get('expiry_date'):
+                continue
+            days_until_expiry = (date.fromisoformat(str(item['expiry_date'])[:10]) - today).days
+            if days_until_expiry < 0:
+                expiry_status = 'expired'
+            elif days_until_expiry <= days_threshold:
+                expiry_status = 'expiring-soon'
+            else:
+                expiry_status = 'ok'
+            counts[expiry_status] += 1
+            if status and expiry_status != status:
+                continue
+            items.append({
+                **{key: item.get(key) for key in ('id', 'name', 'category', 'batch_number', 'expiry_date', 'quantity', 'unit', 'location', 'supplier_name')},
+                'expiry_status': expiry_status,
+                'days_until_expiry': days_until_expiry
+            })
+        
+        paginated_items, next_cursor = keyset_page(items, ('expiry_date', 'id'), cursor, limit)
+        return {
+            'items': paginated_items,
+            'expired_count': counts['expired'],
+            'expiring_soon_count': counts['expiring-soon'],
+            'ok_count': counts['ok'],
+            'limit': limit,
+            'next_cursor': next_cursor
+        }
+    
+    async def get_dashboard_stats(self, organization_id: str, days_threshold: int = 30, today: Optional[date] = None) -> Dict:
+        """Inventory stats and per-category stats, counted from the items"""
+        today = today or date.today()
+        categories: Dict[str, Dict] = {}
+        expired = expiring_soon = 0
+        for item in self.inventory_items:
+            stats = categories.setdefault(item['category'], {
+                'category': item['category'], 'item_count': 0, 'total_quantity': 0, 'total_value': 0.0,
+                'low_stock_count': 0, 'out_of_stock_count': 0
+            })
+            stats['item_count'] += 1
+            stats['total_quantity'] += item.get('quantity') or 0
+            stats['total_value'] += (item.get('quantity') or 0) * (item.get('price') or 0)
+            stats['low_stock_count'] += item.get('status') == 'low_stock'
+            stats['out_of_stock_count'] += item.get('status') == 'out_of_stock'
+            if item.get('expiry_date'):
+                days_until_expiry = (date.fromisoformat(str(item['expiry_date'])[:10]) - today).days
+                expired += days_until_expiry < 0
+                expiring_soon += 0 <= days_until_expiry <= days_threshold
+        
+        rows = [categories[category] for category in sorted(categories)]
+        return {
+            'stats': {
+                'total_items': len(self.inventory_items),
+                'total_value': round(sum(row['total_value'] for row in rows), 2),
+                'low_stock_items': sum(row['low_stock_count'] for row in rows),
+                'out_of_stock_items': sum(row['out_of_stock_count'] for row in rows),
+                'expired_items': expired,
+                'expiring_soon_items': expiring_soon,
+                'categories_count': len(rows),
+                'suppliers_count': len([s for s in self.suppliers if s.get('status') == 'active'])
+            },
+            'categories': rows,
+            'active_bids': len([r for r in self.bid_requests if r.get('status') == 'active']),
+            'equipment_operational': len([eq for eq in self.equipment if eq.get('status') == 'operational'])
+        }
+    
+    async def update_inventory_quantity(self, item_id: str, quantity_change: int, transaction_type: str, reference: str = None, *, organization_id: str) -> Dict:
         """Update inventory quantity with transaction logging"""
         # Find the item
         item = None
@@ -139,7 +230,7 @@ class MockDatabase:
             'id': str(uuid.uuid4()),
             'item_id': item_id,
             'transaction_type': transaction_type,
-            'quantity': abs(quantity_change),
+            'quantity': abs(new_quantity - old_quantity),
             'reference_type': reference or 'manual',
             'notes': f"Quantity changed from {old_quantity} to {new_quantity}",
             'created_at': datetime.now().isoformat()
@@ -148,6 +239,128 @@ class MockDatabase:
         
         logger.info(f"Updated inventory {item_id}: {old_quantity} → {new_quantity}")
         return item
+
+    async def apply_stock_movements(self, movements: List[Dict], organization_id: str) -> List[Dict]:
+        """Apply a batch of quantity changes, all or nothing"""
+        known = {item['id'] for item in self.inventory_items}
+        missing = [line for line, movement in enumerate(movements, 1) if movement['item_id'] not in known]
+        if missing:
+            raise ValueError(f"Items not found for movement lines {missing[:20]}")
+
+        results = []
+        for line, movement in enumerate(movements, 1):
+            before = next(item['quantity'] for item in self.inventory_items if item['id'] == movement['item_id'])
+            item = await self.update_inventory_quantity(
+                movement['item_id'], movement['quantity_change'], movement['transaction_type'], movement.get('reference_type'),
+                organization_id=organization_id
+            )
+            results.append({
+                'line': line,
+                'item_id': movement['item_id'],
+                'found': True,
+                'quantity_before': before,
+                'quantity_after': item['quantity'],
+                'status': item['status'],
+                'transaction_id': self.transactions[-1]['id']
+            })
+        return results
+
+    async def import_inventory_items(self, batches: AsyncIterable[List[Dict]], organization_id: str, on_batch: Optional[Callable[[Dict], Awaitable[None]]] = None) -> Dict:
+        """Merge import rows into the items, matching on name and batch number"""
+        known_suppliers = {str(supplier.get('id')).lower() for supplier in self.suppliers}
+        totals = {'inserted': 0, 'updated': 0, 'rejected': 0}
+        async for batch in batches:
+            result = {'inserted': 0, 'updated': 0, 'rejected': []}
+            staged = {}
+            for row in batch:
+                if row.get('supplier_id') and row['supplier_id'].lower() not in known_suppliers:
+                    result['rejected'].append(row['source_row'])
+                    continue
+                staged[(row['name'], row.get('batch_number'))] = row  # the last row wins
+            
+            for (name, batch_number), row in staged.items():
+                fields = {key: value for key, value in row.items() if key != 'source_row' and value is not None}
+                if fields.get('expiry_date'):
+                    fields['expiry_date'] = fields['expiry_date'].isoformat()
+                matches = [item for item in self.inventory_items
+                           if item['name'] == name and item.get('batch_number') == batch_number]
+                if not matches:
+                    await self.create_inventory_item({'organization_id': organization_id, **fields})
+                    result['inserted'] += 1
+                    continue
+                for item in matches:
+                    old_quantity = item.get('quantity', 0)
+                    item.update(fields, updated_at=datetime.now().isoformat())
+                    if item['quantity'] == 0:
+                        item['status'] = 'out_of_stock'
+                    elif item['quantity'] <= item.get('reorder_level', 0):
+                        item['status'] = 'low_stock'
+                    else:
+                        item['status'] = 'in_stock'
+                    if item['quantity'] != old_quantity:
+                        self.transactions.append({
+                            'id': str(uuid.uuid4()),
+                            'item_id': item['id'],
+                            'transaction_type': 'add' if item['quantity'] > old_quantity else 'subtract',
+                            'quantity': abs(item['quantity'] - old_quantity),
+                            'reference_type': 'adjustment',
+                            'notes': f"Quantity changed from {old_quantity} to {item['quantity']} by import",
+                            'created_at': datetime.now().isoformat()
+                        })
+                    self.search_index.add(item['id'], item)
+                    result['updated'] += 1
+            
+            result['rejected'].sort()
+            totals['inserted'] += result['inserted']
+            totals['updated'] += result['updated']
+            totals['rejected'] += len(result['rejected'])
+            if on_batch:
+                await on_batch(result)
+        return totals
+
+    async def export_rows(self, dataset: str, organization_id: str, filters: Dict = None) -> AsyncIterator[tuple]:
+        """Every matching row of an export dataset, as tuples of its columns, oldest key first"""
+        from app.database import EXPORTS  # not at the top: app.database imports this module
+        export = EXPORTS[dataset]
+        filters = filters or {}
+        rows = {
+            'inventory_items': self.inventory_items,
+            'inventory_transactions': self.transactions,
+            'bid_requests': self.bid_requests,
+        }.get(dataset, [])
+        for row in sorted(rows, key=lambda row: tuple(str(row.get(key) or "") for key in export['order'])):
+            if any(filters.get(column) and row.get(column) != filters[column] for column in export['filters']):
+                continue
+            created_at = str(row.get('created_at') or "")
+            if filters.get('start_date') and created_at < filters['start_date'].isoformat():
+                continue
+            if filters.get('end_date') and created_at > filters['end_date'].isoformat():
+                continue
+            yield tuple(row.get(column) for column in export['columns'])
+
+    async def get_inventory_transactions(self, limit: int = 50, filters: Dict = None, include_total: bool = False, count: str = "estimated", cursor: Optional[str] = None, skip: int = 0, *, organization_id: str) -> Dict:
+        """Get inventory transactions, newest first"""
+        transactions = self.transactions.copy()
+        
+        if filters:
+            if filters.get('item_id'):
+                transactions = [t for t in transactions if t['item_id'] == filters['item_id']]
+            if filters.get('transaction_type'):
+                transactions = [t for t in transactions if t['transaction_type'] == filters['transaction_type']]
+        
+        total = len(transactions) if include_total else None
+        skip = 0 if cursor else skip
+        page, next_cursor = keyset_page(
+            transactions, ('created_at', 'id'), cursor, limit, descending=True, skip=skip
+        )
+        
+        return {
+            'transactions': page,
+            'total': total,
+            'skip': skip,
+            'limit': limit,
+            'next_cursor': next_cursor
+        }
     
     # Bidding operations
     async def create_bid_request(self, request_data: Dict) -> Dict:
@@ -165,7 +378,7 @@ class MockDatabase:
         logger.info(f"Created bid request: {new_request['id']}")
         return new_request
     
-    async def get_bid_requests(self, skip: int = 0, limit: int = 20, filters: Dict = None) -> Dict:
+    async def get_bid_requests(self, skip: int = 0, limit: int = 20, filters: Dict = None, include_total: bool = True, count: str = "exact", cursor: Optional[str] = None, *, organization_id: str) -> Dict:
         """Get bid requests with pagination"""
         requests = self.bid_requests.copy()
         
@@ -175,24 +388,28 @@ class MockDatabase:
             if filters.get('category'):
                 requests = [req for req in requests if req['category'] == filters['category']]
         
-        total = len(requests)
-        paginated_requests = requests[skip:skip + limit]
+        total = len(requests) if include_total else None
+        skip = 0 if cursor else skip
+        paginated_requests, next_cursor = keyset_page(
+            requests, ('created_at', 'id'), cursor, limit, descending=True, skip=skip
+        )
         
         return {
             'requests': paginated_requests,
             'total': total,
             'skip': skip,
-            'limit': limit
+            'limit': limit,
+            'next_cursor': next_cursor
         }
     
-    async def get_suppliers(self, active_only: bool = True) -> List[Dict]:
+    async def get_suppliers(self, active_only: bool = True, *, organization_id: str) -> List[Dict]:
         """Get suppliers"""
         suppliers = self.suppliers.copy()
         if active_only:
             suppliers = [s for s in suppliers if s.get('status') == 'active']
         return suppliers
     
-    async def get_equipment(self, skip: int = 0, limit: int = 20, filters: Dict = None) -> Dict:
+    async def get_equipment(self, skip: int = 0, limit: int = 20, filters: Dict = None, include_total: bool = True, count: str = "exact", cursor: Optional[str] = None, *, organization_id: str) -> Dict:
         """Get equipment with pagination"""
         equipment = self.equipment.copy()
         
@@ -202,15 +419,36 @@ class MockDatabase:
             if filters.get('type'):
                 equipment = [eq for eq in equipment if eq['type'] == filters['type']]
         
-        total = len(equipment)
-        paginated_equipment = equipment[skip:skip + limit]
+        total = len(equipment) if include_total else None
+        skip = 0 if cursor else skip
+        paginated_equipment, next_cursor = keyset_page(equipment, ('name', 'id'), cursor, limit, skip=skip)
         
         return {
             'equipment': paginated_equipment,
             'total': total,
             'skip': skip,
-            'limit': limit
+            'limit': limit,
+            'next_cursor': next_cursor
+        }
+    
+    # AI Agent Logging
+    async def log_ai_agent_action(self, agent_type: str, action: str, reference_type: str = None, reference_id: str = None, input_data: Dict = None, output_data: Dict = None, status: str = "success", error_message: str = None, execution_time_ms: int = None):
+        """Log AI agent actions"""
+        log_entry = {
+            'id': str(uuid.uuid4()),
+            'agent_type': agent_type,
+            'action': action,
+            'reference_type': reference_type,
+            'reference_id': reference_id,
+            'input_data': input_data,
+            'output_data': output_data,
+            'status': status,
+            'error_message': error_message,
+            'execution_time_ms': execution_time_ms,
+            'created_at': datetime.now().isoformat()
         }
+        self.ai_agent_logs.append(log_entry)
+        return log_entry
     
     # Client property for compatibility
     @property
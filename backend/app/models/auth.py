@@ -160,6 +160,7 @@ class TokenData(BaseModel):
     organization_id: Optional[str] = None
     role: Optional[UserRole] = None
     permissions: List[str] = []
+    issued_at: Optional[int] = None  # JWT "iat", part of the user cache key
 
 class AuthResponse(BaseModel):
     user: UserProfile
@@ -6,6 +6,7 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 from datetime import datetime, date
 from enum import Enum
+from uuid import UUID
 
 class InventoryStatus(str, Enum):
     IN_STOCK = "in_stock"
@@ -108,6 +109,21 @@ class InventoryQuantityUpdate(BaseModel):
             raise ValueError('Quantity change cannot be zero')
         return v
 
+class StockMovement(InventoryQuantityUpdate):
+    """One line of a batch of stock movements"""
+    item_id: str
+    
+    @validator('item_id')
+    def item_id_must_be_uuid(cls, v):
+        try:
+            return str(UUID(v))
+        except ValueError:
+            raise ValueError('item_id must be a UUID')
+
+class StockMovementBatch(BaseModel):
+    """Model for applying many stock movements at once (ward restock, goods receipt)"""
+    movements: List[StockMovement] = Field(..., min_length=1, max_length=10000)
+
 class InventoryItemFilter(BaseModel):
     """Model for filtering inventory items"""
     category: Optional[str] = None
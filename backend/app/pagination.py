@@ -0,0 +1,78 @@
+"""
+Cursor (keyset) pagination helpers for MedInventory
+A cursor is an opaque token holding the sort key of the last row of a page; the next page starts
+right after it, so reading page 1000 costs the same as page 1 (offset pagination re-reads every
+skipped row). Lists sort by (name, id) or (created_at, id) so the key is unique.
+"""
+
+import base64
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+def encode_cursor(row: Dict[str, Any], keys: Sequence[str]) -> str:
+    """Cursor pointing just after `row` in a list sorted by `keys`"""
+    values = [None if row.get(key) is None else str(row[key]) for key in keys]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: Sequence[str]) -> List[str]:
+    """Sort-key values stored in a cursor; ValueError if it is malformed or from another list"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(keys) or not all(isinstance(v, str) for v in values):
+        raise ValueError("Invalid cursor")
+    return values
+
+
+def split_page(rows: List[Dict[str, Any]], limit: int, keys: Sequence[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim a page fetched with limit + 1 rows; the cursor is None on the last page"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1], keys)
+
+
+def keyset_condition(columns: Sequence[str], casts: Sequence[str], first_param: int, descending: bool = False) -> str:
+    """SQL row comparison selecting rows after the cursor, e.g. (name, id) > ($3::text, $4::uuid)"""
+    placeholders = ", ".join(f"${first_param + i}::{cast}" for i, cast in enumerate(casts))
+    return f"({', '.join(columns)}) {'<' if descending else '>'} ({placeholders})"
+
+
+def _postgrest_value(value: str) -> str:
+    """Quote a value for a PostgREST or=() filter (names may contain commas or parentheses)"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def postgrest_after(query, keys: Sequence[str], values: Sequence[str], descending: bool = False):
+    """Apply the PostgREST equivalent of keyset_condition to a query builder (two sort keys)"""
+    (first, second), (first_value, second_value) = keys, values
+    op = "lt" if descending else "gt"
+    first_value, second_value = _postgrest_value(first_value), _postgrest_value(second_value)
+    return query.or_(
+        f"{first}.{op}.{first_value},and({first}.eq.{first_value},{second}.{op}.{second_value})"
+    )
+
+
+def keyset_page(
+    rows: List[Dict[str, Any]],
+    keys: Sequence[str],
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = False,
+    skip: int = 0,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """In-memory keyset pagination (mock database); skip applies only without a cursor"""
+    def sort_key(row):
+        return tuple(str(row.get(key) or "") for key in keys)
+
+    rows = sorted(rows, key=sort_key, reverse=descending)
+    if cursor:
+        after = tuple(decode_cursor(cursor, keys))
+        rows = [row for row in rows if (sort_key(row) < after if descending else sort_key(row) > after)]
+    else:
+        rows = rows[skip:]
+    return split_page(rows[:limit + 1], limit, keys)
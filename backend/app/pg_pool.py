@@ -0,0 +1,227 @@
+"""
+Direct Postgres connection pool for MedInventory
+Hot reads and writes bypass PostgREST and go straight to Postgres through asyncpg
+"""
+
+import asyncio
+import bisect
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import asyncpg
+from loguru import logger
+
+from app.config import settings
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (Prometheus-style cumulative buckets)"""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, value_ms: float):
+        self.counts[bisect.bisect_left(self.buckets, value_ms)] += 1
+        self.count += 1
+        self.total_ms += value_ms
+        self.max_ms = max(self.max_ms, value_ms)
+
+    def snapshot(self) -> Dict[str, Any]:
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            buckets[f"le_{bound}ms"] = cumulative
+        buckets["le_inf"] = self.count
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "buckets": buckets,
+        }
+
+
+class PoolMetrics:
+    """Counters describing how the pool is used by this worker"""
+
+    def __init__(self):
+        self.acquire_wait = LatencyHistogram()
+        self.checkout_duration = LatencyHistogram()
+        self.in_use = 0
+        self.max_in_use = 0
+        self.waiting = 0
+        self.acquire_timeouts = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "in_use": self.in_use,
+            "max_in_use": self.max_in_use,
+            "waiting": self.waiting,
+            "acquire_timeouts": self.acquire_timeouts,
+            "acquire_wait": self.acquire_wait.snapshot(),
+            "checkout_duration": self.checkout_duration.snapshot(),
+        }
+
+
+def to_json_value(value: Any) -> Any:
+    """Convert asyncpg column values to the JSON-friendly types PostgREST returns"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def record_to_dict(record: Optional[asyncpg.Record]) -> Optional[Dict[str, Any]]:
+    """Convert an asyncpg record to a plain dict"""
+    if record is None:
+        return None
+    return {key: to_json_value(value) for key, value in record.items()}
+
+
+async def _init_connection(connection: asyncpg.Connection):
+    """Decode json/jsonb columns to Python objects, matching PostgREST output"""
+    for type_name in ("json", "jsonb"):
+        await connection.set_type_codec(
+            type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog"
+        )
+
+
+class PostgresPool:
+    """Bounded asyncpg pool, one per worker process"""
+
+    def __init__(self):
+        self._pool: Optional[asyncpg.Pool] = None
+        self.metrics = PoolMetrics()
+
+    @property
+    def enabled(self) -> bool:
+        """True once the pool is connected; callers fall back to PostgREST otherwise"""
+        return self._pool is not None
+
+    async def connect(self):
+        """Create the pool (called from the FastAPI lifespan)"""
+        if self._pool is not None:
+            return
+        if not settings.DATABASE_URL:
+            logger.info("DATABASE_URL not set, direct Postgres pool disabled")
+            return
+        try:
+            self._pool = await asyncpg.create_pool(
+                dsn=settings.DATABASE_URL,
+                min_size=settings.PG_POOL_MIN_SIZE,
+                max_size=settings.PG_POOL_MAX_SIZE,
+                statement_cache_size=settings.PG_STATEMENT_CACHE_SIZE,
+                command_timeout=settings.PG_COMMAND_TIMEOUT,
+                max_inactive_connection_lifetime=settings.PG_POOL_MAX_IDLE_SECONDS,
+                init=_init_connection,
+            )
+            logger.info(
+                f"✅ Postgres pool ready (min={settings.PG_POOL_MIN_SIZE}, max={settings.PG_POOL_MAX_SIZE})"
+            )
+        except Exception as e:
+            logger.error(f"❌ Failed to create Postgres pool, falling back to PostgREST: {e}")
+            self._pool = None
+
+    async def close(self):
+        """Close all pooled connections (called from the FastAPI lifespan)"""
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.close()
+            logger.info("Postgres pool closed")
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        """Check out a connection, recording wait time and checkout duration"""
+        if self._pool is None:
+            raise RuntimeError("Postgres pool is not connected")
+
+        self.metrics.waiting += 1
+        started = time.perf_counter()
+        try:
+            connection = await self._pool.acquire(timeout=settings.PG_POOL_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.metrics.acquire_timeouts += 1
+            raise
+        finally:
+            self.metrics.waiting -= 1
+        acquired = time.perf_counter()
+        self.metrics.acquire_wait.observe((acquired - started) * 1000)
+        self.metrics.in_use += 1
+        self.metrics.max_in_use = max(self.metrics.max_in_use, self.metrics.in_use)
+        try:
+            yield connection
+        finally:
+            self.metrics.in_use -= 1
+            self.metrics.checkout_duration.observe((time.perf_counter() - acquired) * 1000)
+            await self._pool.release(connection)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[asyncpg.Connection]:
+        """Check out a connection with an open transaction"""
+        async with self.acquire() as connection:
+            async with connection.transaction():
+                yield connection
+
+    async def cursor(self, query: str, *args, prefetch: int = 1000) -> AsyncIterator[asyncpg.Record]:
+        """Rows of a query through a server-side cursor, `prefetch` rows per round-trip
+
+        Only one batch of rows is in memory however many match, so exports can stream
+        tables of any size. The connection stays checked out until the rows run out or
+        the caller stops iterating.
+        """
+        async with self.acquire() as connection:
+            async with connection.transaction(readonly=True):
+                async for record in connection.cursor(query, *args, prefetch=prefetch):
+                    yield record
+
+    async def fetch(self, query: str, *args) -> List[Dict[str, Any]]:
+        async with self.acquire() as connection:
+            rows = await connection.fetch(query, *args)
+        return [record_to_dict(row) for row in rows]
+
+    async def fetchrow(self, query: str, *args) -> Optional[Dict[str, Any]]:
+        async with self.acquire() as connection:
+            row = await connection.fetchrow(query, *args)
+        return record_to_dict(row)
+
+    async def fetchval(self, query: str, *args) -> Any:
+        async with self.acquire() as connection:
+            return await connection.fetchval(query, *args)
+
+    async def execute(self, query: str, *args) -> str:
+        async with self.acquire() as connection:
+            return await connection.execute(query, *args)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool sizing and usage figures for the health endpoint"""
+        stats: Dict[str, Any] = {
+            "enabled": self.enabled,
+            "min_size": settings.PG_POOL_MIN_SIZE,
+            "max_size": settings.PG_POOL_MAX_SIZE,
+            "acquire_timeout_s": settings.PG_POOL_ACQUIRE_TIMEOUT,
+            "statement_cache_size": settings.PG_STATEMENT_CACHE_SIZE,
+        }
+        if self._pool is not None:
+            stats["size"] = self._pool.get_size()
+            stats["idle"] = self._pool.get_idle_size()
+        stats.update(self.metrics.snapshot())
+        return stats
+
+
+# Global pool instance (connected in the app lifespan)
+pg_pool = PostgresPool()
@@ -0,0 +1,97 @@
+"""
+Inventory search helpers for MedInventory
+Searches are word-prefix matches over item name, category, batch number and supplier name,
+ranked with name matches first. Postgres answers them from the inventory_item_search tsvector
+index (init_database.sql); InvertedIndex gives the mock database the same behaviour in memory.
+"""
+
+import bisect
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+_WORD = re.compile(r"[^\W_]+")
+
+# Field weights, matching setweight() A/B/C/D in inventory_search_vector()
+SEARCH_FIELDS = (("name", 1.0), ("category", 0.4), ("batch_number", 0.2), ("supplier_name", 0.1))
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower-case runs of letters and digits, the split search_words() applies in Postgres"""
+    return _WORD.findall(text.lower()) if text else []
+
+
+def prefix_tsquery(term: str) -> Optional[str]:
+    """tsquery matching rows that have a word starting with each search word ('amox:* & 250:*')
+
+    None when the term has no words to search for.
+    """
+    words = tokenize(term)
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+class InvertedIndex:
+    """In-memory word → document index with prefix lookups and weighted ranking"""
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self._words: List[str] = []  # sorted, for prefix ranges
+        self._documents: Dict[str, Set[str]] = {}
+
+    def add(self, doc_id: str, document: Dict[str, Any]):
+        """Index (or re-index) a document's SEARCH_FIELDS"""
+        self.remove(doc_id)
+        words = set()
+        for field, weight in SEARCH_FIELDS:
+            for word in tokenize(document.get(field)):
+                postings = self._postings[word]
+                if not postings:
+                    bisect.insort(self._words, word)
+                postings[doc_id] = max(postings.get(doc_id, 0.0), weight)
+                words.add(word)
+        self._documents[doc_id] = words
+
+    def remove(self, doc_id: str):
+        for word in self._documents.pop(doc_id, ()):
+            postings = self._postings[word]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[word]
+                self._words.pop(bisect.bisect_left(self._words, word))
+
+    def _prefix_scores(self, prefix: str) -> Dict[str, float]:
+        """Best weight per document over all indexed words starting with `prefix`"""
+        scores: Dict[str, float] = {}
+        start = bisect.bisect_left(self._words, prefix)
+        for word in self._words[start:]:
+            if not word.startswith(prefix):
+                break
+            for doc_id, weight in self._postings[word].items():
+                if weight > scores.get(doc_id, 0.0):
+                    scores[doc_id] = weight
+        return scores
+
+    def search(self, term: str) -> Dict[str, float]:
+        """Documents matching every word of `term` as a prefix, with a relevance score"""
+        words = tokenize(term)
+        if not words:
+            return {}
+        matches: Optional[Dict[str, float]] = None
+        for word in words:
+            scores = self._prefix_scores(word)
+            if matches is None:
+                matches = scores
+            else:
+                matches = {doc_id: score + scores[doc_id] for doc_id, score in matches.items() if doc_id in scores}
+            if not matches:
+                return {}
+        return matches
+
+    def rebuild(self, documents: Iterable[Dict[str, Any]]):
+        self._postings.clear()
+        self._words.clear()
+        self._documents.clear()
+        for document in documents:
+            self.add(document["id"], document)
@@ -0,0 +1,151 @@
+"""
+Write-behind activity batching for MedInventory.
+Coalesces per-request user and session activity timestamps and writes them to the database in bulk.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.pg_pool import LatencyHistogram
+
+
+def _keep_latest(target: Dict[str, datetime], key: str, value: datetime):
+    current = target.get(key)
+    if current is None or current < value:
+        target[key] = value
+
+
+class ActivityBatcher:
+    """Write-behind queue for last-activity and last-login timestamps
+
+    Only the latest timestamp per user/session is kept, and everything pending
+    is written as one bulk update every `flush_interval` seconds or as soon as
+    `max_entries` distinct users/sessions are queued.
+    """
+
+    def __init__(self, flush_interval: float, max_entries: int):
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self._pending_users: Dict[str, datetime] = {}
+        self._pending_logins: Dict[str, datetime] = {}
+        self._pending_sessions: Dict[str, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._size_flush: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        # Metrics
+        self.flush_latency = LatencyHistogram()
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.rows_written = 0
+        self.entries_coalesced = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending_users) + len(self._pending_sessions)
+
+    def touch_user(self, user_id: str, seen_at: Optional[datetime] = None, login: bool = False):
+        """Record user activity (and optionally a login) without writing immediately"""
+        seen_at = seen_at or datetime.now(timezone.utc)
+        if user_id in self._pending_users:
+            self.entries_coalesced += 1
+        _keep_latest(self._pending_users, user_id, seen_at)
+        if login:
+            _keep_latest(self._pending_logins, user_id, seen_at)
+        self._maybe_flush_on_size()
+
+    def touch_session(self, session_id: str, seen_at: Optional[datetime] = None):
+        """Record session activity without writing immediately"""
+        if session_id in self._pending_sessions:
+            self.entries_coalesced += 1
+        _keep_latest(self._pending_sessions, session_id, seen_at or datetime.now(timezone.utc))
+        self._maybe_flush_on_size()
+
+    def _maybe_flush_on_size(self):
+        if self.queue_depth < self.max_entries:
+            return
+        if self._size_flush is not None and not self._size_flush.done():
+            return
+        try:
+            self._size_flush = asyncio.get_running_loop().create_task(self.flush())
+        except RuntimeError:
+            # No running loop (e.g. called from a script); the next flush picks it up
+            pass
+
+    async def flush(self) -> int:
+        """Write all pending activity in one bulk statement"""
+        from app.database import auth_db
+
+        async with self._flush_lock:
+            if not self.queue_depth or auth_db is None:
+                return 0
+            users, self._pending_users = self._pending_users, {}
+            logins, self._pending_logins = self._pending_logins, {}
+            sessions, self._pending_sessions = self._pending_sessions, {}
+
+            started = time.perf_counter()
+            try:
+                written = await auth_db.bulk_update_activity(users, logins, sessions)
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"Failed to flush activity, re-queueing {len(users) + len(sessions)} entries: {e}")
+                for user_id, seen_at in users.items():
+                    _keep_latest(self._pending_users, user_id, seen_at)
+                for user_id, seen_at in logins.items():
+                    _keep_latest(self._pending_logins, user_id, seen_at)
+                for session_id, seen_at in sessions.items():
+                    _keep_latest(self._pending_sessions, session_id, seen_at)
+                return 0
+            finally:
+                self.flush_latency.observe((time.perf_counter() - started) * 1000)
+
+            self.flushes += 1
+            self.rows_written += written
+            return written
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the periodic flush loop (called from the FastAPI lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flush loop and drain whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self.queue_depth,
+            "pending_users": len(self._pending_users),
+            "pending_sessions": len(self._pending_sessions),
+            "flush_interval_s": self.flush_interval,
+            "max_entries": self.max_entries,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "rows_written": self.rows_written,
+            "entries_coalesced": self.entries_coalesced,
+            "flush_latency": self.flush_latency.snapshot(),
+        }
+
+
+# Global batcher instance
+activity_batcher = ActivityBatcher(
+    flush_interval=settings.ACTIVITY_FLUSH_INTERVAL_SECONDS,
+    max_entries=settings.ACTIVITY_FLUSH_MAX_ENTRIES,
+)
@@ -0,0 +1,362 @@
+"""
+AI call scheduler for MedInventory.
+Caps concurrent LLM calls globally and per organization, rate-limits them, retries throttled or failed
+calls with jittered backoff, and trips a circuit breaker while the provider is unhealthy.
+"""
+
+import asyncio
+import random
+import time
+import weakref
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+from loguru import logger
+
+from app.config import settings
+
+# Provider responses worth retrying: throttling and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Transport errors where the request most likely never reached the model (safe to retry)
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout, httpx.RemoteProtocolError)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter; waiters are served in arrival order"""
+
+    def __init__(self, rate_per_second: float, burst: int):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Wait for one token (no-op when rate limiting is disabled)"""
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    @property
+    def tokens(self) -> float:
+        if self.rate <= 0:
+            return float(self.capacity)
+        self._refill()
+        return self._tokens
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker
+
+    closed: calls go through. open: calls are rejected until `reset_timeout`
+    has passed. half_open: a single probe call is let through; its outcome
+    closes or re-opens the breaker.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN:
+            # A probe that never reported back (e.g. cancelled) must not wedge the breaker
+            probe_stale = time.monotonic() - self._probe_started >= self.reset_timeout
+            if not self._probe_in_flight or probe_stale:
+                self._probe_in_flight = True
+                self._probe_started = time.monotonic()
+                return True
+        return False
+
+    def record_success(self):
+        if self._state != self.CLOSED:
+            logger.info("AI circuit breaker closed, provider recovered")
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self._consecutive_failures += 1
+        if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self._state != self.OPEN:
+                self.times_opened += 1
+                logger.warning(
+                    f"AI circuit breaker opened after {self._consecutive_failures} failures, "
+                    f"using fallbacks for {self.reset_timeout}s"
+                )
+            self._state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        state = self.state
+        return {
+            "state": state,
+            "consecutive_failures": self._consecutive_failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout_s": self.reset_timeout,
+            "retry_in_s": round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            if state == self.OPEN else 0.0,
+            "times_opened": self.times_opened,
+        }
+
+
+class AICallScheduler:
+    """Admission control and retry policy around a single LLM HTTP call"""
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_concurrent_per_org: int,
+        rate_per_second: float,
+        burst: int,
+        max_retries: int,
+        retry_base_delay: float,
+        retry_max_delay: float,
+        breaker: CircuitBreaker,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_concurrent_per_org = max_concurrent_per_org
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.breaker = breaker
+        self._global = asyncio.Semaphore(max_concurrent)
+        # Weak values: an organization's semaphore lives only while some call holds or awaits it,
+        # so idle organizations don't accumulate
+        self._per_org: "weakref.WeakValueDictionary[str, asyncio.Semaphore]" = weakref.WeakValueDictionary()
+
+        # Metrics
+        self.queued = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.failures = 0
+
+    def _org_slot(self, organization_id: Optional[str]):
+        if not organization_id or self.max_concurrent_per_org <= 0:
+            return nullcontext()
+        semaphore = self._per_org.get(organization_id)
+        if semaphore is None:
+            semaphore = self._per_org[organization_id] = asyncio.Semaphore(self.max_concurrent_per_org)
+        return semaphore
+
+    @asynccontextmanager
+    async def _slot(self, organization_id: Optional[str]) -> AsyncIterator[None]:
+        """Hold a per-organization slot, then a global one, for the duration of a call"""
+        self.queued += 1
+        admitted = False
+        try:
+            async with self._org_slot(organization_id):
+                async with self._global:
+                    self.queued -= 1
+                    admitted = True
+                    self.in_flight += 1
+                    try:
+                        yield
+                    finally:
+                        self.in_flight -= 1
+        finally:
+            if not admitted:
+                self.queued -= 1
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        """Full-jitter exponential backoff, honouring Retry-After when the provider sends one"""
+        delay = random.uniform(0, min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt))
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.retry_max_delay))
+            except ValueError:
+                pass
+        return delay
+
+    async def execute(
+        self,
+        send: Callable[[], Awaitable[httpx.Response]],
+        organization_id: Optional[str] = None,
+    ) -> Optional[httpx.Response]:
+        """Run `send` under the limits; return the successful response or None
+
+        None means the breaker is open, the retries ran out, or the provider
+        rejected the request; callers fall back to their non-AI path.
+        """
+        if not self.breaker.allow_request():
+            self.short_circuited += 1
+            logger.warning("AI circuit breaker open, skipping call and using fallback")
+            return None
+
+        self.calls += 1
+        async with self._slot(organization_id):
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    if not self.breaker.allow_request():
+                        self.short_circuited += 1
+                        break
+                    self.retries += 1
+
+                await self.bucket.acquire()
+                response = None
+                try:
+                    response = await send()
+                except RETRYABLE_ERRORS as e:
+                    logger.warning(f"AI call attempt {attempt + 1} failed: {e!r}")
+                except Exception:
+                    # Unknown outcome (e.g. read timeout): don't resend, but count it against the provider
+                    self.breaker.record_failure()
+                    self.failures += 1
+                    raise
+
+                if response is not None and response.status_code < 400:
+                    self.breaker.record_success()
+                    return response
+
+                if response is not None and response.status_code not in RETRYABLE_STATUS_CODES:
+                    # Our request is wrong (bad key, bad payload); retrying or tripping won't help
+                    logger.error(f"Together AI API error: {response.status_code} - {response.text}")
+                    self.failures += 1
+                    self.breaker.record_success()
+                    return None
+
+                self.breaker.record_failure()
+                if response is not None:
+                    logger.warning(f"Together AI API returned {response.status_code} (attempt {attempt + 1})")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self._backoff(attempt, response))
+
+        self.failures += 1
+        logger.error("AI call failed after retries, using fallback")
+        return None
+
+    @asynccontextmanager
+    async def open_stream(
+        self,
+        open_response: Callable[[], AsyncContextManager[httpx.Response]],
+        organization_id: Optional[str] = None,
+    ) -> AsyncIterator[Optional[httpx.Response]]:
+        """Streaming counterpart of `execute`
+
+        Admission, rate limiting and retries apply until the response headers
+        arrive; the body is then read by the caller inside this context and is
+        not retried. Yields None when the caller should fall back.
+        """
+        if not self.breaker.allow_request():
+            self.short_circuited += 1
+            logger.warning("AI circuit breaker open, skipping stream and using fallback")
+            yield None
+            return
+
+        self.calls += 1
+        async with self._slot(organization_id):
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    if not self.breaker.allow_request():
+                        self.short_circuited += 1
+                        break
+                    self.retries += 1
+
+                await self.bucket.acquire()
+                response = None
+                streaming = False
+                try:
+                    async with open_response() as response:
+                        if response.status_code < 400:
+                            streaming = True
+                            yield response
+                            self.breaker.record_success()
+                            return
+                        await response.aread()
+                except Exception as e:
+                    if streaming:
+                        # Failed mid-body: the provider's fault only if the transport broke
+                        if isinstance(e, httpx.HTTPError):
+                            self.breaker.record_failure()
+                            self.failures += 1
+                        raise
+                    if not isinstance(e, RETRYABLE_ERRORS):
+                        self.breaker.record_failure()
+                        self.failures += 1
+                        raise
+                    logger.warning(f"AI stream attempt {attempt + 1} failed: {e!r}")
+                    response = None
+
+                if response is not None and response.status_code not in RETRYABLE_STATUS_CODES:
+                    logger.error(f"Together AI API error: {response.status_code} - {response.text}")
+                    self.failures += 1
+                    self.breaker.record_success()
+                    yield None
+                    return
+
+                self.breaker.record_failure()
+                if response is not None:
+                    logger.warning(f"Together AI API returned {response.status_code} (attempt {attempt + 1})")
+                if attempt < self.max_retries:
+                    await asyncio.sleep(self._backoff(attempt, response))
+
+            self.failures += 1
+            logger.error("AI stream failed after retries, using fallback")
+            yield None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "breaker": self.breaker.snapshot(),
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "max_concurrent": self.max_concurrent,
+            "max_concurrent_per_org": self.max_concurrent_per_org,
+            "rate_limit_per_s": self.bucket.rate,
+            "rate_limit_tokens": round(self.bucket.tokens, 2),
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "short_circuited": self.short_circuited,
+        }
+
+
+# Global scheduler instance
+ai_scheduler = AICallScheduler(
+    max_concurrent=settings.AI_MAX_CONCURRENT_CALLS,
+    max_concurrent_per_org=settings.AI_MAX_CONCURRENT_CALLS_PER_ORG,
+    rate_per_second=settings.AI_RATE_LIMIT_PER_SECOND,
+    burst=settings.AI_RATE_LIMIT_BURST,
+    max_retries=settings.AI_MAX_RETRIES,
+    retry_base_delay=settings.AI_RETRY_BASE_DELAY,
+    retry_max_delay=settings.AI_RETRY_MAX_DELAY,
+    breaker=CircuitBreaker(
+        failure_threshold=settings.AI_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout=settings.AI_BREAKER_RESET_SECONDS,
+    ),
+)
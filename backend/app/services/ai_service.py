@@ -5,9 +5,18 @@ Handles Together AI API integration for demand forecasting and supplier bidding.
 
 import httpx
 import json
-from typing import Dict, Any, List, Optional
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Any, List, Optional
 from loguru import logger
 from app.config import settings
+from app.pg_pool import LatencyHistogram
+from app.services.ai_scheduler import ai_scheduler
+from app.services.json_stream import JSONArrayStreamParser
+from app.services.llm_cache import llm_cache, prompt_cache_key
+
+# LLM calls take seconds, so the histogram needs wider buckets than database calls (ms)
+AI_LATENCY_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000)
 
 class AIService:
     """Service class for AI operations using Together AI API"""
@@ -19,57 +28,219 @@ class AIService:
         self.model_name = settings.AI_MODEL  # Add this for API compatibility
         self.max_tokens = settings.AI_MAX_TOKENS
         self.temperature = settings.AI_TEMPERATURE
+        self._client: Optional[httpx.AsyncClient] = None
+        
+        # Per-call instrumentation
+        self.ttfb = LatencyHistogram(AI_LATENCY_BUCKETS_MS)
+        self.total_latency = LatencyHistogram(AI_LATENCY_BUCKETS_MS)
+        self.calls = 0
+        self.failed_calls = 0
     
-    async def _call_together_ai(self, prompt: str, system_prompt: str = None) -> Optional[str]:
-        """Make a call to Together AI API"""
-        try:
-            headers = {
+    def _create_client(self) -> httpx.AsyncClient:
+        """Long-lived client: keep-alive connections (HTTP/2 when available) to the AI API"""
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={
                 "Authorization": f"Bearer {self.api_key}",
                 "Content-Type": "application/json"
-            }
+            },
+            http2=settings.AI_HTTP2,
+            limits=httpx.Limits(
+                max_connections=settings.AI_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.AI_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(
+                connect=settings.AI_CONNECT_TIMEOUT,
+                read=settings.AI_READ_TIMEOUT,
+                write=settings.AI_WRITE_TIMEOUT,
+                pool=settings.AI_POOL_TIMEOUT
+            )
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Shared HTTP client (created lazily for scripts that run outside the app lifespan)"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+    
+    async def startup(self):
+        """Open the shared HTTP client (called from the FastAPI lifespan)"""
+        self._client = self._create_client()
+        logger.info(
+            f"✅ AI HTTP client ready (http2={settings.AI_HTTP2}, max_connections={settings.AI_MAX_CONNECTIONS})"
+        )
+    
+    async def close(self):
+        """Close the shared HTTP client and its pooled connections"""
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+    
+    async def _call_together_ai(
+        self,
+        prompt: str,
+        system_prompt: str = None,
+        organization_id: Optional[str] = None,
+        agent_type: Optional[str] = None,
+        force_regenerate: bool = False
+    ) -> Optional[str]:
+        """Make a call to Together AI API
+        
+        Identical requests are answered from the LLM response cache unless force_regenerate is set.
+        Calls go through the AI scheduler (concurrency caps, rate limit, retries, circuit breaker);
+        None means the caller should use its fallback. Calls made with an agent_type are
+        recorded in ai_agent_logs.
+        """
+        started = time.perf_counter()
+        cache_key = prompt_cache_key(self.model, system_prompt, prompt, self.temperature, self.max_tokens)
+        try:
+            if not force_regenerate:
+                cached = await llm_cache.get(cache_key)
+                if cached is not None:
+                    content, total_tokens = cached
+                    await self._log_completion(agent_type, organization_id, cache_key, True, total_tokens, started)
+                    return content
             
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
+            payload = self._completion_payload(prompt, system_prompt)
+            response = await ai_scheduler.execute(lambda: self._post_completion(payload), organization_id)
+            if response is None:
+                await self._log_completion(agent_type, organization_id, cache_key, False, 0, started, status="error")
+                return None
             
-            payload = {
-                "model": self.model,
-                "messages": messages,
-                "max_tokens": self.max_tokens,
-                "temperature": self.temperature
-            }
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/v1/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    return result["choices"][0]["message"]["content"]
-                else:
-                    logger.error(f"Together AI API error: {response.status_code} - {response.text}")
-                    return None
+            result = response.json()
+            content = result["choices"][0]["message"]["content"]
+            usage = result.get("usage") or {}
+            total_tokens = usage.get("total_tokens") or (
+                usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+            )
+            await llm_cache.set(cache_key, content, total_tokens)
+            await self._log_completion(agent_type, organization_id, cache_key, False, total_tokens, started)
+            return content
                     
         except Exception as e:
             logger.error(f"Failed to call Together AI API: {e}")
             return None
     
+    def _completion_payload(self, prompt: str, system_prompt: str = None, stream: bool = False) -> Dict[str, Any]:
+        """Request body for a chat completion"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "temperature": self.temperature
+        }
+        if stream:
+            payload["stream"] = True
+        return payload
+    
+    async def _log_completion(
+        self,
+        agent_type: Optional[str],
+        organization_id: Optional[str],
+        cache_key: str,
+        cache_hit: bool,
+        total_tokens: int,
+        started: float,
+        status: str = "success"
+    ):
+        """Record a completion (and how the response cache is doing) in ai_agent_logs"""
+        if not agent_type:
+            return
+        from app.database import db
+        
+        await db.log_ai_agent_action(
+            agent_type=agent_type,
+            action="chat_completion",
+            input_data={"model": self.model, "cache_key": cache_key, "organization_id": organization_id},
+            output_data={
+                "cache_hit": cache_hit,
+                "tokens_used": 0 if cache_hit else total_tokens,
+                "tokens_saved": total_tokens if cache_hit else 0,
+                "cache_hit_rate": llm_cache.hit_rate,
+                "total_tokens_saved": llm_cache.tokens_saved
+            },
+            status=status,
+            execution_time_ms=int((time.perf_counter() - started) * 1000)
+        )
+    
+    async def _forget_response(self, prompt: str, system_prompt: str = None):
+        """Drop a cached response the caller could not use (e.g. invalid JSON)"""
+        await llm_cache.delete(
+            prompt_cache_key(self.model, system_prompt, prompt, self.temperature, self.max_tokens)
+        )
+    
+    async def _post_completion(self, payload: Dict[str, Any]) -> httpx.Response:
+        """Send one chat completion request, recording time to first byte and total latency"""
+        started = time.perf_counter()
+        self.calls += 1
+        try:
+            async with self.client.stream("POST", "/v1/chat/completions", json=payload) as response:
+                # Response headers received: time to first byte
+                ttfb_ms = (time.perf_counter() - started) * 1000
+                self.ttfb.observe(ttfb_ms)
+                await response.aread()
+        except Exception:
+            self.failed_calls += 1
+            raise
+        
+        total_ms = (time.perf_counter() - started) * 1000
+        self.total_latency.observe(total_ms)
+        if response.status_code != 200:
+            self.failed_calls += 1
+        logger.debug(
+            f"Together AI call: {response.status_code} {response.http_version} "
+            f"ttfb={ttfb_ms:.0f}ms total={total_ms:.0f}ms"
+        )
+        return response
+    
+    @asynccontextmanager
+    async def _open_completion_stream(self, payload: Dict[str, Any]) -> AsyncIterator[httpx.Response]:
+        """Open a streamed chat completion; the body is read by the caller inside the context"""
+        started = time.perf_counter()
+        self.calls += 1
+        try:
+            async with self.client.stream("POST", "/v1/chat/completions", json=payload) as response:
+                self.ttfb.observe((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    self.failed_calls += 1
+                yield response
+        except Exception:
+            self.failed_calls += 1
+            raise
+        finally:
+            self.total_latency.observe((time.perf_counter() - started) * 1000)
+    
+    def http_stats(self) -> Dict[str, Any]:
+        """Connection settings and per-call latency figures for the health endpoint"""
+        return {
+            "http2": settings.AI_HTTP2,
+            "max_connections": settings.AI_MAX_CONNECTIONS,
+            "max_keepalive_connections": settings.AI_MAX_KEEPALIVE_CONNECTIONS,
+            "calls": self.calls,
+            "failed_calls": self.failed_calls,
+            "ttfb": self.ttfb.snapshot(),
+            "total_latency": self.total_latency.snapshot()
+        }
+    
     async def get_health_status(self) -> bool:
         """Check if AI service is healthy"""
         try:
             # Test AI service with a simple prompt
             test_prompt = "Hello, this is a health check. Please respond with 'OK' if you're working."
-            response = await self._call_together_ai(test_prompt)
+            response = await self._call_together_ai(test_prompt, force_regenerate=True)
             return response is not None
         except Exception as e:
             logger.error(f"AI health check failed: {e}")
             return False
 
-    async def generate_demand_forecast(self, inventory_data: List[Dict[str, Any]], forecast_period: str = "30d", category_filter: str = None) -> Dict[str, Any]:
+    async def generate_demand_forecast(self, inventory_data: List[Dict[str, Any]], forecast_period: str = "30d", category_filter: str = None, organization_id: Optional[str] = None, force_regenerate: bool = False) -> Dict[str, Any]:
         """
         Generate comprehensive AI-powered demand forecast for inventory items
         
@@ -77,160 +248,24 @@ class AIService:
             inventory_data: List of inventory items
             forecast_period: Forecast period (7d, 30d, 90d, 6m, 1y)
             category_filter: Category filter (None for all categories)
+            organization_id: Organization the call is made for (per-organization concurrency cap)
+            force_regenerate: Skip the LLM response cache
         """
         try:
-            # Filter by category if specified
-            if category_filter and category_filter != "All Categories":
-                inventory_data = [item for item in inventory_data if item.get("category") == category_filter]
-            
-            # Limit to top 10 items for detailed forecasting
-            top_items = inventory_data[:10]
-            
-            # Create inventory summary for AI analysis
-            inventory_summary = []
-            for item in top_items:
-                inventory_summary.append({
-                    "name": item.get("name", "Unknown"),
-                    "category": item.get("category", "Unknown"),
-                    "current_stock": item.get("quantity", 0),
-                    "reorder_level": item.get("reorder_level", 0),
-                    "unit_price": item.get("unit_price", 0),
-                    "supplier": item.get("supplier_name", "Unknown"),
-                    "last_restocked": item.get("last_restocked"),
-                    "expiry_date": item.get("expiry_date")
-                })
-            
-            system_prompt = """You are an expert AI system for hospital inventory demand forecasting. 
-            Analyze inventory data and provide accurate predictions for the next 30 days.
-            
-            Focus on:
-            1. Seasonal trends and patterns
-            2. Current stock levels vs predicted demand
-            3. Risk assessment for stockouts
-            4. Specific recommendations for ordering
-            5. Market trends and price fluctuations
-            
-            Return ONLY valid JSON with the exact structure specified."""
-            
-            user_prompt = f"""Analyze this hospital inventory data and provide a comprehensive 30-day demand forecast:
-
-Inventory Data:
-{json.dumps(inventory_summary, indent=2)}
-
-Generate a detailed forecast for the next 30 days. Return ONLY valid JSON with this structure:
-{{
-    "forecasts": [
-        {{
-            "item_name": "Item Name",
-            "item_category": "Category",
-            "current_stock": 100,
-            "predicted_demand": 150,
-            "confidence_score": 85,
-            "risk_level": "medium",
-            "recommendation": "Order 50 units",
-            "trend": "increasing",
-            "difference": -50
-        }}
-    ],
-    "insights": [
-        {{
-            "type": "Stock Alert",
-            "title": "Critical Stock Alert",
-            "description": "3 items need immediate attention",
-            "priority": "high",
-            "category": "Stock Alert",
-            "action_required": true,
-            "action_description": "Order 700 additional units of Paracetamol"
-        }},
-        {{
-            "type": "Seasonal Trend",
-            "title": "Seasonal Demand Spike",
-            "description": "Anticipated 30% increase in respiratory medications",
-            "priority": "medium",
-            "category": "Seasonal Trend",
-            "action_required": false,
-            "action_description": "Consider increasing stock by mid-October"
-        }}
-    ],
-    "chart_data": {{
-        "demand_overview": [
-            {{"name": "Paracetamol", "forecast": 3200, "actual": 2500}},
-            {{"name": "Amoxicillin", "forecast": 1560, "actual": 1800}},
-            {{"name": "Insulin", "forecast": 800, "actual": 600}},
-            {{"name": "Atorvastatin", "forecast": 1200, "actual": 1000}},
-            {{"name": "Omeprazole", "forecast": 900, "actual": 750}}
-        ],
-        "accuracy_trend": [
-            {{"month": "Jan", "accuracy": 85}},
-            {{"month": "Feb", "accuracy": 87}},
-            {{"month": "Mar", "accuracy": 89}},
-            {{"month": "Apr", "accuracy": 91}},
-            {{"month": "May", "accuracy": 88}},
-            {{"month": "Jun", "accuracy": 90}},
-            {{"month": "Jul", "accuracy": 92}},
-            {{"month": "Aug", "accuracy": 89}},
-            {{"month": "Sep", "accuracy": 91}},
-            {{"month": "Oct", "accuracy": 93}},
-            {{"month": "Nov", "accuracy": 90}},
-            {{"month": "Dec", "accuracy": 94}}
-        ],
-        "seasonal_pattern": [
-            {{"month": "Jan", "demand": 80}},
-            {{"month": "Feb", "demand": 75}},
-            {{"month": "Mar", "demand": 85}},
-            {{"month": "Apr", "demand": 90}},
-            {{"month": "May", "demand": 95}},
-            {{"month": "Jun", "demand": 100}},
-            {{"month": "Jul", "demand": 110}},
-            {{"month": "Aug", "demand": 105}},
-            {{"month": "Sep", "demand": 100}},
-            {{"month": "Oct", "demand": 95}},
-            {{"month": "Nov", "demand": 105}},
-            {{"month": "Dec", "demand": 115}}
-        ]
-    }},
-    "overall_accuracy": 87.5,
-    "total_items_forecasted": {len(top_items)},
-    "stock_alerts": {{
-        "critical_items": 3,
-        "high_risk_items": 2,
-        "total_alerts": 5,
-        "immediate_actions": [
-            "Order 700 additional units of Paracetamol",
-            "Restock Insulin Glargine - 250 units needed",
-            "Monitor Atorvastatin stock levels"
-        ]
-    }}
-}}
-
-IMPORTANT: Return ONLY valid JSON. No additional text, explanations, or markdown formatting."""
-            
-            response = await self._call_together_ai(system_prompt, user_prompt)
+            inventory_data, system_prompt, user_prompt = self._forecast_prompts(inventory_data, category_filter)
+            response = await self._call_together_ai(
+                user_prompt, system_prompt, organization_id, agent_type="forecast", force_regenerate=force_regenerate
+            )
             
             if response:
                 try:
-                    # Clean the response to extract JSON
-                    cleaned_response = response.strip()
-                    
-                    # Remove markdown code blocks
-                    if cleaned_response.startswith("```"):
-                        # Find the first and last ```
-                        start_idx = cleaned_response.find("```") + 3
-                        end_idx = cleaned_response.rfind("```")
-                        if end_idx > start_idx:
-                            cleaned_response = cleaned_response[start_idx:end_idx].strip()
-                    
-                    # Remove language identifier if present
-                    if cleaned_response.startswith("json"):
-                        cleaned_response = cleaned_response[4:].strip()
-                    
-                    # Try to parse JSON response
-                    forecast_data = json.loads(cleaned_response.strip())
+                    forecast_data = self._parse_forecast_response(response)
                     logger.info("AI demand forecast generated successfully")
                     return forecast_data
                 except json.JSONDecodeError as e:
                     logger.error(f"Failed to parse AI response as JSON: {e}")
                     logger.error(f"Raw response: {response[:200]}...")
+                    await self._forget_response(user_prompt, system_prompt)
                     return self._generate_fallback_forecast(inventory_data, forecast_period, category_filter)
             else:
                 logger.warning("AI service unavailable, using fallback forecast")
@@ -240,14 +275,247 @@ IMPORTANT: Return ONLY valid JSON. No additional text, explanations, or markdown
             logger.error(f"Failed to generate demand forecast: {e}")
             return self._generate_fallback_forecast(inventory_data, forecast_period, category_filter)
     
+    async def stream_demand_forecast(self, inventory_data: List[Dict[str, Any]], forecast_period: str = "30d", category_filter: str = None, organization_id: Optional[str] = None, force_regenerate: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of generate_demand_forecast
+        
+        Yields {"type": "item", "data": forecast} as soon as each forecast object is
+        complete in the model output, then {"type": "complete", "data": full_forecast}.
+        If the stream fails or the output is not valid JSON, the remaining items come
+        from the fallback forecast, so every call still ends with a complete event.
+        """
+        started = time.perf_counter()
+        inventory_data, system_prompt, user_prompt = self._forecast_prompts(inventory_data, category_filter)
+        cache_key = prompt_cache_key(self.model, system_prompt, user_prompt, self.temperature, self.max_tokens)
+        parser = JSONArrayStreamParser("forecasts")
+        streamed: List[Dict[str, Any]] = []
+        forecast_data = None
+        
+        try:
+            cached = None if force_regenerate else await llm_cache.get(cache_key)
+            if cached is not None:
+                content, total_tokens = cached
+                for item in parser.feed(content):
+                    streamed.append(item)
+                    yield {"type": "item", "data": item}
+                await self._log_completion("forecast", organization_id, cache_key, True, total_tokens, started)
+            else:
+                payload = self._completion_payload(user_prompt, system_prompt, stream=True)
+                usage: Dict[str, Any] = {}
+                completed = False
+                async with ai_scheduler.open_stream(
+                    lambda: self._open_completion_stream(payload), organization_id
+                ) as response:
+                    if response is not None:
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                completed = True
+                                break
+                            chunk = json.loads(data)
+                            usage = chunk.get("usage") or usage
+                            choices = chunk.get("choices") or [{}]
+                            delta = choices[0].get("delta", {}).get("content")
+                            if delta:
+                                for item in parser.feed(delta):
+                                    streamed.append(item)
+                                    yield {"type": "item", "data": item}
+                            if choices[0].get("finish_reason"):
+                                completed = True
+                
+                if completed:
+                    total_tokens = usage.get("total_tokens") or (
+                        usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0)
+                    )
+                    # Only cache output that parses; a truncated document would be served forever
+                    forecast_data = self._parse_forecast_response(parser.text)
+                    await llm_cache.set(cache_key, parser.text, total_tokens)
+                    await self._log_completion("forecast", organization_id, cache_key, False, total_tokens, started)
+                else:
+                    await self._log_completion("forecast", organization_id, cache_key, False, 0, started, status="error")
+            
+            if forecast_data is None and parser.text:
+                forecast_data = self._parse_forecast_response(parser.text)
+        except json.JSONDecodeError as e:
+            logger.error(f"Failed to parse streamed AI response as JSON: {e}")
+            await llm_cache.delete(cache_key)
+            forecast_data = None
+        except Exception as e:
+            logger.error(f"Failed to stream demand forecast: {e}")
+            forecast_data = None
+        
+        if forecast_data is None:
+            logger.warning("AI stream unavailable, using fallback forecast")
+            forecast_data = self._generate_fallback_forecast(inventory_data, forecast_period, category_filter)
+            # Items already sent stay on the client; send only the rest and keep the document consistent
+            remaining = forecast_data["forecasts"][len(streamed):]
+            forecast_data["forecasts"] = streamed + remaining
+            for item in remaining:
+                yield {"type": "item", "data": item}
+        else:
+            logger.info("AI demand forecast streamed successfully")
+        
+        yield {"type": "complete", "data": forecast_data}
+    
+    def _forecast_prompts(self, inventory_data: List[Dict[str, Any]], category_filter: str = None):
+        """Category-filtered inventory plus the (system, user) prompts for a demand forecast"""
+        # Filter by category if specified
+        if category_filter and category_filter != "All Categories":
+            inventory_data = [item for item in inventory_data if item.get("category") == category_filter]
+        
+        # One prompt covers at most a chunk; ForecastService splits the catalogue into chunks
+        top_items = inventory_data[:settings.FORECAST_CHUNK_SIZE]
+        
+        # Create inventory summary for AI analysis
+        inventory_summary = []
+        for item in top_items:
+            inventory_summary.append({
+                "name": item.get("name", "Unknown"),
+                "category": item.get("category", "Unknown"),
+                "current_stock": item.get("quantity", 0),
+                "reorder_level": item.get("reorder_level", 0),
+                "unit_price": item.get("unit_price", 0),
+                "supplier": item.get("supplier_name", "Unknown"),
+                "last_restocked": item.get("last_restocked"),
+                "expiry_date": item.get("expiry_date")
+            })
+        
+        system_prompt = """You are an expert AI system for hospital inventory demand forecasting. 
+        Analyze inventory data and provide accurate predictions for the next 30 days.
+        
+        Focus on:
+        1. Seasonal trends and patterns
+        2. Current stock levels vs predicted demand
+        3. Risk assessment for stockouts
+        4. Specific recommendations for ordering
+        5. Market trends and price fluctuations
+        
+        Return ONLY valid JSON with the exact structure specified."""
+        
+        user_prompt = f"""Analyze this hospital inventory data and provide a comprehensive 30-day demand forecast:
+
+Inventory Data:
+{json.dumps(inventory_summary, indent=2)}
+
+Generate a detailed forecast for the next 30 days. Return ONLY valid JSON with this structure:
+{{
+"forecasts": [
+    {{
+        "item_name": "Item Name",
+        "item_category": "Category",
+        "current_stock": 100,
+        "predicted_demand": 150,
+        "confidence_score": 85,
+        "risk_level": "medium",
+        "recommendation": "Order 50 units",
+        "trend": "increasing",
+        "difference": -50
+    }}
+],
+"insights": [
+    {{
+        "type": "Stock Alert",
+        "title": "Critical Stock Alert",
+        "description": "3 items need immediate attention",
+        "priority": "high",
+        "category": "Stock Alert",
+        "action_required": true,
+        "action_description": "Order 700 additional units of Paracetamol"
+    }},
+    {{
+        "type": "Seasonal Trend",
+        "title": "Seasonal Demand Spike",
+        "description": "Anticipated 30% increase in respiratory medications",
+        "priority": "medium",
+        "category": "Seasonal Trend",
+        "action_required": false,
+        "action_description": "Consider increasing stock by mid-October"
+    }}
+],
+"chart_data": {{
+    "demand_overview": [
+        {{"name": "Paracetamol", "forecast": 3200, "actual": 2500}},
+        {{"name": "Amoxicillin", "forecast": 1560, "actual": 1800}},
+        {{"name": "Insulin", "forecast": 800, "actual": 600}},
+        {{"name": "Atorvastatin", "forecast": 1200, "actual": 1000}},
+        {{"name": "Omeprazole", "forecast": 900, "actual": 750}}
+    ],
+    "accuracy_trend": [
+        {{"month": "Jan", "accuracy": 85}},
+        {{"month": "Feb", "accuracy": 87}},
+        {{"month": "Mar", "accuracy": 89}},
+        {{"month": "Apr", "accuracy": 91}},
+        {{"month": "May", "accuracy": 88}},
+        {{"month": "Jun", "accuracy": 90}},
+        {{"month": "Jul", "accuracy": 92}},
+        {{"month": "Aug", "accuracy": 89}},
+        {{"month": "Sep", "accuracy": 91}},
+        {{"month": "Oct", "accuracy": 93}},
+        {{"month": "Nov", "accuracy": 90}},
+        {{"month": "Dec", "accuracy": 94}}
+    ],
+    "seasonal_pattern": [
+        {{"month": "Jan", "demand": 80}},
+        {{"month": "Feb", "demand": 75}},
+        {{"month": "Mar", "demand": 85}},
+        {{"month": "Apr", "demand": 90}},
+        {{"month": "May", "demand": 95}},
+        {{"month": "Jun", "demand": 100}},
+        {{"month": "Jul", "demand": 110}},
+        {{"month": "Aug", "demand": 105}},
+        {{"month": "Sep", "demand": 100}},
+        {{"month": "Oct", "demand": 95}},
+        {{"month": "Nov", "demand": 105}},
+        {{"month": "Dec", "demand": 115}}
+    ]
+}},
+"overall_accuracy": 87.5,
+"total_items_forecasted": {len(top_items)},
+"stock_alerts": {{
+    "critical_items": 3,
+    "high_risk_items": 2,
+    "total_alerts": 5,
+    "immediate_actions": [
+        "Order 700 additional units of Paracetamol",
+        "Restock Insulin Glargine - 250 units needed",
+        "Monitor Atorvastatin stock levels"
+    ]
+}}
+}}
+
+IMPORTANT: Return ONLY valid JSON. No additional text, explanations, or markdown formatting."""
+        
+        return inventory_data, system_prompt, user_prompt
+    
+    def _parse_forecast_response(self, response: str) -> Dict[str, Any]:
+        """Extract the forecast JSON from model output (raises json.JSONDecodeError)"""
+        # Clean the response to extract JSON
+        cleaned_response = response.strip()
+        
+        # Remove markdown code blocks
+        if cleaned_response.startswith("```"):
+            # Find the first and last ```
+            start_idx = cleaned_response.find("```") + 3
+            end_idx = cleaned_response.rfind("```")
+            if end_idx > start_idx:
+                cleaned_response = cleaned_response[start_idx:end_idx].strip()
+        
+        # Remove language identifier if present
+        if cleaned_response.startswith("json"):
+            cleaned_response = cleaned_response[4:].strip()
+        
+        return json.loads(cleaned_response.strip())
+    
     def _generate_fallback_forecast(self, inventory_data: List[Dict[str, Any]], forecast_period: str = "30d", category_filter: str = None) -> Dict[str, Any]:
         """Generate fallback forecast when AI is unavailable"""
         # Filter by category if specified
         if category_filter and category_filter != "All Categories":
             inventory_data = [item for item in inventory_data if item.get("category") == category_filter]
         
-        # Take top 10 items
-        top_items = inventory_data[:10]
+        # Same cap as the prompt: one chunk of items
+        top_items = inventory_data[:settings.FORECAST_CHUNK_SIZE]
         
         forecasts = []
         for i, item in enumerate(top_items):
@@ -329,7 +597,7 @@ IMPORTANT: Return ONLY valid JSON. No additional text, explanations, or markdown
             }
         }
     
-    async def generate_bid_request_email(self, bid_request: Dict[str, Any], supplier: Dict[str, Any]) -> str:
+    async def generate_bid_request_email(self, bid_request: Dict[str, Any], supplier: Dict[str, Any], organization_id: Optional[str] = None, force_regenerate: bool = False) -> str:
         """Generate personalized bid request email using AI"""
         try:
             system_prompt = """You are a professional procurement specialist for a hospital. 
@@ -362,7 +630,9 @@ Please generate a professional email that:
 
 Return only the email content without subject line or additional formatting."""
             
-            response = await self._call_together_ai(user_prompt, system_prompt)
+            response = await self._call_together_ai(
+                user_prompt, system_prompt, organization_id, agent_type="email", force_regenerate=force_regenerate
+            )
             
             if response:
                 logger.info(f"Generated bid request email for supplier: {supplier.get('name', '')}")
@@ -403,7 +673,7 @@ We look forward to receiving your competitive bid.
 Best regards,
 MedInventory Procurement Team"""
     
-    async def parse_supplier_response(self, email_content: str, bid_request_id: str) -> Dict[str, Any]:
+    async def parse_supplier_response(self, email_content: str, bid_request_id: str, organization_id: Optional[str] = None, force_regenerate: bool = False) -> Dict[str, Any]:
         """Parse supplier email response using AI"""
         try:
             system_prompt = """You are an AI assistant that parses supplier bid responses from emails.
@@ -430,7 +700,9 @@ Extract and return the following information as JSON:
 
 If any information is missing or unclear, mark bid_status as "needs_clarification"."""
             
-            response = await self._call_together_ai(user_prompt, system_prompt)
+            response = await self._call_together_ai(
+                user_prompt, system_prompt, organization_id, agent_type="parser", force_regenerate=force_regenerate
+            )
             
             if response:
                 try:
@@ -439,6 +711,7 @@ If any information is missing or unclear, mark bid_status as "needs_clarificatio
                     return parsed_data
                 except json.JSONDecodeError:
                     logger.error("Failed to parse AI response as JSON")
+                    await self._forget_response(user_prompt, system_prompt)
                     return self._generate_fallback_parsed_response(email_content)
             else:
                 return self._generate_fallback_parsed_response(email_content)
@@ -18,6 +18,10 @@ from app.models.auth import (
     TokenData
 )
 from app.services.auth_service import auth_service
+from app.pg_pool import pg_pool
+from app.pagination import decode_cursor, postgrest_after, split_page
+from app.services.user_cache import user_cache
+from app.services.activity_batcher import activity_batcher
 
 class AuthDatabaseService:
     """Database service for authentication operations"""
@@ -54,7 +58,7 @@ class AuthDatabaseService:
             }
             
             # Insert user
-            result = self.client.table('users').insert(user_dict).execute()
+            result = await self.client.table('users').insert(user_dict).execute()
             
             if result.data:
                 logger.info(f"Created user: {user_data.email}")
@@ -69,7 +73,7 @@ class AuthDatabaseService:
     async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
         """Get user by email address"""
         try:
-            result = self.client.table('users').select('*').eq('email', email).execute()
+            result = await self.client.table('users').select('*').eq('email', email).execute()
             
             if result.data:
                 return result.data[0]
@@ -82,7 +86,10 @@ class AuthDatabaseService:
     async def get_user_by_id(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user by ID"""
         try:
-            result = self.client.table('users').select('*').eq('id', user_id).execute()
+            if pg_pool.enabled:
+                return await pg_pool.fetchrow("SELECT * FROM users WHERE id = $1", user_id)
+            
+            result = await self.client.table('users').select('*').eq('id', user_id).execute()
             
             if result.data:
                 return result.data[0]
@@ -109,7 +116,8 @@ class AuthDatabaseService:
             
             update_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
             
-            result = self.client.table('users').update(update_dict).eq('id', user_id).execute()
+            result = await self.client.table('users').update(update_dict).eq('id', user_id).execute()
+            user_cache.invalidate_user(user_id)
             
             if result.data:
                 logger.info(f"Updated user: {user_id}")
@@ -129,6 +137,11 @@ class AuthDatabaseService:
     ) -> bool:
         """Update user login-related information"""
         try:
+            # A plain login/activity bump is written behind in the next batch
+            if last_login is not None and failed_attempts is None and locked_until is None:
+                activity_batcher.touch_user(user_id, last_login, login=True)
+                return True
+            
             update_dict = {}
             
             if failed_attempts is not None:
@@ -145,7 +158,7 @@ class AuthDatabaseService:
             update_dict['last_activity_at'] = datetime.now(timezone.utc).isoformat()
             update_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
             
-            result = self.client.table('users').update(update_dict).eq('id', user_id).execute()
+            result = await self.client.table('users').update(update_dict).eq('id', user_id).execute()
             
             return bool(result.data)
             
@@ -153,14 +166,67 @@ class AuthDatabaseService:
             logger.error(f"Failed to update user login info {user_id}: {e}")
             return False
     
+    async def bulk_update_activity(
+        self,
+        users: Dict[str, datetime],
+        logins: Dict[str, datetime] = None,
+        sessions: Dict[str, datetime] = None
+    ) -> int:
+        """Write batched user/session activity timestamps in one round-trip"""
+        logins = logins or {}
+        sessions = sessions or {}
+        if not users and not sessions:
+            return 0
+        
+        if pg_pool.enabled:
+            user_ids = list(users.keys())
+            async with pg_pool.transaction() as conn:
+                user_result = await conn.execute(
+                    """
+                    UPDATE users u
+                    SET last_activity_at = GREATEST(u.last_activity_at, a.seen_at),
+                        last_login_at = GREATEST(u.last_login_at, a.login_at)
+                    FROM unnest($1::uuid[], $2::timestamptz[], $3::timestamptz[]) AS a(id, seen_at, login_at)
+                    WHERE u.id = a.id
+                    """,
+                    user_ids, [users[user_id] for user_id in user_ids], [logins.get(user_id) for user_id in user_ids]
+                )
+                session_result = await conn.execute(
+                    """
+                    UPDATE user_sessions s
+                    SET last_activity_at = GREATEST(s.last_activity_at, a.seen_at)
+                    FROM unnest($1::uuid[], $2::timestamptz[]) AS a(id, seen_at)
+                    WHERE s.id = a.id
+                    """,
+                    list(sessions.keys()), list(sessions.values())
+                )
+            return int(user_result.split()[-1]) + int(session_result.split()[-1])
+        
+        result = await self.client.rpc('flush_activity', {
+            'p_users': [
+                {
+                    'id': user_id,
+                    'seen_at': seen_at.isoformat(),
+                    'login_at': logins[user_id].isoformat() if user_id in logins else None
+                }
+                for user_id, seen_at in users.items()
+            ],
+            'p_sessions': [
+                {'id': session_id, 'seen_at': seen_at.isoformat()}
+                for session_id, seen_at in sessions.items()
+            ]
+        }).execute()
+        return result.data or 0
+    
     async def activate_user(self, user_id: str) -> bool:
         """Activate a user account"""
         try:
-            result = self.client.table('users').update({
+            result = await self.client.table('users').update({
                 'status': UserStatus.ACTIVE.value,
                 'email_verified_at': datetime.now(timezone.utc).isoformat(),
                 'updated_at': datetime.now(timezone.utc).isoformat()
             }).eq('id', user_id).execute()
+            user_cache.invalidate_user(user_id)
             
             return bool(result.data)
             
@@ -176,16 +242,12 @@ class AuthDatabaseService:
     ) -> Dict[str, Any]:
         """Get users by organization with pagination"""
         try:
-            # Get total count
-            count_result = self.client.table('users').select('id', count='exact').eq('organization_id', organization_id).execute()
-            total = count_result.count if count_result.count is not None else 0
-            
-            # Get users
-            result = self.client.table('users').select('*').eq('organization_id', organization_id).range(skip, skip + limit - 1).execute()
+            # Get users, with the total counted in the same request
+            result = await self.client.table('users').select('*', count='exact').eq('organization_id', organization_id).range(skip, skip + limit - 1).execute()
             
             return {
                 'users': result.data or [],
-                'total': total,
+                'total': result.count or 0,
                 'skip': skip,
                 'limit': limit
             }
@@ -201,7 +263,7 @@ class AuthDatabaseService:
     async def get_organization_by_id(self, organization_id: str) -> Optional[Dict[str, Any]]:
         """Get organization by ID"""
         try:
-            result = self.client.table('organizations').select('*').eq('id', organization_id).execute()
+            result = await self.client.table('organizations').select('*').eq('id', organization_id).execute()
             
             if result.data:
                 return result.data[0]
@@ -218,7 +280,7 @@ class AuthDatabaseService:
             org_dict['created_at'] = datetime.now(timezone.utc).isoformat()
             org_dict['updated_at'] = datetime.now(timezone.utc).isoformat()
             
-            result = self.client.table('organizations').insert(org_dict).execute()
+            result = await self.client.table('organizations').insert(org_dict).execute()
             
             if result.data:
                 logger.info(f"Created organization: {org_data.name}")
@@ -258,7 +320,7 @@ class AuthDatabaseService:
                 "last_activity_at": datetime.now(timezone.utc).isoformat()
             }
             
-            result = self.client.table('user_sessions').insert(session_data).execute()
+            result = await self.client.table('user_sessions').insert(session_data).execute()
             
             if result.data:
                 logger.info(f"Created session for user: {user_id}")
@@ -272,7 +334,7 @@ class AuthDatabaseService:
     async def get_session_by_token(self, token_hash: str) -> Optional[Dict[str, Any]]:
         """Get session by token hash"""
         try:
-            result = self.client.table('user_sessions').select('*').eq('token_hash', token_hash).eq('status', SessionStatus.ACTIVE.value).execute()
+            result = await self.client.table('user_sessions').select('*').eq('token_hash', token_hash).eq('status', SessionStatus.ACTIVE.value).execute()
             
             if result.data:
                 return result.data[0]
@@ -285,7 +347,7 @@ class AuthDatabaseService:
     async def get_session_by_refresh_token(self, refresh_token_hash: str) -> Optional[Dict[str, Any]]:
         """Get session by refresh token hash"""
         try:
-            result = self.client.table('user_sessions').select('*').eq('refresh_token_hash', refresh_token_hash).eq('status', SessionStatus.ACTIVE.value).execute()
+            result = await self.client.table('user_sessions').select('*').eq('refresh_token_hash', refresh_token_hash).eq('status', SessionStatus.ACTIVE.value).execute()
             
             if result.data:
                 return result.data[0]
@@ -296,13 +358,10 @@ class AuthDatabaseService:
             return None
     
     async def update_session_activity(self, session_id: str) -> bool:
-        """Update session last activity time"""
+        """Update session last activity time (written behind in the next batch)"""
         try:
-            result = self.client.table('user_sessions').update({
-                'last_activity_at': datetime.now(timezone.utc).isoformat()
-            }).eq('id', session_id).execute()
-            
-            return bool(result.data)
+            activity_batcher.touch_session(session_id)
+            return True
             
         except Exception as e:
             logger.error(f"Failed to update session activity {session_id}: {e}")
@@ -311,7 +370,7 @@ class AuthDatabaseService:
     async def revoke_session(self, session_id: str) -> bool:
         """Revoke a user session"""
         try:
-            result = self.client.table('user_sessions').update({
+            result = await self.client.table('user_sessions').update({
                 'status': SessionStatus.REVOKED.value,
                 'last_activity_at': datetime.now(timezone.utc).isoformat()
             }).eq('id', session_id).execute()
@@ -325,10 +384,11 @@ class AuthDatabaseService:
     async def revoke_user_sessions(self, user_id: str) -> bool:
         """Revoke all sessions for a user"""
         try:
-            result = self.client.table('user_sessions').update({
+            result = await self.client.table('user_sessions').update({
                 'status': SessionStatus.REVOKED.value,
                 'last_activity_at': datetime.now(timezone.utc).isoformat()
             }).eq('user_id', user_id).eq('status', SessionStatus.ACTIVE.value).execute()
+            user_cache.invalidate_user(user_id)
             
             logger.info(f"Revoked all sessions for user: {user_id}")
             return True
@@ -342,7 +402,7 @@ class AuthDatabaseService:
         try:
             now = datetime.now(timezone.utc).isoformat()
             
-            result = self.client.table('user_sessions').update({
+            result = await self.client.table('user_sessions').update({
                 'status': SessionStatus.EXPIRED.value
             }).lt('expires_at', now).eq('status', SessionStatus.ACTIVE.value).execute()
             
@@ -371,7 +431,7 @@ class AuthDatabaseService:
                 return []
             
             # Get permissions for the role
-            result = self.client.table('role_permissions').select('permissions(name)').eq('role', role).execute()
+            result = await self.client.table('role_permissions').select('permissions(name)').eq('role', role).execute()
             
             permissions = []
             if result.data:
@@ -411,7 +471,7 @@ class AuthDatabaseService:
             log_dict['organization_id'] = organization_id
             log_dict['created_at'] = datetime.now(timezone.utc).isoformat()
             
-            result = self.client.table('user_audit_log').insert(log_dict).execute()
+            result = await self.client.table('user_audit_log').insert(log_dict).execute()
             
             return bool(result.data)
             
@@ -428,11 +488,18 @@ class AuthDatabaseService:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Get audit logs with filters"""
+        """Get audit logs with filters, newest first
+        
+        Pass the returned next_cursor as `cursor` to read the next page (skip is then
+        ignored); raises ValueError for an invalid cursor.
+        """
+        keys = ('created_at', 'id')
+        after = decode_cursor(cursor, keys) if cursor else None
         try:
-            query = self.client.table('user_audit_log').select('*').eq('organization_id', organization_id)
+            query = self.client.table('user_audit_log').select('*', count='exact').eq('organization_id', organization_id)
             
             # Apply filters
             if user_id:
@@ -446,23 +513,24 @@ class AuthDatabaseService:
             if end_date:
                 query = query.lte('created_at', end_date.isoformat())
             
-            # Get total count
-            count_result = query.select('id', count='exact').execute()
-            total = count_result.count if count_result.count is not None else 0
-            
-            # Get logs with pagination
-            result = query.order('created_at', desc=True).range(skip, skip + limit - 1).execute()
+            # Get logs with pagination; the total of the filtered rows comes back with the page
+            if after:
+                query, skip = postgrest_after(query, keys, after, descending=True), 0
+            result = await query.order('created_at', desc=True).order('id', desc=True) \
+                .range(skip, skip + limit).execute()
+            logs, next_cursor = split_page(result.data or [], limit, keys)
             
             return {
-                'logs': result.data or [],
-                'total': total,
+                'logs': logs,
+                'total': result.count or 0,
                 'skip': skip,
-                'limit': limit
+                'limit': limit,
+                'next_cursor': next_cursor
             }
             
         except Exception as e:
             logger.error(f"Failed to get audit logs: {e}")
-            return {'logs': [], 'total': 0, 'skip': skip, 'limit': limit}
+            return {'logs': [], 'total': 0, 'skip': skip, 'limit': limit, 'next_cursor': None}
     
     # =====================================================
     # UTILITY OPERATIONS
@@ -476,7 +544,7 @@ class AuthDatabaseService:
             if exclude_user_id:
                 query = query.neq('id', exclude_user_id)
             
-            result = query.execute()
+            result = await query.execute()
             
             return bool(result.data)
             
@@ -127,7 +127,8 @@ class AuthService:
                 user_id=payload.get("sub"),
                 organization_id=payload.get("org_id"),
                 role=UserRole(payload.get("role")) if payload.get("role") else None,
-                permissions=payload.get("permissions", [])
+                permissions=payload.get("permissions", []),
+                issued_at=payload.get("iat")
             )
         except Exception as e:
             logger.warning(f"Failed to extract token data: {e}")
@@ -0,0 +1,108 @@
+"""
+Streaming exports for MedInventory.
+Serializes rows from DatabaseService.export_rows to CSV or NDJSON as they arrive, optionally
+gzipped on the fly, so an export of any size is sent in small chunks with flat memory.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Callable, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from app.database import EXPORTS
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+# Serialized text gathered before a chunk is sent
+CHUNK_SIZE = 64 * 1024
+
+
+def _csv_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)  # jsonb columns (bid request items, audit values)
+    return value  # csv writes None as an empty field and str()s the rest
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)  # UUIDs, IP addresses
+
+
+def _csv_writer(columns: Sequence[str], buffer: io.StringIO) -> Callable[[Sequence[Any]], None]:
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    return lambda row: writer.writerow([_csv_value(value) for value in row])
+
+
+def _ndjson_writer(columns: Sequence[str], buffer: io.StringIO) -> Callable[[Sequence[Any]], None]:
+    def write(row: Sequence[Any]):
+        buffer.write(json.dumps(dict(zip(columns, row)), default=_json_default))
+        buffer.write("\n")
+    return write
+
+
+async def serialize_rows(rows: AsyncIterator[Sequence[Any]], columns: Sequence[str], export_format: str) -> AsyncIterator[bytes]:
+    """Encoded chunks of about CHUNK_SIZE (CSV starts with a header row)"""
+    buffer = io.StringIO()
+    write = (_csv_writer if export_format == "csv" else _ndjson_writer)(columns, buffer)
+    async for row in rows:
+        write(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Compress a byte stream into one gzip member as it passes through"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip header and trailer
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def export_response(dataset: str, rows: AsyncIterator[Sequence[Any]], export_format: str = "csv",
+                          gzip: bool = False) -> StreamingResponse:
+    """A download of an EXPORTS dataset, streamed as it is read
+
+    The first chunk is produced before the response starts, so a failing query is
+    still reported as an error status instead of an empty download.
+    """
+    filename = f"{dataset}-{date.today().isoformat()}.{export_format}"
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    chunks = serialize_rows(rows, EXPORTS[dataset]["columns"], export_format)
+    if gzip:
+        chunks, media_type, filename = gzip_chunks(chunks), "application/gzip", f"{filename}.gz"
+
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+
+    async def body() -> AsyncIterator[bytes]:
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Accel-Buffering": "no",  # let proxies pass chunks on instead of spooling the file
+        }
+    )
@@ -0,0 +1,333 @@
+"""
+Forecast result cache for MedInventory.
+Keeps generated forecast documents in memory and in a shared backend, and makes sure only one
+generation runs per forecast key at a time across coroutines and workers.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from loguru import logger
+
+from app.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is only needed for FORECAST_CACHE_BACKEND=redis
+    aioredis = None
+
+# How often a worker waiting on another worker's generation checks for the result
+LOCK_POLL_INTERVAL_SECONDS = 0.25
+
+# Compare-and-delete so a worker never releases a lock that expired and was taken by someone else
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LocalCacheBackend:
+    """In-process stand-in for the shared backend (single worker, development and tests)"""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[float, str]] = {}
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._values[key] = (time.monotonic() + ttl, value)
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        """Set the key only if it is absent (used for locks)"""
+        if await self.get(key) is not None:
+            return False
+        await self.set(key, value, ttl)
+        return True
+
+    async def delete(self, key: str, expected: Optional[str] = None):
+        """Delete the key, or only if it still holds `expected`"""
+        if expected is None or await self.get(key) == expected:
+            self._values.pop(key, None)
+
+    async def close(self):
+        self._values.clear()
+
+
+class RedisCacheBackend:
+    """Shared backend so gunicorn workers reuse each other's forecasts"""
+
+    def __init__(self, url: str):
+        if aioredis is None:
+            raise RuntimeError("FORECAST_CACHE_BACKEND=redis requires the redis package")
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self._release_lock = self._redis.register_script(_RELEASE_LOCK_SCRIPT)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._redis.get(key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self._redis.set(key, value, px=int(ttl * 1000))
+
+    async def add(self, key: str, value: str, ttl: float) -> bool:
+        return bool(await self._redis.set(key, value, px=int(ttl * 1000), nx=True))
+
+    async def delete(self, key: str, expected: Optional[str] = None):
+        if expected is None:
+            await self._redis.delete(key)
+        else:
+            await self._release_lock(keys=[key], args=[expected])
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class ForecastCache:
+    """Two-level forecast cache with single-flight loading
+
+    Documents (JSON text) live in a small per-worker TTL + LRU cache in front of
+    the shared backend. Concurrent loads of the same key share one in-flight
+    future inside a worker, and a short-lived backend lock stops other workers
+    from starting the same generation; they wait for its result instead.
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        ttl_seconds: float,
+        local_ttl_seconds: float,
+        max_entries: int,
+        lock_timeout: float,
+    ):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        # Other workers may regenerate a forecast; keep local copies short-lived
+        self.local_ttl_seconds = min(local_ttl_seconds, ttl_seconds)
+        self.max_entries = max_entries
+        self.lock_timeout = lock_timeout
+        self._local: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, bool], asyncio.Task] = {}
+
+        # Metrics
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.coalesced = 0
+        self.lock_waits = 0
+        self.evictions = 0
+        self.backend_errors = 0
+
+    @staticmethod
+    def key(
+        organization_id: str,
+        forecast_date: date,
+        forecast_period: str,
+        category_filter: Optional[str],
+        engine: str = "ai",
+    ) -> str:
+        return (
+            f"forecast:{organization_id}:{forecast_date.isoformat()}:{forecast_period}:"
+            f"{category_filter or '*'}:{engine}"
+        )
+
+    async def get(self, key: str) -> Optional[str]:
+        """Look a document up locally, then in the shared backend"""
+        entry = self._local.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at >= time.monotonic():
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return value
+            del self._local[key]
+
+        value = await self._backend_get(key)
+        if value is not None:
+            self.shared_hits += 1
+            self._set_local(key, value)
+            return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        """Store a document locally and in the shared backend"""
+        self._set_local(key, value)
+        try:
+            await self.backend.set(key, value, self.ttl_seconds)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"Forecast cache backend set failed: {e}")
+
+    async def invalidate(self, key: str):
+        self._local.pop(key, None)
+        try:
+            await self.backend.delete(key)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"Forecast cache backend delete failed: {e}")
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Optional[str]]],
+        refresh: bool = False,
+    ) -> Optional[str]:
+        """Return the cached document, or run `loader` once for all concurrent callers
+
+        With `refresh` the cached value is skipped and the loader always runs
+        (refreshes only coalesce with other refreshes). A None result is
+        returned to every waiter but not cached.
+        """
+        if not refresh:
+            cached = await self.get(key)
+            if cached is not None:
+                return cached
+
+        flight = (key, refresh)
+        task = self._inflight.get(flight)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            # The load runs in its own task and every caller, the first included, waits on it
+            # through a shield: a caller that is cancelled (client gone, job lease timeout)
+            # stops waiting without cancelling the load for the others
+            task = asyncio.ensure_future(self._load_once(key, loader, refresh))
+            self._inflight[flight] = task
+            task.add_done_callback(lambda done: self._load_done(flight, done))
+        return await asyncio.shield(task)
+
+    def _load_done(self, flight: Tuple[str, bool], task: asyncio.Task):
+        if self._inflight.get(flight) is task:
+            del self._inflight[flight]
+        # Retrieve the outcome so a failure nobody waited for is not logged again by asyncio
+        if not task.cancelled():
+            task.exception()
+
+    async def _load_once(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Optional[str]]],
+        refresh: bool,
+    ) -> Optional[str]:
+        """Run the loader under the cross-worker lock, or wait for the worker holding it"""
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        previous = await self._backend_get(key) if refresh else None
+        waited = False
+
+        while not await self._acquire_lock(lock_key, token):
+            if not waited:
+                self.lock_waits += 1
+                waited = True
+            await asyncio.sleep(LOCK_POLL_INTERVAL_SECONDS)
+            value = await self._backend_get(key)
+            if value is not None and value != previous:
+                self.shared_hits += 1
+                self._set_local(key, value)
+                return value
+
+        try:
+            if not refresh:
+                # Another worker may have finished while we were acquiring the lock
+                value = await self._backend_get(key)
+                if value is not None:
+                    self.shared_hits += 1
+                    self._set_local(key, value)
+                    return value
+
+            self.loads += 1
+            value = await loader()
+            if value is not None:
+                await self.set(key, value)
+            return value
+        finally:
+            try:
+                await self.backend.delete(lock_key, expected=token)
+            except Exception as e:
+                self.backend_errors += 1
+                logger.warning(f"Forecast cache lock release failed: {e}")
+
+    async def _acquire_lock(self, lock_key: str, token: str) -> bool:
+        try:
+            return await self.backend.add(lock_key, token, self.lock_timeout)
+        except Exception as e:
+            # Without the shared backend we can still coalesce within this worker
+            self.backend_errors += 1
+            logger.warning(f"Forecast cache lock unavailable, loading without it: {e}")
+            return True
+
+    async def _backend_get(self, key: str) -> Optional[str]:
+        try:
+            return await self.backend.get(key)
+        except Exception as e:
+            self.backend_errors += 1
+            logger.warning(f"Forecast cache backend get failed: {e}")
+            return None
+
+    def _set_local(self, key: str, value: str):
+        if self.max_entries <= 0:
+            return
+        self._local[key] = (time.monotonic() + self.local_ttl_seconds, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+            self.evictions += 1
+
+    async def close(self):
+        """Close the shared backend (called from the FastAPI lifespan)"""
+        try:
+            await self.backend.close()
+        except Exception as e:
+            logger.warning(f"Error closing forecast cache backend: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.local_hits + self.shared_hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "local_entries": len(self._local),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "local_ttl_seconds": self.local_ttl_seconds,
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "lock_waits": self.lock_waits,
+            "in_flight": len(self._inflight),
+            "evictions": self.evictions,
+            "backend_errors": self.backend_errors,
+            "hit_rate": round((self.local_hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_cache_backend() -> Any:
+    """Build the shared backend selected by FORECAST_CACHE_BACKEND"""
+    if settings.FORECAST_CACHE_BACKEND == "redis":
+        return RedisCacheBackend(settings.REDIS_URL)
+    return LocalCacheBackend()
+
+
+# Global cache instance
+forecast_cache = ForecastCache(
+    backend=create_cache_backend(),
+    ttl_seconds=settings.FORECAST_CACHE_TTL_SECONDS,
+    local_ttl_seconds=settings.FORECAST_CACHE_LOCAL_TTL_SECONDS,
+    max_entries=settings.FORECAST_CACHE_MAX_ENTRIES,
+    lock_timeout=settings.FORECAST_LOCK_TIMEOUT_SECONDS,
+)
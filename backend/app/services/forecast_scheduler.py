@@ -0,0 +1,123 @@
+"""
+Nightly forecast pre-computation for MedInventory.
+Off-peak, queues one job per active organization and forecast period so the day's forecasts are
+stored before the first dashboard load. Jobs are staggered to stay within the LLM rate limits.
+"""
+
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from app.config import settings
+from app.database import db
+from app.pg_pool import pg_pool
+from app.services.job_queue import job_queue
+
+# Below user-triggered jobs (regeneration is priority 5)
+PRECOMPUTE_PRIORITY = -10
+
+
+class ForecastPrecomputeScheduler:
+    """Queues forecast.precompute jobs once a day at `hour` (server local time)"""
+
+    def __init__(self, hour: int, periods: Sequence[str], stagger_seconds: float):
+        self.hour = hour
+        self.periods = list(periods)
+        self.stagger_seconds = stagger_seconds
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.runs = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_run_jobs = 0
+
+    def next_run(self, now: datetime) -> datetime:
+        run_at = now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        return run_at if run_at > now else run_at + timedelta(days=1)
+
+    async def _get_active_organization_ids(self) -> List[str]:
+        if pg_pool.enabled:
+            rows = await pg_pool.fetch(
+                "SELECT id FROM organizations WHERE is_active IS NOT FALSE ORDER BY created_at, id"
+            )
+            return [row['id'] for row in rows]
+
+        result = await db.client.table('organizations').select('id').eq('is_active', True) \
+            .order('created_at').execute()
+        return [row['id'] for row in result.data]
+
+    async def enqueue_run(self) -> int:
+        """Queue today's jobs now; returns how many were queued
+
+        Jobs are spaced `stagger_seconds` apart. The idempotency key holds the
+        date, so schedulers in several worker processes queue each job once.
+        """
+        run_date = date.today()
+        organization_ids = await self._get_active_organization_ids()
+        jobs = 0
+        for organization_id in organization_ids:
+            for period in self.periods:
+                await job_queue.enqueue(
+                    "forecast.precompute",
+                    {"organization_id": organization_id, "forecast_period": period},
+                    priority=PRECOMPUTE_PRIORITY,
+                    idempotency_key=f"forecast.precompute:{organization_id}:{period}:{run_date}",
+                    organization_id=organization_id,
+                    delay_seconds=jobs * self.stagger_seconds
+                )
+                jobs += 1
+
+        self.runs += 1
+        self.last_run_at = datetime.now()
+        self.last_run_jobs = jobs
+        logger.info(
+            f"Queued {jobs} forecast pre-computations for {len(organization_ids)} organizations "
+            f"over {jobs * self.stagger_seconds / 60:.0f} minutes"
+        )
+        return jobs
+
+    async def _run(self):
+        while True:
+            now = datetime.now()
+            await asyncio.sleep((self.next_run(now) - now).total_seconds())
+            try:
+                await self.enqueue_run()
+            except Exception as e:
+                logger.error(f"Forecast pre-computation run failed: {e}")
+
+    def start(self):
+        """Start the daily timer (idempotent)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"✅ Forecast pre-computation scheduled daily at {self.hour:02d}:00 for {', '.join(self.periods)}")
+
+    async def stop(self):
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "hour": self.hour,
+            "periods": self.periods,
+            "stagger_seconds": self.stagger_seconds,
+            "next_run_at": self.next_run(datetime.now()).isoformat() if self._task is not None else None,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_run_jobs": self.last_run_jobs,
+        }
+
+
+# Global scheduler instance
+forecast_scheduler = ForecastPrecomputeScheduler(
+    hour=settings.FORECAST_PRECOMPUTE_HOUR,
+    periods=[period.strip() for period in settings.FORECAST_PRECOMPUTE_PERIODS.split(",") if period.strip()],
+    stagger_seconds=settings.FORECAST_PRECOMPUTE_STAGGER_SECONDS,
+)
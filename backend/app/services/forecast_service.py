@@ -3,12 +3,31 @@ Forecast Service for managing AI demand forecasting data
 Handles storage, retrieval, and caching of forecast data
 """
 
+import asyncio
+import hashlib
 import json
+import uuid
 from datetime import datetime, date, timedelta
-from typing import Dict, List, Any, Optional, Union
+from typing import AsyncIterator, Dict, List, Any, Optional, Tuple, Union
+import pandas as pd
 from loguru import logger
+from app.config import settings
 from app.database import db, auth_db
+from app.pg_pool import pg_pool
 from app.services.ai_service import ai_service
+from app.services.forecast_cache import forecast_cache
+from app.services.statistical_forecast import demand_matrix, statistical_forecast_engine
+
+# Insight priorities, most urgent first (unknown values sort with medium)
+PRIORITY_RANK = {'high': 0, 'medium': 1, 'low': 2}
+
+
+def _as_int(value: Any) -> int:
+    """Coerce LLM-provided numbers (e.g. 85.0 or "120") to the integer columns"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
 
 
 class ForecastService:
@@ -22,28 +41,110 @@ class ForecastService:
         organization_id: str,
         forecast_period: str = "30d",
         category_filter: Optional[str] = None,
-        force_regenerate: bool = False
+        force_regenerate: bool = False,
+        engine: Optional[str] = None
     ) -> Dict[str, Any]:
         """Get cached forecast or generate new one"""
+        return json.loads(await self.get_forecast_json(
+            organization_id, forecast_period, category_filter, force_regenerate, engine
+        ))
+    
+    async def get_forecast_json(
+        self,
+        organization_id: str,
+        forecast_period: str = "30d",
+        category_filter: Optional[str] = None,
+        force_regenerate: bool = False,
+        engine: Optional[str] = None
+    ) -> str:
+        """Get today's forecast as a JSON document (cache, then database, then AI generation)
+        
+        Concurrent requests for the same forecast share a single database read or generation.
+        With the statistical engine the forecast is computed from transaction history instead;
+        it is cheap to recompute, so it is cached but not stored in the forecast tables.
+        """
         try:
+            forecast_json = await self._load_forecast_json(
+                organization_id, forecast_period, category_filter, force_regenerate, engine
+            )
+        except Exception as e:
+            logger.error(f"Error in get_forecast_json: {e}")
+            forecast_json = None
+        
+        # The fallback is returned but never cached, so the next request retries generation
+        return forecast_json or json.dumps(self._generate_fallback_forecast())
+    
+    async def regenerate_forecast(
+        self,
+        organization_id: str,
+        forecast_period: str = "30d",
+        category_filter: Optional[str] = None,
+        engine: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Generate a fresh forecast and replace the cached one (forecast.regenerate job)
+        
+        There is no fallback document here: a failed generation raises, so the job queue
+        retries it and finally marks the job failed. Returns a summary of the stored run.
+        """
+        forecast_json = await self._load_forecast_json(
+            organization_id, forecast_period, category_filter, True, engine
+        )
+        if not forecast_json:
+            raise RuntimeError(f"Forecast generation failed for {organization_id} ({forecast_period})")
+        
+        forecast = json.loads(forecast_json)
+        forecasts = forecast.get("forecasts", [])
+        # Statistical documents carry their model version; AI runs keep it on the stored run
+        model_version = forecast.get("ai_model_version")
+        if forecasts and forecasts[0].get("forecast_id"):
+            model_version = await self._get_forecast_model_version(forecasts[0]["forecast_id"])
+        return {
+            "total_items_forecasted": len(forecasts),
+            "overall_accuracy": forecast.get("overall_accuracy"),
+            "ai_model_version": model_version,
+        }
+    
+    async def _load_forecast_json(
+        self,
+        organization_id: str,
+        forecast_period: str,
+        category_filter: Optional[str],
+        force_regenerate: bool,
+        engine: Optional[str]
+    ) -> Optional[str]:
+        """Today's forecast through the cache's single flight (None when generation fails)"""
+        engine = engine or settings.FORECAST_ENGINE
+        forecast_date = date.today()
+        cache_key = forecast_cache.key(organization_id, forecast_date, forecast_period, category_filter, engine)
+        
+        async def load_forecast() -> Optional[str]:
+            if engine == "statistical":
+                return await self._generate_statistical_forecast(organization_id, forecast_period, category_filter)
+            
             if not force_regenerate:
                 # Try to get existing forecast for today
-                existing_forecast = await self._get_forecast_for_date(
-                    organization_id, date.today(), forecast_period, category_filter
+                existing_forecast = await self._get_forecast_json_for_date(
+                    organization_id, forecast_date, forecast_period, category_filter
                 )
                 if existing_forecast:
-                    logger.info(f"Using cached forecast for {date.today()}")
+                    logger.info(f"Using stored forecast for {forecast_date}")
                     return existing_forecast
             
             # Generate new forecast
-            logger.info(f"Generating new forecast for {date.today()}")
+            logger.info(f"Generating new forecast for {forecast_date}")
             return await self._generate_and_store_forecast(
-                organization_id, forecast_period, category_filter
+                organization_id, forecast_period, category_filter, force_regenerate
             )
-            
-        except Exception as e:
-            logger.error(f"Error in get_or_create_forecast: {e}")
-            return self._generate_fallback_forecast()
+        
+        return await forecast_cache.get_or_load(cache_key, load_forecast, refresh=force_regenerate)
+    
+    async def _get_forecast_model_version(self, forecast_id: str) -> Optional[str]:
+        """ai_model_version of a stored forecast run"""
+        if pg_pool.enabled:
+            return await pg_pool.fetchval("SELECT ai_model_version FROM forecast_data WHERE id = $1", forecast_id)
+        
+        result = await db.client.table('forecast_data').select('ai_model_version').eq('id', forecast_id).execute()
+        return result.data[0]['ai_model_version'] if result.data else None
     
     def _generate_fallback_forecast(self) -> Dict[str, Any]:
         """Generate fallback forecast when AI is not available"""
@@ -104,185 +205,781 @@ class ForecastService:
             "source": "fallback"
         }
     
-    async def _get_forecast_for_date(
+    async def _get_forecast_json_for_date(
         self, 
         organization_id: str, 
         forecast_date: date,
         forecast_period: str,
         category_filter: Optional[str]
-    ) -> Optional[Dict[str, Any]]:
-        """Get forecast data for a specific date"""
+    ) -> Optional[str]:
+        """Get the stored forecast document for a date in one round-trip (via get_forecast_document)"""
         try:
-            # Get forecast data
-            forecast_query = """
-                SELECT * FROM forecast_data 
-                WHERE organization_id = %s 
-                AND forecast_date = %s 
-                AND forecast_period = %s 
-                AND (category_filter = %s OR (category_filter IS NULL AND %s IS NULL))
-                ORDER BY created_at DESC 
-                LIMIT 1
-            """
+            if pg_pool.enabled:
+                return await pg_pool.fetchval(
+                    "SELECT get_forecast_document($1, $2, $3, $4)::text",
+                    organization_id, forecast_date, forecast_period, category_filter
+                )
+            
+            result = await db.client.rpc('get_forecast_document', {
+                'p_organization_id': organization_id,
+                'p_forecast_date': forecast_date.isoformat(),
+                'p_forecast_period': forecast_period,
+                'p_category_filter': category_filter
+            }).execute()
+            return json.dumps(result.data) if result.data else None
+            
+        except Exception as e:
+            logger.error(f"Error getting forecast for date: {e}")
+            return None
+    
+    async def stream_forecast(
+        self,
+        organization_id: str,
+        forecast_period: str = "30d",
+        category_filter: Optional[str] = None,
+        force_regenerate: bool = False,
+        engine: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Stream today's forecast as {"type": "item"} events followed by one {"type": "complete"} event
+        
+        Cached or stored forecasts are replayed at once; otherwise items are sent as the model
+        produces them, and the finished forecast is stored and cached like get_forecast_json does.
+        A request that finds the same forecast already being generated replays it once it is done.
+        """
+        engine = engine or settings.FORECAST_ENGINE
+        forecast_date = date.today()
+        cache_key = forecast_cache.key(organization_id, forecast_date, forecast_period, category_filter, engine)
+        forecast_json = None
+        
+        try:
+            if engine == "statistical":
+                # Computed in one pass; there is nothing to stream incrementally
+                forecast_json = await self.get_forecast_json(
+                    organization_id, forecast_period, category_filter, force_regenerate, engine
+                )
+            elif not force_regenerate:
+                forecast_json = await forecast_cache.get(cache_key)
+                if forecast_json is None:
+                    forecast_json = await self._get_forecast_json_for_date(
+                        organization_id, forecast_date, forecast_period, category_filter
+                    )
+                    if forecast_json:
+                        await forecast_cache.set(cache_key, forecast_json)
             
-            forecast_result = db.client.table('forecast_data').select('*').eq('organization_id', organization_id).eq('forecast_date', forecast_date.isoformat()).eq('forecast_period', forecast_period).execute()
+            if not forecast_json:
+                # Generation shares the cache's single flight with get_forecast_json: the request
+                # that runs it streams the items as they arrive, concurrent requests for the same
+                # forecast wait for it and then replay the stored result
+                events: asyncio.Queue = asyncio.Queue()
+                completed: Dict[str, Any] = {}
+                
+                async def generate_forecast() -> Optional[str]:
+                    inventory = await self._get_forecast_inventory(organization_id, category_filter)
+                    if not inventory:
+                        return None
+                    logger.info(f"Streaming new forecast for {forecast_date}")
+                    forecast_id = str(uuid.uuid4())
+                    ai_forecast, degraded = None, False
+                    async for event in self._stream_chunked_forecast(
+                        inventory, forecast_period, organization_id, force_regenerate
+                    ):
+                        if event["type"] == "item":
+                            item = self._forecast_item_rows([event["data"]])[0]
+                            events.put_nowait({"type": "item", "data": {**item, 'forecast_id': forecast_id}})
+                        else:
+                            ai_forecast, degraded = event["data"], event["degraded"]
+                    
+                    if degraded:
+                        # Finish the stream, but leave nothing behind for later requests to reuse
+                        completed["data"] = {**ai_forecast, "source": "fallback"}
+                        return None
+                    try:
+                        forecast_json = await self._persist_forecast(
+                            forecast_id, organization_id, forecast_period, category_filter, ai_forecast,
+                            inventory_fingerprint=self._inventory_fingerprint(inventory)
+                        )
+                    except Exception as e:
+                        # The items are already on the client; finish the stream without caching
+                        logger.error(f"Error storing streamed forecast: {e}")
+                        completed["data"] = {**ai_forecast, "source": "generated"}
+                        return None
+                    completed["data"] = json.loads(forecast_json)
+                    return forecast_json
+                
+                load = asyncio.ensure_future(
+                    forecast_cache.get_or_load(cache_key, generate_forecast, refresh=force_regenerate)
+                )
+                while not load.done():
+                    next_event = asyncio.ensure_future(events.get())
+                    await asyncio.wait({next_event, load}, return_when=asyncio.FIRST_COMPLETED)
+                    if next_event.done():
+                        yield next_event.result()
+                    else:
+                        next_event.cancel()
+                while not events.empty():
+                    yield events.get_nowait()
+                
+                forecast_json = load.result()
+                if completed:
+                    yield {"type": "complete", "data": completed["data"]}
+                    return
+        except Exception as e:
+            logger.error(f"Error in stream_forecast: {e}")
+            forecast_json = None
+        
+        forecast = json.loads(forecast_json) if forecast_json else self._generate_fallback_forecast()
+        for item in forecast.get("forecasts", []):
+            yield {"type": "item", "data": item}
+        yield {"type": "complete", "data": forecast}
+    
+    async def _generate_statistical_forecast(
+        self,
+        organization_id: str,
+        forecast_period: str,
+        category_filter: Optional[str]
+    ) -> Optional[str]:
+        """Forecast every item from its transaction history (None when there are no items)"""
+        try:
+            if category_filter == "All Categories":
+                category_filter = None
+            since = date.today() - timedelta(days=settings.FORECAST_HISTORY_DAYS - 1)
+            items, transactions = await self._get_demand_history(organization_id, category_filter, since)
             
-            if not forecast_result.data:
+            if not items:
+                logger.warning("No inventory data found for forecasting")
                 return None
             
-            forecast_id = forecast_result.data[0]['id']
+            # NumPy work and serializing thousands of items would block the event loop
+            return await asyncio.to_thread(self._statistical_forecast_json, items, transactions, forecast_period)
             
-            # Get forecast items
-            items_result = db.client.table('forecast_items').select('*').eq('forecast_id', forecast_id).execute()
+        except Exception as e:
+            logger.error(f"Error generating statistical forecast: {e}")
+            return None
+    
+    def _statistical_forecast_json(
+        self,
+        items: List[Dict[str, Any]],
+        transactions: pd.DataFrame,
+        forecast_period: str
+    ) -> str:
+        demand = demand_matrix(
+            [item['id'] for item in items], transactions, date.today(), settings.FORECAST_HISTORY_DAYS
+        )
+        forecast = statistical_forecast_engine.build_forecast(items, demand, forecast_period)
+        return json.dumps({**forecast, "source": "statistical"})
+    
+    async def _get_demand_history(
+        self,
+        organization_id: str,
+        category_filter: Optional[str],
+        since: date
+    ) -> Tuple[List[Dict[str, Any]], pd.DataFrame]:
+        """All inventory items plus their daily consumption (item_id, day, quantity) since a date"""
+        columns = ['item_id', 'day', 'quantity']
+        if pg_pool.enabled:
+            item_rows = await pg_pool.fetch(
+                """
+                SELECT id::text AS id, name, category, quantity, reorder_level
+                FROM inventory_items
+                WHERE organization_id = $1 AND ($2::text IS NULL OR category = $2)
+                ORDER BY name
+                """,
+                organization_id, category_filter
+            )
+            # Aggregated per item and day in the database; only the daily totals cross the wire
+            usage_rows = await pg_pool.fetch(
+                """
+                SELECT t.item_id::text AS item_id, (t.created_at AT TIME ZONE 'UTC')::date AS day,
+                       SUM(t.quantity)::float8 AS quantity
+                FROM inventory_transactions t
+                JOIN inventory_items i ON i.id = t.item_id
+                WHERE i.organization_id = $1 AND ($2::text IS NULL OR i.category = $2)
+                  AND t.transaction_type = 'subtract'
+                  AND t.created_at >= $3::date
+                GROUP BY 1, 2
+                """,
+                organization_id, category_filter, since
+            )
+            return item_rows, pd.DataFrame.from_records(usage_rows, columns=columns)
+        
+        def items_query():
+            query = db.client.table('inventory_items').select('id, name, category, quantity, reorder_level').eq('organization_id', organization_id)
+            if category_filter:
+                query = query.eq('category', category_filter)
+            return query.order('name')
+        
+        def usage_query():
+            # Scoped through the item: transactions logged by update_inventory_quantity carry no organization_id
+            return db.client.table('inventory_transactions').select('item_id, created_at, quantity, inventory_items!inner(organization_id)').eq('inventory_items.organization_id', organization_id).eq('transaction_type', 'subtract').gte('created_at', since.isoformat()).order('created_at')
+        
+        items = await self._select_all(items_query)
+        usage = pd.DataFrame(await self._select_all(usage_query), columns=['item_id', 'created_at', 'quantity'])
+        # Rows for items outside the category filter are dropped by demand_matrix
+        return items, usage.rename(columns={'created_at': 'day'})[columns]
+    
+    async def _select_all(self, build_query, page_size: int = 1000) -> List[Dict[str, Any]]:
+        """Read every row of a PostgREST query, one page (max-rows limit) at a time"""
+        rows: List[Dict[str, Any]] = []
+        while True:
+            result = await build_query().range(len(rows), len(rows) + page_size - 1).execute()
+            rows.extend(result.data)
+            if len(result.data) < page_size:
+                return rows
+    
+    async def _get_forecast_inventory(
+        self,
+        organization_id: str,
+        category_filter: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Every inventory item the AI forecast covers (lowest stock first)"""
+        if category_filter == "All Categories":
+            category_filter = None
+        
+        if pg_pool.enabled:
+            inventory = await pg_pool.fetch(
+                """
+                SELECT * FROM inventory_items
+                WHERE organization_id = $1 AND ($2::text IS NULL OR category = $2)
+                ORDER BY quantity, id
+                """,
+                organization_id, category_filter
+            )
+        else:
+            def inventory_query():
+                query = db.client.table('inventory_items').select('*').eq('organization_id', organization_id)
+                if category_filter:
+                    query = query.eq('category', category_filter)
+                return query.order('quantity', desc=False).order('id')
             
-            # Get forecast insights
-            insights_result = db.client.table('forecast_insights').select('*').eq('forecast_id', forecast_id).order('priority', desc=True).order('created_at', desc=False).execute()
+            inventory = await self._select_all(inventory_query)
+        
+        if not inventory:
+            logger.warning("No inventory data found for forecasting")
+        return inventory
+    
+    def _chunk_inventory(self, inventory: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split the catalogue into prompt-sized chunks"""
+        size = max(1, settings.FORECAST_CHUNK_SIZE)
+        return [inventory[start:start + size] for start in range(0, len(inventory), size)]
+    
+    async def _generate_chunked_forecast(
+        self,
+        inventory: List[Dict[str, Any]],
+        forecast_period: str,
+        organization_id: str,
+        force_regenerate: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Map-reduce over the catalogue: forecast each chunk with the AI, then merge
+        
+        At most FORECAST_MAX_PARALLEL_CHUNKS chunks are in flight (the AI scheduler's
+        per-organization cap still applies). A chunk that fails gets the fallback
+        forecast for its items, so one bad completion doesn't lose the rest; when more
+        than FORECAST_MAX_FALLBACK_FRACTION of the chunks fail, None is returned instead.
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.FORECAST_MAX_PARALLEL_CHUNKS))
+        chunks = self._chunk_inventory(inventory)
+        
+        async def forecast_chunk(chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.ai_service.generate_demand_forecast(
+                    chunk, forecast_period, organization_id=organization_id, force_regenerate=force_regenerate
+                )
+        
+        results = await asyncio.gather(*(forecast_chunk(chunk) for chunk in chunks), return_exceptions=True)
+        for index, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.error(f"Forecast chunk {index + 1}/{len(chunks)} failed: {result}")
+                results[index] = self.ai_service._generate_fallback_forecast(chunks[index], forecast_period)
+        
+        if self._mostly_fallback(results):
+            return None
+        return self._merge_chunk_forecasts(results)
+    
+    async def _stream_chunked_forecast(
+        self,
+        inventory: List[Dict[str, Any]],
+        forecast_period: str,
+        organization_id: str,
+        force_regenerate: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming variant of _generate_chunked_forecast: items from all chunks as they complete
+        
+        The closing {"type": "complete"} event has "degraded": true when too many chunks
+        fell back for the forecast to be stored.
+        """
+        semaphore = asyncio.Semaphore(max(1, settings.FORECAST_MAX_PARALLEL_CHUNKS))
+        chunks = self._chunk_inventory(inventory)
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def stream_chunk(index: int, chunk: List[Dict[str, Any]]):
+            async with semaphore:
+                try:
+                    async for event in self.ai_service.stream_demand_forecast(
+                        chunk, forecast_period, organization_id=organization_id, force_regenerate=force_regenerate
+                    ):
+                        await events.put((index, event))
+                except Exception as e:
+                    logger.error(f"Forecast chunk {index + 1}/{len(chunks)} failed: {e}")
+                    fallback = self.ai_service._generate_fallback_forecast(chunk, forecast_period)
+                    await events.put((index, {"type": "complete", "data": fallback}))
+        
+        tasks = [asyncio.create_task(stream_chunk(index, chunk)) for index, chunk in enumerate(chunks)]
+        results: List[Optional[Dict[str, Any]]] = [None] * len(chunks)
+        try:
+            pending = len(chunks)
+            while pending:
+                index, event = await events.get()
+                if event["type"] == "item":
+                    yield event
+                else:
+                    results[index] = event["data"]
+                    pending -= 1
+        finally:
+            # Client went away mid-stream: stop the remaining chunks
+            for task in tasks:
+                task.cancel()
+        
+        yield {"type": "complete", "data": self._merge_chunk_forecasts(results), "degraded": self._mostly_fallback(results)}
+    
+    def _mostly_fallback(self, results: List[Dict[str, Any]]) -> bool:
+        """Whether more than FORECAST_MAX_FALLBACK_FRACTION of the chunks used the fallback forecast
+        
+        Such a forecast is not stored or cached: the request is answered with the fallback
+        response and the precompute job fails, so it is retried once the AI has recovered.
+        """
+        failed = sum(1 for result in results if result.get('ai_model_version') == 'fallback')
+        if failed and failed / len(results) > settings.FORECAST_MAX_FALLBACK_FRACTION:
+            logger.warning(f"{failed} of {len(results)} forecast chunks fell back; not storing the forecast")
+            return True
+        return False
+    
+    def _merge_chunk_forecasts(self, results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine per-chunk forecasts into one catalogue forecast"""
+        forecasts = [forecast for result in results for forecast in result.get('forecasts', [])]
+        failed = sum(1 for result in results if result.get('ai_model_version') == 'fallback')
+        
+        # One insight per type and title, most urgent first
+        insights: Dict[Any, Dict[str, Any]] = {}
+        for result in results:
+            for insight in result.get('insights', []):
+                insights.setdefault((insight.get('type'), insight.get('title')), insight)
+        merged_insights = sorted(insights.values(), key=lambda insight: PRIORITY_RANK.get(insight.get('priority'), 1))
+        if failed and len(results) > 1:
+            merged_insights.append({
+                "type": "System Status",
+                "title": "Partial AI Forecast",
+                "description": f"{failed} of {len(results)} item groups used the fallback forecast",
+                "priority": "medium",
+                "category": "System Alert",
+                "action_required": False,
+                "action_description": "Regenerate the forecast once the AI service has recovered"
+            })
+        
+        # Demand overview across the whole catalogue; monthly series averaged over the chunks
+        chart_data: Dict[str, Any] = {
+            "demand_overview": [
+                {"name": forecast.get('item_name'), "forecast": _as_int(forecast.get('predicted_demand')),
+                 "actual": _as_int(forecast.get('current_stock'))}
+                for forecast in sorted(forecasts, key=lambda f: _as_int(f.get('predicted_demand')), reverse=True)[:10]
+            ]
+        }
+        monthly: Dict[str, Dict[str, List[Dict[str, Any]]]] = {}
+        for result in results:
+            for chart_type, series in (result.get('chart_data') or {}).items():
+                if chart_type == 'demand_overview' or not isinstance(series, list):
+                    continue
+                for point in series:
+                    if isinstance(point, dict) and 'month' in point:
+                        monthly.setdefault(chart_type, {}).setdefault(point['month'], []).append(point)
+        for chart_type, months in monthly.items():
+            chart_data[chart_type] = [
+                {
+                    "month": month,
+                    **{
+                        key: round(sum(float(p.get(key) or 0) for p in points) / len(points), 1)
+                        for key in points[0] if key != 'month'
+                    }
+                }
+                for month, points in months.items()
+            ]
+        
+        # Item-weighted accuracy; chunk alert counts add up
+        weights = [len(result.get('forecasts', [])) for result in results]
+        accuracy = (
+            sum(float(result.get('overall_accuracy') or 0) * weight for result, weight in zip(results, weights))
+            / sum(weights) if sum(weights) else 0.0
+        )
+        alerts = [result.get('stock_alerts') or {} for result in results]
+        model_versions = [result.get('ai_model_version') for result in results if result.get('ai_model_version') != 'fallback']
+        
+        return {
+            "forecasts": forecasts,
+            "insights": merged_insights,
+            "chart_data": chart_data,
+            "overall_accuracy": round(accuracy, 2),
+            "total_items_forecasted": len(forecasts),
+            "ai_model_version": (model_versions[0] or settings.AI_MODEL) if model_versions else 'fallback',
+            "stock_alerts": {
+                "critical_items": sum(_as_int(alert.get('critical_items')) for alert in alerts),
+                "high_risk_items": sum(_as_int(alert.get('high_risk_items')) for alert in alerts),
+                "total_alerts": sum(_as_int(alert.get('total_alerts')) for alert in alerts),
+                "immediate_actions": [action for alert in alerts for action in alert.get('immediate_actions', [])][:10]
+            }
+        }
+    
+    async def precompute_forecast(self, organization_id: str, forecast_period: str) -> Dict[str, Any]:
+        """Make sure today's catalogue-wide forecast exists before anyone asks for it (nightly scheduler)
+        
+        An organization whose inventory is unchanged since its last stored forecast gets that
+        forecast carried over to today instead of a new generation. Statistical runs are recorded
+        in forecast_data too (request-time ones are only cached). Returns what was done.
+        """
+        engine = settings.FORECAST_ENGINE
+        forecast_date = date.today()
+        cache_key = forecast_cache.key(organization_id, forecast_date, forecast_period, None, engine)
+        outcome = {"organization_id": organization_id, "forecast_period": forecast_period, "status": "current"}
+        
+        async def precompute() -> Optional[str]:
+            if engine == "statistical":
+                outcome["status"] = "generated"
+                forecast_json = await self._generate_statistical_forecast(organization_id, forecast_period, None)
+                if forecast_json:
+                    await self._store_statistical_forecast(organization_id, forecast_period, forecast_json)
+                return forecast_json
             
-            # Get chart data
-            charts_result = db.client.table('forecast_charts').select('*').eq('forecast_id', forecast_id).execute()
+            existing_forecast = await self._get_forecast_json_for_date(
+                organization_id, forecast_date, forecast_period, None
+            )
+            if existing_forecast:
+                return existing_forecast
             
-            # Build response
-            chart_data = {}
-            for chart in charts_result.data:
-                chart_data[chart['chart_type']] = json.loads(chart['chart_data'])
+            inventory = await self._get_forecast_inventory(organization_id)
+            if not inventory:
+                outcome["status"] = "no_inventory"
+                return None
             
-            return {
-                "forecasts": items_result.data,
-                "insights": insights_result.data,
-                "chart_data": chart_data,
-                "overall_accuracy": float(forecast_result.data[0]['overall_accuracy'] or 0),
-                "total_items_forecasted": forecast_result.data[0]['total_items_forecasted'],
-                "source": "database"
-            }
+            fingerprint = self._inventory_fingerprint(inventory)
+            latest = await self._get_latest_forecast_run(organization_id, forecast_period)
+            if latest and latest.get('inventory_fingerprint') == fingerprint:
+                outcome["status"] = "carried_over"
+                return await self._carry_over_forecast(latest['id'], forecast_date)
             
-        except Exception as e:
-            logger.error(f"Error getting forecast for date: {e}")
+            # Not forced: chunks whose items are unchanged are answered from the LLM response cache
+            outcome["status"] = "generated"
+            return await self._generate_and_store_forecast(
+                organization_id, forecast_period, None, inventory=inventory, generated_by="scheduler"
+            )
+        
+        # Shares the single-flight with request-time loads of the same forecast
+        forecast_json = await forecast_cache.get_or_load(cache_key, precompute)
+        if forecast_json is None and outcome["status"] == "generated":
+            raise RuntimeError(f"Forecast generation failed for {organization_id} ({forecast_period})")
+        return outcome
+    
+    async def _store_statistical_forecast(self, organization_id: str, forecast_period: str, forecast_json: str):
+        """Record a precomputed statistical forecast as a scheduler run (the document is its snapshot)"""
+        forecast = json.loads(forecast_json)
+        await self._store_forecast(
+            str(uuid.uuid4()), organization_id, forecast_period, None, forecast,
+            self._forecast_item_rows(forecast.get('forecasts', [])),
+            self._forecast_insight_rows(forecast.get('insights', [])),
+            forecast.get('chart_data') or {}, snapshot={**forecast, "source": "database"},
+            generated_by="scheduler"
+        )
+    
+    def _inventory_fingerprint(self, inventory: List[Dict[str, Any]]) -> str:
+        """Digest of the inventory a forecast was generated from, to tell whether it has changed since"""
+        return hashlib.sha256(json.dumps(inventory, sort_keys=True, default=str).encode()).hexdigest()
+    
+    async def _get_latest_forecast_run(self, organization_id: str, forecast_period: str) -> Optional[Dict[str, Any]]:
+        """Most recent stored catalogue-wide forecast with a snapshot
+        
+        Fallback-only runs are skipped, so they are never carried over to later days.
+        """
+        if pg_pool.enabled:
+            return await pg_pool.fetchrow(
+                """
+                SELECT id, forecast_date, inventory_fingerprint FROM forecast_data
+                WHERE organization_id = $1 AND forecast_period = $2 AND category_filter IS NULL
+                  AND snapshot IS NOT NULL AND ai_model_version IS DISTINCT FROM 'fallback'
+                ORDER BY forecast_date DESC, created_at DESC
+                LIMIT 1
+                """,
+                organization_id, forecast_period
+            )
+        
+        result = await db.client.table('forecast_data').select('id, forecast_date, inventory_fingerprint') \
+            .eq('organization_id', organization_id).eq('forecast_period', forecast_period) \
+            .is_('category_filter', 'null').not_.is_('snapshot', 'null') \
+            .or_('ai_model_version.is.null,ai_model_version.neq.fallback') \
+            .order('forecast_date', desc=True).order('created_at', desc=True).limit(1).execute()
+        return result.data[0] if result.data else None
+    
+    async def _carry_over_forecast(self, source_forecast_id: str, forecast_date: date) -> Optional[str]:
+        """Store a copy of a previous forecast (its snapshot) for `forecast_date` and return the document"""
+        forecast_id = str(uuid.uuid4())
+        if pg_pool.enabled:
+            return await pg_pool.fetchval(
+                """
+                INSERT INTO forecast_data (id, organization_id, forecast_date, forecast_period, category_filter,
+                                           overall_accuracy, total_items_forecasted, ai_model_version, snapshot,
+                                           inventory_fingerprint, generated_by)
+                SELECT $1, organization_id, $2, forecast_period, category_filter, overall_accuracy,
+                       total_items_forecasted, ai_model_version, snapshot, inventory_fingerprint, 'carry_over'
+                FROM forecast_data WHERE id = $3
+                RETURNING snapshot::text
+                """,
+                forecast_id, forecast_date, source_forecast_id
+            )
+        
+        result = await db.client.table('forecast_data').select('*').eq('id', source_forecast_id).execute()
+        if not result.data:
             return None
+        row = result.data[0]
+        await db.client.table('forecast_data').insert({
+            **{column: row[column] for column in (
+                'organization_id', 'forecast_period', 'category_filter', 'overall_accuracy',
+                'total_items_forecasted', 'ai_model_version', 'snapshot', 'inventory_fingerprint'
+            )},
+            'id': forecast_id,
+            'forecast_date': forecast_date.isoformat(),
+            'generated_by': 'carry_over'
+        }).execute()
+        return json.dumps(row['snapshot'])
     
     async def _generate_and_store_forecast(
         self, 
         organization_id: str,
         forecast_period: str,
-        category_filter: Optional[str]
-    ) -> Dict[str, Any]:
-        """Generate new forecast using AI and store it"""
+        category_filter: Optional[str],
+        force_regenerate: bool = False,
+        inventory: Optional[List[Dict[str, Any]]] = None,
+        generated_by: str = "request"
+    ) -> Optional[str]:
+        """Generate new forecast using AI and store it (None when generation fails)"""
         try:
-            # Get inventory data - using synchronous Supabase methods
-            inventory_result = db.client.table('inventory_items').select('*').eq('organization_id', organization_id).order('quantity', desc=False).limit(50).execute()
-            
-            if not inventory_result.data:
-                logger.warning("No inventory data found for forecasting")
-                return self._generate_fallback_forecast()
+            if inventory is None:
+                inventory = await self._get_forecast_inventory(organization_id, category_filter)
+            if not inventory:
+                return None
             
-            # Generate AI forecast
-            ai_forecast = await self.ai_service.generate_demand_forecast(
-                inventory_result.data, forecast_period, category_filter
+            # Generate AI forecast for the whole catalogue, chunk by chunk
+            ai_forecast = await self._generate_chunked_forecast(
+                inventory, forecast_period, organization_id, force_regenerate
             )
             
             if not ai_forecast:
                 logger.warning("AI forecast generation failed, using fallback")
-                return self._generate_fallback_forecast()
-            
-            # Store forecast data
-            forecast_id = await self._store_forecast_data(
-                organization_id, forecast_period, category_filter, ai_forecast
-            )
-            
-            # Store forecast items
-            await self._store_forecast_items(forecast_id, ai_forecast.get('forecasts', []))
-            
-            # Store forecast insights
-            await self._store_forecast_insights(forecast_id, ai_forecast.get('insights', []))
-            
-            # Store chart data
-            await self._store_forecast_charts(forecast_id, ai_forecast.get('chart_data', {}))
+                return None
             
-            # Return complete forecast
-            return await self._get_forecast_for_date(
-                organization_id, date.today(), forecast_period, category_filter
+            return await self._persist_forecast(
+                str(uuid.uuid4()), organization_id, forecast_period, category_filter, ai_forecast,
+                inventory_fingerprint=self._inventory_fingerprint(inventory), generated_by=generated_by
             )
             
         except Exception as e:
             logger.error(f"Error generating and storing forecast: {e}")
-            return self._generate_fallback_forecast()
+            return None
     
-    async def _store_forecast_data(
-        self, 
+    async def _persist_forecast(
+        self,
+        forecast_id: str,
         organization_id: str,
         forecast_period: str,
         category_filter: Optional[str],
-        ai_forecast: Dict[str, Any]
+        ai_forecast: Dict[str, Any],
+        inventory_fingerprint: Optional[str] = None,
+        generated_by: str = "request"
     ) -> str:
-        """Store main forecast data"""
-        try:
-            result = db.client.table('forecast_data').insert({
-                'organization_id': organization_id,
-                'forecast_date': date.today().isoformat(),
-                'forecast_period': forecast_period,
-                'category_filter': category_filter,
-                'overall_accuracy': ai_forecast.get('overall_accuracy', 0),
-                'total_items_forecasted': len(ai_forecast.get('forecasts', [])),
-                'ai_model_version': ai_forecast.get('ai_model_version', 'meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8')
-            }).execute()
-            
-            return result.data[0]['id']
-            
-        except Exception as e:
-            logger.error(f"Error storing forecast data: {e}")
-            raise
+        """Store an AI forecast and return its API response as JSON"""
+        # Build the response up front; it doubles as the stored snapshot
+        items = self._forecast_item_rows(ai_forecast.get('forecasts', []))
+        insights = self._forecast_insight_rows(ai_forecast.get('insights', []))
+        chart_data = ai_forecast.get('chart_data', {}) or {}
+        forecast = self._build_forecast_response(forecast_id, ai_forecast, items, insights, chart_data)
+        
+        # Store forecast data, items, insights and charts in one batch
+        await self._store_forecast(
+            forecast_id, organization_id, forecast_period, category_filter, ai_forecast,
+            items, insights, chart_data, snapshot={**forecast, "source": "database"},
+            inventory_fingerprint=inventory_fingerprint, generated_by=generated_by
+        )
+        
+        # Return complete forecast from memory rather than re-reading it
+        return json.dumps(forecast)
     
-    async def _store_forecast_items(self, forecast_id: str, forecasts: List[Dict[str, Any]]):
-        """Store forecast items"""
-        try:
-            for forecast in forecasts:
-                db.client.table('forecast_items').insert({
-                    'forecast_id': forecast_id,
-                    'item_name': forecast.get('item_name', ''),
-                    'item_category': forecast.get('item_category', ''),
-                    'current_stock': forecast.get('current_stock', 0),
-                    'predicted_demand': forecast.get('predicted_demand', 0),
-                    'confidence_score': forecast.get('confidence_score', 0),
-                    'risk_level': forecast.get('risk_level', 'low'),
-                    'recommendation': forecast.get('recommendation', ''),
-                    'trend': forecast.get('trend', 'stable'),
-                    'difference': forecast.get('difference', 0)
-                }).execute()
-                
-        except Exception as e:
-            logger.error(f"Error storing forecast items: {e}")
-            raise
+    def _forecast_item_rows(self, forecasts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Map AI forecast items to forecast_items columns"""
+        return [
+            {
+                'item_name': forecast.get('item_name', ''),
+                'item_category': forecast.get('item_category', ''),
+                'current_stock': _as_int(forecast.get('current_stock')),
+                'predicted_demand': _as_int(forecast.get('predicted_demand')),
+                'confidence_score': _as_int(forecast.get('confidence_score')),
+                'risk_level': forecast.get('risk_level', 'low'),
+                'recommendation': forecast.get('recommendation', ''),
+                'trend': forecast.get('trend', 'stable'),
+                'difference': _as_int(forecast.get('difference'))
+            }
+            for forecast in forecasts
+        ]
     
-    async def _store_forecast_insights(self, forecast_id: str, insights: List[Dict[str, Any]]):
-        """Store forecast insights"""
-        try:
-            for insight in insights:
-                db.client.table('forecast_insights').insert({
-                    'forecast_id': forecast_id,
-                    'insight_type': insight.get('type', ''),
-                    'title': insight.get('title', ''),
-                    'description': insight.get('description', ''),
-                    'priority': insight.get('priority', 'medium'),
-                    'category': insight.get('category', ''),
-                    'action_required': insight.get('action_required', False),
-                    'action_description': insight.get('action_description', '')
-                }).execute()
-                
-        except Exception as e:
-            logger.error(f"Error storing forecast insights: {e}")
-            raise
+    def _forecast_insight_rows(self, insights: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Map AI insights to forecast_insights columns"""
+        return [
+            {
+                'insight_type': insight.get('type', ''),
+                'title': insight.get('title', ''),
+                'description': insight.get('description', ''),
+                'priority': insight.get('priority', 'medium'),
+                'category': insight.get('category', ''),
+                'action_required': insight.get('action_required', False),
+                'action_description': insight.get('action_description', '')
+            }
+            for insight in insights
+        ]
     
-    async def _store_forecast_charts(self, forecast_id: str, chart_data: Dict[str, Any]):
-        """Store chart data"""
+    def _build_forecast_response(
+        self,
+        forecast_id: str,
+        ai_forecast: Dict[str, Any],
+        items: List[Dict[str, Any]],
+        insights: List[Dict[str, Any]],
+        chart_data: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """Build the API response for a freshly stored forecast (same shape as a database read)"""
+        return {
+            "forecasts": [{**item, 'forecast_id': forecast_id} for item in items],
+            "insights": [
+                {**insight, 'forecast_id': forecast_id}
+                for insight in sorted(insights, key=lambda row: PRIORITY_RANK.get(row['priority'], 1))
+            ],
+            "chart_data": chart_data,
+            "overall_accuracy": float(ai_forecast.get('overall_accuracy', 0) or 0),
+            "total_items_forecasted": len(items),
+            "source": "generated"
+        }
+    
+    async def _store_forecast(
+        self,
+        forecast_id: str,
+        organization_id: str,
+        forecast_period: str,
+        category_filter: Optional[str],
+        ai_forecast: Dict[str, Any],
+        items: List[Dict[str, Any]],
+        insights: List[Dict[str, Any]],
+        chart_data: Dict[str, Any],
+        snapshot: Dict[str, Any],
+        inventory_fingerprint: Optional[str] = None,
+        generated_by: str = "request"
+    ):
+        """Store a forecast with one multi-row insert per table"""
+        forecast_row = {
+            'id': forecast_id,
+            'organization_id': organization_id,
+            'forecast_date': date.today().isoformat(),
+            'forecast_period': forecast_period,
+            'category_filter': category_filter,
+            'overall_accuracy': ai_forecast.get('overall_accuracy', 0),
+            'total_items_forecasted': len(items),
+            'ai_model_version': ai_forecast.get('ai_model_version', 'meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8'),
+            'snapshot': snapshot,
+            'inventory_fingerprint': inventory_fingerprint,
+            'generated_by': generated_by
+        }
+        chart_rows = [
+            {'chart_type': chart_type, 'chart_data': data}
+            for chart_type, data in chart_data.items()
+        ]
+        
         try:
-            for chart_type, data in chart_data.items():
-                db.client.table('forecast_charts').insert({
-                    'forecast_id': forecast_id,
-                    'chart_type': chart_type,
-                    'chart_data': json.dumps(data)
-                }).execute()
-                
+            if pg_pool.enabled:
+                await self._pg_store_forecast(forecast_row, items, insights, chart_rows)
+                return
+            
+            await db.client.table('forecast_data').insert(forecast_row).execute()
+            
+            for table, rows in (
+                ('forecast_items', items),
+                ('forecast_insights', insights),
+                ('forecast_charts', chart_rows),
+            ):
+                if rows:
+                    await db.client.table(table).insert(
+                        [{**row, 'forecast_id': forecast_id} for row in rows]
+                    ).execute()
+            
         except Exception as e:
-            logger.error(f"Error storing forecast charts: {e}")
+            logger.error(f"Error storing forecast: {e}")
             raise
+    
+    async def _pg_store_forecast(
+        self,
+        forecast_row: Dict[str, Any],
+        items: List[Dict[str, Any]],
+        insights: List[Dict[str, Any]],
+        chart_rows: List[Dict[str, Any]]
+    ):
+        """Direct Postgres variant of _store_forecast: one transaction, one INSERT per table"""
+        forecast_id = forecast_row['id']
+        async with pg_pool.transaction() as conn:
+            await conn.execute(
+                """
+                INSERT INTO forecast_data (id, organization_id, forecast_date, forecast_period, category_filter,
+                                           overall_accuracy, total_items_forecasted, ai_model_version, snapshot,
+                                           inventory_fingerprint, generated_by)
+                VALUES ($1, $2, $3::date, $4, $5, $6, $7, $8, $9::jsonb, $10, $11)
+                """,
+                forecast_id, forecast_row['organization_id'], date.fromisoformat(forecast_row['forecast_date']),
+                forecast_row['forecast_period'], forecast_row['category_filter'],
+                forecast_row['overall_accuracy'], forecast_row['total_items_forecasted'],
+                forecast_row['ai_model_version'], forecast_row['snapshot'],
+                forecast_row['inventory_fingerprint'], forecast_row['generated_by']
+            )
+            
+            if items:
+                await conn.execute(
+                    """
+                    INSERT INTO forecast_items (forecast_id, item_name, item_category, current_stock, predicted_demand,
+                                                confidence_score, risk_level, recommendation, trend, difference)
+                    SELECT $1, * FROM unnest($2::text[], $3::text[], $4::int[], $5::int[], $6::int[],
+                                             $7::text[], $8::text[], $9::text[], $10::int[])
+                    """,
+                    forecast_id,
+                    *[[row[column] for row in items] for column in (
+                        'item_name', 'item_category', 'current_stock', 'predicted_demand',
+                        'confidence_score', 'risk_level', 'recommendation', 'trend', 'difference'
+                    )]
+                )
+            
+            if insights:
+                await conn.execute(
+                    """
+                    INSERT INTO forecast_insights (forecast_id, insight_type, title, description, priority,
+                                                   category, action_required, action_description)
+                    SELECT $1, * FROM unnest($2::text[], $3::text[], $4::text[], $5::text[],
+                                             $6::text[], $7::bool[], $8::text[])
+                    """,
+                    forecast_id,
+                    *[[row[column] for row in insights] for column in (
+                        'insight_type', 'title', 'description', 'priority',
+                        'category', 'action_required', 'action_description'
+                    )]
+                )
+            
+            if chart_rows:
+                await conn.execute(
+                    """
+                    INSERT INTO forecast_charts (forecast_id, chart_type, chart_data)
+                    SELECT $1, chart_type, chart_data::jsonb FROM unnest($2::text[], $3::text[]) AS c(chart_type, chart_data)
+                    """,
+                    forecast_id,
+                    [row['chart_type'] for row in chart_rows],
+                    # Encoded here so list-valued charts are not read as nested arrays
+                    [json.dumps(row['chart_data']) for row in chart_rows]
+                )
 
     async def get_forecast_history(
         self, 
@@ -293,7 +990,7 @@ class ForecastService:
         try:
             start_date = date.today() - timedelta(days=days)
             
-            result = db.client.table('forecast_data').select('*').eq('organization_id', organization_id).gte('forecast_date', start_date.isoformat()).order('forecast_date', desc=True).execute()
+            result = await db.client.table('forecast_data').select('*').eq('organization_id', organization_id).gte('forecast_date', start_date.isoformat()).order('forecast_date', desc=True).execute()
             
             return [
                 {
@@ -302,6 +999,7 @@ class ForecastService:
                     "forecast_period": row['forecast_period'],
                     "overall_accuracy": float(row['overall_accuracy'] or 0),
                     "total_items_forecasted": row['total_items_forecasted'],
+                    "generated_by": row.get('generated_by', 'request'),
                     "created_at": row['created_at']
                 }
                 for row in result.data
@@ -0,0 +1,232 @@
+"""
+Bulk inventory import for MedInventory.
+Reads an uploaded CSV or XLSX file a batch of rows at a time (the file is never held in memory
+whole), validates each batch against InventoryItemCreate in one call and hands the valid rows to
+the database, which COPYs them into a staging table and merges them into inventory_items.
+Runs as the inventory.import background job; progress is reported on the job.
+"""
+
+import asyncio
+import csv
+import io
+import os
+import shutil
+import tempfile
+import uuid
+from itertools import islice
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from pydantic import TypeAdapter, ValidationError
+
+from app.config import settings
+from app.database import db
+from app.models.inventory import InventoryItemCreate
+from app.services.job_queue import job_queue
+
+try:
+    from openpyxl import load_workbook
+except ImportError:  # openpyxl is only needed for XLSX imports
+    load_workbook = None
+
+IMPORT_FILE_TYPES = ("csv", "xlsx")
+
+# Columns read from the file (headers are matched case-insensitively, "Batch Number" → batch_number)
+ITEM_COLUMNS = tuple(InventoryItemCreate.model_fields)
+REQUIRED_COLUMNS = ("name", "category", "unit")
+
+# Rejected rows listed on the job; the count covers all of them
+MAX_REPORTED_ERRORS = 100
+
+# One validation call per batch instead of one model per row
+_batch_validator = TypeAdapter(List[InventoryItemCreate])
+
+Row = Tuple[int, Dict[str, Any]]  # (file row number, {column: value})
+
+
+def _column_name(header: Any) -> str:
+    return "_".join(str(header or "").strip().lower().replace("-", " ").split())
+
+
+class ImportFile:
+    """Rows of an uploaded file, read lazily, with how far through the file the reader is"""
+
+    def __init__(self, path: str, file_type: str):
+        if file_type not in IMPORT_FILE_TYPES:
+            raise ValueError(f"Unsupported import file type '{file_type}' (use {' or '.join(IMPORT_FILE_TYPES)})")
+        self.path = path
+        self.file_type = file_type
+        self.fraction_read = 0.0
+
+    def _csv_values(self) -> Iterator[Sequence[Any]]:
+        size = os.path.getsize(self.path) or 1
+        with open(self.path, "rb") as raw:
+            text = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+            for values in csv.reader(text):
+                self.fraction_read = min(1.0, raw.tell() / size)
+                yield values
+
+    def _xlsx_values(self) -> Iterator[Sequence[Any]]:
+        if load_workbook is None:
+            raise RuntimeError("XLSX import needs openpyxl (pip install openpyxl)")
+        try:
+            # Read-only mode streams rows from the sheet XML instead of building the workbook
+            workbook = load_workbook(self.path, read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"Not a readable XLSX file: {e}")
+        try:
+            sheet = workbook.active
+            total = sheet.max_row or 0
+            for number, values in enumerate(sheet.iter_rows(values_only=True), start=1):
+                if total:
+                    self.fraction_read = min(1.0, number / total)
+                yield values
+        finally:
+            workbook.close()
+
+    def rows(self) -> Iterator[Row]:
+        """(row number, record) for every non-blank row after the header; blank cells are left out"""
+        values = self._csv_values() if self.file_type == "csv" else self._xlsx_values()
+        header = next(values, None)
+        if header is None:
+            raise ValueError("The file is empty")
+
+        columns = [_column_name(name) for name in header]
+        missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {', '.join(missing)}")
+        wanted = [(index, column) for index, column in enumerate(columns) if column in ITEM_COLUMNS]
+
+        for number, row in enumerate(values, start=2):
+            record = {}
+            for index, column in wanted:
+                value = row[index] if index < len(row) else None
+                if isinstance(value, str):
+                    value = value.strip() or None
+                if value is not None:
+                    record[column] = value
+            if record:
+                yield number, record
+
+
+def validate_batch(rows: List[Row]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Valid rows as item dicts (with source_row) and rejected rows with their errors"""
+    records = [record for _, record in rows]
+    problems: Dict[int, List[str]] = {}
+    try:
+        items = _batch_validator.validate_python(records)
+    except ValidationError as e:
+        for error in e.errors():
+            index, *field = error["loc"]
+            where = ".".join(str(part) for part in field)
+            problems.setdefault(index, []).append(f"{where}: {error['msg']}" if where else error["msg"])
+        # Only rows that passed are validated again, so this cannot fail
+        items = _batch_validator.validate_python(
+            [record for index, record in enumerate(records) if index not in problems]
+        )
+
+    numbers = [number for index, (number, _) in enumerate(rows) if index not in problems]
+    valid = [
+        {"source_row": number, **item.model_dump(exclude_unset=True)}
+        for number, item in zip(numbers, items)
+    ]
+    rejected = [{"row": rows[index][0], "errors": problems[index]} for index in sorted(problems)]
+    return valid, rejected
+
+
+def save_upload(upload: BinaryIO, file_type: str) -> str:
+    """Copy an upload into IMPORT_UPLOAD_DIR and return the path (in-memory job queue only)"""
+    os.makedirs(settings.IMPORT_UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(settings.IMPORT_UPLOAD_DIR, f"{uuid.uuid4()}.{file_type}")
+    with open(path, "wb") as target:
+        shutil.copyfileobj(upload, target, 1024 * 1024)
+    return path
+
+
+async def store_upload(upload: BinaryIO, file_type: str, organization_id: str) -> Dict[str, str]:
+    """Keep an upload for its import job; returns the job payload fields that locate it
+
+    Postgres-queued jobs may run in a worker on another host, so the upload is stored in the
+    database (import_uploads); the in-memory queue runs jobs in this process, so a local file
+    in IMPORT_UPLOAD_DIR does.
+    """
+    if job_queue.backend_name == "postgres":
+        content = await asyncio.to_thread(upload.read)
+        return {"upload_id": await db.save_import_upload(content, file_type, organization_id)}
+    return {"path": await asyncio.to_thread(save_upload, upload, file_type)}
+
+
+async def _fetch_upload(upload_id: str, organization_id: str, file_type: str) -> str:
+    """Move a stored upload out of Postgres into a local temp file and return its path"""
+    upload = await db.take_import_upload(upload_id, organization_id)
+    if upload is None:
+        raise LookupError(f"Import upload {upload_id} not found")
+
+    def spool() -> str:
+        fd, path = tempfile.mkstemp(prefix="medinventory-import-", suffix=f".{file_type}")
+        with os.fdopen(fd, "wb") as target:
+            target.write(upload["content"])
+        return path
+
+    return await asyncio.to_thread(spool)
+
+
+async def import_inventory_file(file_type: str, organization_id: str, filename: Optional[str] = None,
+                                path: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    """Import one uploaded file (a local path or a stored upload, see store_upload); the upload
+    is removed afterwards whether or not it loaded
+
+    Valid rows are loaded and invalid ones reported (rows, errors); a file that cannot be
+    read at all, or a database error, fails the job and leaves inventory_items unchanged.
+    """
+    if upload_id:
+        path = await _fetch_upload(upload_id, organization_id, file_type)
+    if not path:
+        raise ValueError("An import needs an upload path or upload_id")
+    source = ImportFile(path, file_type)
+    rows = source.rows()
+    counts = {"rows_read": 0, "inserted": 0, "updated": 0, "rejected": 0}
+    errors: List[Dict[str, Any]] = []
+
+    def read_batch() -> Optional[Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        batch = list(islice(rows, settings.IMPORT_BATCH_SIZE))
+        if not batch:
+            return None
+        counts["rows_read"] += len(batch)
+        return validate_batch(batch)
+
+    async def valid_batches() -> AsyncIterator[List[Dict[str, Any]]]:
+        while True:
+            # Parsing and validation are CPU work; keep them off the event loop
+            batch = await asyncio.to_thread(read_batch)
+            if batch is None:
+                return
+            valid, rejected = batch
+            counts["rejected"] += len(rejected)
+            errors.extend(rejected[:max(0, MAX_REPORTED_ERRORS - len(errors))])
+            yield valid
+
+    async def on_batch(result: Dict[str, Any]):
+        counts["inserted"] += result["inserted"]
+        counts["updated"] += result["updated"]
+        counts["rejected"] += len(result["rejected"])
+        errors.extend(
+            {"row": row, "errors": ["supplier_id: not a supplier of this organization"]}
+            for row in result["rejected"][:max(0, MAX_REPORTED_ERRORS - len(errors))]
+        )
+        await job_queue.report_progress(
+            phase="loading", percent=round(source.fraction_read * 100, 1), **counts
+        )
+
+    try:
+        await job_queue.report_progress(phase="loading", percent=0.0, **counts)
+        await db.import_inventory_items(valid_batches(), organization_id, on_batch)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    errors.sort(key=lambda error: error["row"])
+    logger.info(f"Imported {filename or upload_id or path} for organization {organization_id}: {counts}")
+    return {"filename": filename, **counts, "errors": errors}
@@ -0,0 +1,93 @@
+"""
+Background job handlers for MedInventory.
+Importing this module registers every job type with the job queue (the API enqueues, workers run).
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from app.database import db
+from app.services.ai_service import ai_service
+from app.services.forecast_service import forecast_service
+from app.services.inventory_import import import_inventory_file
+from app.services.job_queue import job_queue
+
+
+@job_queue.register("forecast.regenerate")
+async def regenerate_forecast(
+    organization_id: str,
+    forecast_period: str = "30d",
+    category_filter: Optional[str] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Generate a fresh forecast and replace the cached one (fails, and is retried, if generation fails)"""
+    return await forecast_service.regenerate_forecast(organization_id, forecast_period, category_filter, engine)
+
+
+@job_queue.register("forecast.precompute")
+async def precompute_forecast(organization_id: str, forecast_period: str) -> Dict[str, Any]:
+    """Nightly pre-computation of one organization's forecast for one period"""
+    return await forecast_service.precompute_forecast(organization_id, forecast_period)
+
+
+@job_queue.register("inventory.import")
+async def import_inventory(file_type: str, organization_id: str, filename: Optional[str] = None,
+                           path: Optional[str] = None, upload_id: Optional[str] = None) -> Dict[str, Any]:
+    """Load an uploaded CSV/XLSX file into the organization's inventory"""
+    return await import_inventory_file(file_type, organization_id, filename, path=path, upload_id=upload_id)
+
+
+@job_queue.register("bidding.email_suppliers")
+async def email_suppliers(bid_request_id: str, organization_id: str) -> Dict[str, Any]:
+    """AI email agent: write a bid request email for every active supplier
+
+    Emails are generated and logged to ai_agent_logs; there is no mail
+    transport configured yet, so delivery is left to whoever reads the log.
+    """
+    bid_request = await db.get_bid_request(bid_request_id, organization_id)
+    if not bid_request:
+        raise LookupError(f"Bid request {bid_request_id} not found")
+    suppliers = await db.get_suppliers(active_only=True, organization_id=organization_id)
+
+    async def email_supplier(supplier: Dict[str, Any]):
+        started = time.perf_counter()
+        email_content = await ai_service.generate_bid_request_email(
+            bid_request, supplier, organization_id=organization_id
+        )
+        await db.log_ai_agent_action(
+            agent_type="email",
+            action="generate_bid_request_email",
+            reference_type="bid_request",
+            reference_id=bid_request_id,
+            input_data={"supplier_id": supplier.get("id"), "supplier_email": supplier.get("email")},
+            output_data={"email_content": email_content},
+            execution_time_ms=int((time.perf_counter() - started) * 1000)
+        )
+
+    # The AI scheduler caps how many of these reach the provider at once, overall and per organization
+    await asyncio.gather(*(email_supplier(supplier) for supplier in suppliers))
+    logger.info(f"AI Email Agent prepared {len(suppliers)} emails for bid request {bid_request_id}")
+    return {"bid_request_id": bid_request_id, "emails_generated": len(suppliers)}
+
+
+@job_queue.register("bidding.send_confirmation")
+async def send_confirmation(bid_id: str, decision: bool, organization_id: str) -> Dict[str, Any]:
+    """AI confirmation agent: record the acceptance or rejection to send to the supplier"""
+    bid = await db.get_bid(bid_id, organization_id)
+    if not bid:
+        raise LookupError(f"Bid {bid_id} not found")
+
+    action = "acceptance" if decision else "rejection"
+    await db.log_ai_agent_action(
+        agent_type="decision",
+        action=f"send_{action}",
+        reference_type="bid",
+        reference_id=bid_id,
+        input_data={"decision": decision, "supplier_id": bid.get("supplier_id")},
+        output_data={"bid_status": bid.get("status")}
+    )
+    logger.info(f"AI Confirmation Agent recorded {action} for bid {bid_id}")
+    return {"bid_id": bid_id, "action": action}
@@ -0,0 +1,514 @@
+"""
+Background job queue for MedInventory.
+Runs slow work (forecast generation, AI agent tasks) outside API requests, with priorities, retries
+with backoff and idempotency keys. Jobs live in Postgres (durable, shared by API and worker processes)
+or in memory (one process, for development and tests).
+"""
+
+import asyncio
+import contextvars
+import json
+import random
+import socket
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+from app.config import settings
+from app.pg_pool import LatencyHistogram, pg_pool
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled")
+
+# Handlers are called with the job payload as keyword arguments; the return value is stored as the result
+JobHandler = Callable[..., Awaitable[Any]]
+
+# Job runs take seconds to minutes, not milliseconds
+JOB_LATENCY_BUCKETS_MS = (100, 500, 1000, 5000, 10000, 30000, 60000, 120000, 300000, 600000)
+
+# The job a handler is running for, so it can report progress without being passed its id
+_current_job: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_job", default=None)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class MemoryJobBackend:
+    """In-process stand-in for the background_jobs table: same semantics, nothing survives a restart"""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+
+    async def enqueue(self, job: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        async with self._lock:
+            key = job["idempotency_key"]
+            if key:
+                for existing in self._jobs.values():
+                    if existing["idempotency_key"] == key and existing["status"] in ("queued", "running"):
+                        return dict(existing), False
+            self._jobs[job["id"]] = dict(job)
+            return dict(job), True
+
+    async def claim(self, worker_id: str, job_types: Optional[Sequence[str]], lease_seconds: float) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            now = _now()
+            ready = [
+                job for job in self._jobs.values()
+                if job["status"] == "queued" and job["run_after"] <= now
+                and (not job_types or job["job_type"] in job_types)
+            ]
+            if not ready:
+                return None
+            job = min(ready, key=lambda j: (-j["priority"], j["run_after"], j["created_at"]))
+            job.update(
+                status="running", attempts=job["attempts"] + 1, locked_by=worker_id,
+                locked_until=now + timedelta(seconds=lease_seconds), started_at=now, updated_at=now,
+            )
+            return dict(job)
+
+    async def complete(self, job_id: str, worker_id: str, result: Any):
+        async with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["locked_by"] == worker_id and job["status"] == "running":
+                now = _now()
+                job.update(status="succeeded", result=result, locked_by=None, locked_until=None,
+                           finished_at=now, updated_at=now)
+
+    async def fail(self, job_id: str, worker_id: str, error: str, retry_at: Optional[datetime]):
+        async with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["locked_by"] == worker_id and job["status"] == "running":
+                now = _now()
+                job.update(last_error=error, locked_by=None, locked_until=None, updated_at=now)
+                if retry_at is not None:
+                    job.update(status="queued", run_after=retry_at)
+                else:
+                    job.update(status="failed", finished_at=now)
+
+    async def progress(self, job_id: str, worker_id: str, progress: Dict[str, Any]):
+        async with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["locked_by"] == worker_id and job["status"] == "running":
+                job.update(progress=progress, updated_at=_now())
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def list(self, organization_id: Optional[str], status: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        jobs = [
+            job for job in self._jobs.values()
+            if (organization_id is None or job["organization_id"] == organization_id)
+            and (status is None or job["status"] == status)
+        ]
+        jobs.sort(key=lambda j: j["created_at"], reverse=True)
+        return [dict(job) for job in jobs[:limit]]
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        async with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["status"] == "queued":
+                now = _now()
+                job.update(status="cancelled", finished_at=now, updated_at=now)
+                return dict(job)
+            return None
+
+    async def requeue_expired(self) -> int:
+        async with self._lock:
+            now = _now()
+            expired = [
+                job for job in self._jobs.values()
+                if job["status"] == "running" and job["locked_until"] and job["locked_until"] < now
+            ]
+            for job in expired:
+                job.update(status="queued", locked_by=None, locked_until=None, run_after=now, updated_at=now,
+                           last_error="Worker lease expired")
+            return len(expired)
+
+    async def counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in JOB_STATUSES}
+        for job in self._jobs.values():
+            counts[job["status"]] += 1
+        return counts
+
+
+class PostgresJobBackend:
+    """background_jobs table; workers claim jobs with FOR UPDATE SKIP LOCKED so they never collide"""
+
+    async def enqueue(self, job: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        row = await pg_pool.fetchrow(
+            """
+            INSERT INTO background_jobs (id, job_type, payload, priority, idempotency_key, organization_id,
+                                         max_attempts, run_after)
+            VALUES ($1, $2, $3::jsonb, $4, $5, $6, $7, $8)
+            ON CONFLICT (idempotency_key) WHERE status IN ('queued', 'running') DO NOTHING
+            RETURNING *
+            """,
+            job["id"], job["job_type"], job["payload"], job["priority"], job["idempotency_key"],
+            job["organization_id"], job["max_attempts"], job["run_after"]
+        )
+        if row is not None:
+            return row, True
+        existing = await pg_pool.fetchrow(
+            "SELECT * FROM background_jobs WHERE idempotency_key = $1 ORDER BY created_at DESC LIMIT 1",
+            job["idempotency_key"]
+        )
+        return existing, False
+
+    async def claim(self, worker_id: str, job_types: Optional[Sequence[str]], lease_seconds: float) -> Optional[Dict[str, Any]]:
+        row = await pg_pool.fetchrow(
+            """
+            UPDATE background_jobs
+            SET status = 'running', attempts = attempts + 1, locked_by = $1,
+                locked_until = now() + make_interval(secs => $2), started_at = now(), updated_at = now()
+            WHERE id = (
+                SELECT id FROM background_jobs
+                WHERE status = 'queued' AND run_after <= now()
+                  AND ($3::text[] IS NULL OR job_type = ANY($3::text[]))
+                ORDER BY priority DESC, run_after, created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+            """,
+            worker_id, float(lease_seconds), list(job_types) if job_types else None
+        )
+        return row
+
+    async def complete(self, job_id: str, worker_id: str, result: Any):
+        await pg_pool.execute(
+            """
+            UPDATE background_jobs
+            SET status = 'succeeded', result = $3::jsonb, locked_by = NULL, locked_until = NULL,
+                finished_at = now(), updated_at = now()
+            WHERE id = $1 AND locked_by = $2 AND status = 'running'
+            """,
+            job_id, worker_id, result
+        )
+
+    async def fail(self, job_id: str, worker_id: str, error: str, retry_at: Optional[datetime]):
+        await pg_pool.execute(
+            """
+            UPDATE background_jobs
+            SET status = CASE WHEN $4::timestamptz IS NULL THEN 'failed' ELSE 'queued' END,
+                run_after = COALESCE($4::timestamptz, run_after),
+                finished_at = CASE WHEN $4::timestamptz IS NULL THEN now() END,
+                last_error = $3, locked_by = NULL, locked_until = NULL, updated_at = now()
+            WHERE id = $1 AND locked_by = $2 AND status = 'running'
+            """,
+            job_id, worker_id, error, retry_at
+        )
+
+    async def progress(self, job_id: str, worker_id: str, progress: Dict[str, Any]):
+        await pg_pool.execute(
+            """
+            UPDATE background_jobs SET progress = $3::jsonb, updated_at = now()
+            WHERE id = $1 AND locked_by = $2 AND status = 'running'
+            """,
+            job_id, worker_id, progress
+        )
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await pg_pool.fetchrow("SELECT * FROM background_jobs WHERE id = $1", job_id)
+
+    async def list(self, organization_id: Optional[str], status: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        rows = await pg_pool.fetch(
+            """
+            SELECT * FROM background_jobs
+            WHERE ($1::uuid IS NULL OR organization_id = $1) AND ($2::text IS NULL OR status = $2)
+            ORDER BY created_at DESC
+            LIMIT $3
+            """,
+            organization_id, status, limit
+        )
+        return rows
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = await pg_pool.fetchrow(
+            """
+            UPDATE background_jobs SET status = 'cancelled', finished_at = now(), updated_at = now()
+            WHERE id = $1 AND status = 'queued'
+            RETURNING *
+            """,
+            job_id
+        )
+        return row
+
+    async def requeue_expired(self) -> int:
+        result = await pg_pool.execute(
+            """
+            UPDATE background_jobs
+            SET status = 'queued', locked_by = NULL, locked_until = NULL, run_after = now(),
+                last_error = 'Worker lease expired', updated_at = now()
+            WHERE status = 'running' AND locked_until < now()
+            """
+        )
+        return int(result.split()[-1])
+
+    async def counts(self) -> Dict[str, int]:
+        rows = await pg_pool.fetch("SELECT status, count(*) AS jobs FROM background_jobs GROUP BY status")
+        counts = {status: 0 for status in JOB_STATUSES}
+        counts.update({row["status"]: row["jobs"] for row in rows})
+        return counts
+
+
+class JobQueue:
+    """Enqueue jobs from the API; run them in worker loops (worker.py, or in-process for the memory backend)"""
+
+    def __init__(
+        self,
+        backend,
+        concurrency: int,
+        max_attempts: int,
+        retry_base_delay: float,
+        retry_max_delay: float,
+        lease_seconds: float,
+        poll_interval: float,
+    ):
+        self.backend = backend
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._handlers: Dict[str, JobHandler] = {}
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+        # Metrics (this process)
+        self.run_latency = LatencyHistogram(JOB_LATENCY_BUCKETS_MS)
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        """True while this process runs worker loops"""
+        return bool(self._tasks)
+
+    @property
+    def backend_name(self) -> str:
+        return "postgres" if isinstance(self.backend, PostgresJobBackend) else "memory"
+
+    def register(self, job_type: str):
+        """Decorator registering the handler for a job type"""
+        def decorator(handler: JobHandler) -> JobHandler:
+            self._handlers[job_type] = handler
+            return handler
+        return decorator
+
+    async def enqueue(
+        self,
+        job_type: str,
+        payload: Optional[Dict[str, Any]] = None,
+        priority: int = 0,
+        idempotency_key: Optional[str] = None,
+        organization_id: Optional[str] = None,
+        max_attempts: Optional[int] = None,
+        delay_seconds: float = 0,
+    ) -> Dict[str, Any]:
+        """Queue a job and return it
+
+        While a job with the same idempotency key is queued or running, that
+        job is returned instead of queueing a duplicate. Higher priority runs first.
+        """
+        now = _now()
+        job = {
+            "id": str(uuid.uuid4()),
+            "job_type": job_type,
+            "payload": payload or {},
+            "status": "queued",
+            "priority": priority,
+            "idempotency_key": idempotency_key,
+            "organization_id": organization_id,
+            "attempts": 0,
+            "max_attempts": max_attempts or self.max_attempts,
+            "run_after": now + timedelta(seconds=delay_seconds),
+            "locked_by": None,
+            "locked_until": None,
+            "progress": None,
+            "result": None,
+            "last_error": None,
+            "created_at": now,
+            "updated_at": now,
+            "started_at": None,
+            "finished_at": None,
+        }
+        job, created = await self.backend.enqueue(job)
+        if created:
+            self.enqueued += 1
+            self._wakeup.set()
+            logger.info(f"Queued job {job['id']} ({job_type}, priority {priority})")
+        else:
+            self.deduplicated += 1
+            logger.info(f"Job {job['id']} ({job_type}) already {job['status']} for key {idempotency_key}")
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.backend.get(job_id)
+
+    async def list(self, organization_id: Optional[str] = None, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        return await self.backend.list(organization_id, status, limit)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job (running jobs finish); None if it was not queued"""
+        return await self.backend.cancel(job_id)
+
+    async def report_progress(self, **progress):
+        """Record how far the running job has got (shown on the job until it finishes)
+
+        Called from inside a handler; outside a job run it does nothing.
+        """
+        job_id = _current_job.get()
+        if job_id is None:
+            return
+        try:
+            await self.backend.progress(job_id, self.worker_id, json.loads(json.dumps(progress, default=str)))
+        except Exception as e:
+            logger.warning(f"Failed to record progress for job {job_id}: {e}")
+
+    def _retry_delay(self, attempts: int) -> float:
+        """Exponential backoff with jitter, by number of attempts made so far"""
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** max(0, attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    async def run_one(self, job_types: Optional[Sequence[str]] = None) -> bool:
+        """Claim and run one ready job; False when there was nothing to do"""
+        job = await self.backend.claim(self.worker_id, job_types, self.lease_seconds)
+        if job is None:
+            return False
+
+        handler = self._handlers.get(job["job_type"])
+        started = time.perf_counter()
+        token = _current_job.set(job["id"])
+        try:
+            if handler is None:
+                raise LookupError(f"No handler registered for job type {job['job_type']}")
+            # Stop before the lease runs out, or another worker would pick the job up again
+            result = await asyncio.wait_for(handler(**job["payload"]), timeout=self.lease_seconds)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            retry_at = None
+            if handler is not None and job["attempts"] < job["max_attempts"]:
+                retry_at = _now() + timedelta(seconds=self._retry_delay(job["attempts"]))
+                self.retried += 1
+                logger.warning(f"Job {job['id']} ({job['job_type']}) attempt {job['attempts']} failed, retrying: {error}")
+            else:
+                self.failed += 1
+                logger.error(f"Job {job['id']} ({job['job_type']}) failed after {job['attempts']} attempts: {error}")
+            await self.backend.fail(job["id"], self.worker_id, error, retry_at)
+        else:
+            # Results are stored as JSON; anything json can't encode is stored as text
+            result = json.loads(json.dumps(result, default=str))
+            await self.backend.complete(job["id"], self.worker_id, result)
+            self.succeeded += 1
+            logger.info(f"Job {job['id']} ({job['job_type']}) succeeded in {time.perf_counter() - started:.1f}s")
+        finally:
+            _current_job.reset(token)
+            self.run_latency.observe((time.perf_counter() - started) * 1000)
+        return True
+
+    async def _worker_loop(self, job_types: Optional[Sequence[str]]):
+        while True:
+            try:
+                if await self.run_one(job_types):
+                    continue
+            except Exception as e:
+                logger.error(f"Job worker error: {e}")
+            # Idle: wait for a local enqueue or the next poll
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _reaper_loop(self):
+        """Put jobs whose worker died (lease expired) back in the queue"""
+        while True:
+            await asyncio.sleep(max(self.poll_interval, self.lease_seconds / 4))
+            try:
+                requeued = await self.backend.requeue_expired()
+                if requeued:
+                    logger.warning(f"Re-queued {requeued} jobs with expired leases")
+            except Exception as e:
+                logger.error(f"Job reaper error: {e}")
+
+    def start(self, job_types: Optional[Sequence[str]] = None, concurrency: Optional[int] = None):
+        """Start worker loops in this process"""
+        if self._tasks:
+            return
+        for _ in range(concurrency or self.concurrency):
+            self._tasks.append(asyncio.create_task(self._worker_loop(job_types)))
+        self._tasks.append(asyncio.create_task(self._reaper_loop()))
+        logger.info(f"✅ Job worker {self.worker_id} started ({self.backend_name}, concurrency={len(self._tasks) - 1})")
+
+    async def stop(self):
+        """Stop the worker loops; a job cut off mid-run is retried once its lease expires"""
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        for task in tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def startup(self):
+        """Pick the backend once the Postgres pool is known (called from the FastAPI lifespan)
+
+        The memory backend is only visible to this process, so its jobs are run here;
+        with Postgres, jobs run in worker.py unless JOB_WORKER_IN_PROCESS is set.
+        """
+        if isinstance(self.backend, PostgresJobBackend) and not pg_pool.enabled:
+            logger.warning("JOB_QUEUE_BACKEND=postgres needs DATABASE_URL, using the in-memory job queue")
+            self.backend = MemoryJobBackend()
+        if self.backend_name == "memory" or settings.JOB_WORKER_IN_PROCESS:
+            self.start()
+
+    async def stats(self) -> Dict[str, Any]:
+        try:
+            counts = await self.backend.counts()
+        except Exception as e:
+            logger.error(f"Failed to count jobs: {e}")
+            counts = {}
+        return {
+            "backend": self.backend_name,
+            "worker_id": self.worker_id,
+            "workers_running": max(0, len(self._tasks) - 1),
+            "handlers": sorted(self._handlers),
+            "jobs": counts,
+            "enqueued": self.enqueued,
+            "deduplicated": self.deduplicated,
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "run_latency": self.run_latency.snapshot(),
+        }
+
+
+def create_job_backend():
+    """Job storage selected by JOB_QUEUE_BACKEND"""
+    if settings.JOB_QUEUE_BACKEND == "postgres":
+        return PostgresJobBackend()
+    return MemoryJobBackend()
+
+
+# Global queue instance
+job_queue = JobQueue(
+    backend=create_job_backend(),
+    concurrency=settings.JOB_WORKER_CONCURRENCY,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retry_base_delay=settings.JOB_RETRY_BASE_DELAY,
+    retry_max_delay=settings.JOB_RETRY_MAX_DELAY,
+    lease_seconds=settings.JOB_LEASE_SECONDS,
+    poll_interval=settings.JOB_POLL_INTERVAL,
+)
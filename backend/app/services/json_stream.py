@@ -0,0 +1,97 @@
+"""
+Incremental JSON parsing for streamed LLM output.
+Picks complete elements out of one array of a JSON document while the document is still being generated.
+"""
+
+import json
+from typing import Any, List, Optional
+
+
+class JSONArrayStreamParser:
+    """Emit the elements of a top-level array field as soon as each one is complete
+
+    Feed text chunks as they arrive; `feed` returns the newly completed
+    elements of `array_key` (e.g. each object in "forecasts"). Anything before
+    the first "{" - such as a ```json fence - is ignored. The full text is kept
+    so the whole document can still be parsed at the end.
+    """
+
+    def __init__(self, array_key: str):
+        self.array_key = array_key
+        self.text = ""
+        self._position = 0
+        self._depth = 0
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._element_start: Optional[int] = None
+        self.emitted = 0
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume a chunk; return the array elements completed by it"""
+        self.text += chunk
+        completed = []
+        text = self.text
+        for index in range(self._position, len(text)):
+            char = text[index]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        # At the top level the last string before "[" is always that array's key
+                        self._last_key = text[self._string_start + 1:index]
+                continue
+
+            if not self._started:
+                if char == "{":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = index
+            elif char in "{[":
+                if (
+                    char == "{"
+                    and self._array_depth is not None
+                    and self._depth == self._array_depth
+                    and self._element_start is None
+                ):
+                    self._element_start = index
+                self._depth += 1
+                if char == "[" and self._depth == 2 and self._last_key == self.array_key:
+                    self._array_depth = self._depth
+            elif char in "}]":
+                self._depth -= 1
+                if self._array_depth is not None:
+                    if char == "}" and self._element_start is not None and self._depth == self._array_depth:
+                        element = text[self._element_start:index + 1]
+                        self._element_start = None
+                        try:
+                            completed.append(json.loads(element))
+                            self.emitted += 1
+                        except json.JSONDecodeError:
+                            # Malformed element; the final full parse decides what to do
+                            pass
+                    elif char == "]" and self._depth == self._array_depth - 1:
+                        self._array_depth = None
+
+        self._position = len(text)
+        return completed
+
+    def document(self) -> Any:
+        """Parse the complete document (raises json.JSONDecodeError if it is not valid JSON)"""
+        start = self.text.find("{")
+        end = self.text.rfind("}")
+        if start < 0 or end < start:
+            raise json.JSONDecodeError("No JSON object in streamed response", self.text, 0)
+        return json.loads(self.text[start:end + 1])
@@ -0,0 +1,168 @@
+"""
+LLM response cache for MedInventory.
+Stores completions in SQLite keyed by a hash of everything that determines the model output,
+so identical prompts (same inventory summary, bid request, email body) skip the model call.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+
+def prompt_cache_key(model: str, system_prompt: Optional[str], prompt: str, temperature: float, max_tokens: int) -> str:
+    """Content address of a completion request"""
+    material = json.dumps([model, system_prompt, prompt, temperature, max_tokens], separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """SQLite-backed completion cache with TTL and size-bounded LRU eviction
+
+    One database file per host; gunicorn workers on the same machine share it.
+    Queries run in a thread so the event loop never waits on disk.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+        # Metrics (this worker)
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    total_tokens INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_llm_responses_last_access ON llm_responses(last_access)")
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def _get(self, key: str) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            connection = self._connect()
+            now = time.time()
+            row = connection.execute(
+                "SELECT response, total_tokens FROM llm_responses WHERE key = ? AND created_at >= ?",
+                (key, now - self.ttl_seconds),
+            ).fetchone()
+            if row is not None:
+                connection.execute("UPDATE llm_responses SET last_access = ? WHERE key = ?", (now, key))
+                connection.commit()
+            return row
+
+    def _set(self, key: str, response: str, total_tokens: int) -> int:
+        with self._lock:
+            connection = self._connect()
+            now = time.time()
+            connection.execute(
+                "INSERT OR REPLACE INTO llm_responses (key, response, total_tokens, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, response, total_tokens, now, now),
+            )
+            # Expired rows go first, then least recently used beyond the size bound
+            evicted = connection.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            evicted += connection.execute(
+                """
+                DELETE FROM llm_responses WHERE key IN (
+                    SELECT key FROM llm_responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            ).rowcount
+            connection.commit()
+            return evicted
+
+    def _delete(self, key: str):
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            connection.commit()
+
+    async def get(self, key: str) -> Optional[Tuple[str, int]]:
+        """Return (response, tokens the original call used), or None"""
+        if not self.enabled:
+            return None
+        row = await asyncio.to_thread(self._get, key)
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.tokens_saved += row[1]
+        return row[0], row[1]
+
+    async def set(self, key: str, response: str, total_tokens: int = 0):
+        if not self.enabled:
+            return
+        self.evictions += await asyncio.to_thread(self._set, key, response, total_tokens)
+
+    async def delete(self, key: str):
+        if not self.enabled:
+            return
+        await asyncio.to_thread(self._delete, key)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return round(self.hits / lookups, 4) if lookups else 0.0
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "tokens_saved": self.tokens_saved,
+            "evictions": self.evictions,
+        }
+
+
+# Global cache instance
+llm_cache = LLMResponseCache(
+    path=settings.LLM_CACHE_PATH,
+    max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,263 @@
+"""
+Statistical demand forecasting for MedInventory.
+Forecasts every item from its inventory_transactions history in one vectorized pass: simple exponential
+smoothing for regular demand, Croston (SBA) for intermittent demand, plus safety stock and reorder points.
+"""
+
+import math
+from datetime import date
+from statistics import NormalDist
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+
+# Syntetos-Boylan cut-off: items with a longer average interval between demands are intermittent
+INTERMITTENT_ADI_THRESHOLD = 1.32
+
+# Forecast horizon per forecast_period
+PERIOD_DAYS = {"7d": 7, "30d": 30, "90d": 90, "6m": 182, "1y": 365}
+
+# Relative change in the demand rate over the horizon that counts as a trend
+TREND_THRESHOLD = 0.1
+
+
+def demand_matrix(
+    item_ids: Sequence[str],
+    transactions: pd.DataFrame,
+    end_date: date,
+    history_days: int,
+) -> np.ndarray:
+    """Daily consumption per item: one row per entry of `item_ids`, one column per day ending at `end_date`
+
+    `transactions` needs item_id, day (date or timestamp) and quantity columns;
+    rows for unknown items or days outside the window are ignored.
+    """
+    matrix = np.zeros((len(item_ids), history_days), dtype=np.float64)
+    if transactions.empty:
+        return matrix
+
+    rows = pd.Index(item_ids).get_indexer(transactions["item_id"])
+    days = pd.to_datetime(transactions["day"], utc=True, format="ISO8601").dt.tz_localize(None)
+    days = days.to_numpy().astype("datetime64[D]")
+    age = (np.datetime64(end_date, "D") - days).astype(np.int64)
+    columns = history_days - 1 - age
+    keep = (rows >= 0) & (columns >= 0) & (columns < history_days)
+
+    # Sum duplicates (several transactions per item and day) in one pass
+    flat = rows[keep] * history_days + columns[keep]
+    matrix += np.bincount(
+        flat, weights=transactions["quantity"].to_numpy(dtype=np.float64)[keep], minlength=matrix.size
+    ).reshape(matrix.shape)
+    return matrix
+
+
+class StatisticalForecastEngine:
+    """Vectorized SES / Croston forecaster
+
+    Works on a (items x days) demand matrix; time is iterated once and every
+    update is a NumPy operation across all items, so the cost grows with the
+    history length, not with the number of items.
+    """
+
+    def __init__(self, alpha: float, service_level: float, lead_time_days: float):
+        self.alpha = alpha
+        self.service_level = service_level
+        self.lead_time_days = lead_time_days
+        self.z = NormalDist().inv_cdf(service_level)
+
+    def forecast(self, demand: np.ndarray, horizon_days: int) -> Dict[str, np.ndarray]:
+        """Per-item daily rate, horizon demand, safety stock and reorder point"""
+        n_items, n_days = demand.shape
+        alpha = self.alpha
+        nonzero = demand > 0
+        demand_days = nonzero.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            adi = np.where(demand_days > 0, n_days / demand_days, np.inf)
+            mean_size = np.where(demand_days > 0, demand.sum(axis=1) / demand_days, 0.0)
+        intermittent = adi > INTERMITTENT_ADI_THRESHOLD
+
+        # Exponential smoothing state
+        warmup = min(n_days, max(1, horizon_days))
+        level = demand[:, :warmup].mean(axis=1)
+        ses_sse = np.zeros(n_items)
+
+        # Croston state: demand size, interval between demands, days since the last demand
+        size = mean_size.copy()
+        interval = np.where(np.isfinite(adi), adi, float(n_days))
+        since_last = np.zeros(n_items)
+        croston_sse = np.zeros(n_items)
+        sba = 1 - alpha / 2
+        hit = nonzero.astype(np.float64)
+        no_hit = 1.0 - hit
+
+        # Rate as it stood one horizon ago, for the backtest and trend
+        backtest_at = max(0, n_days - horizon_days)
+        past_rate = np.where(intermittent, sba * size / interval, level)
+
+        for t in range(n_days):
+            if t == backtest_at:
+                past_rate = np.where(intermittent, sba * size / interval, level)
+            y = demand[:, t]
+
+            error = y - level
+            if t >= warmup:
+                ses_sse += error * error
+            level += alpha * error
+
+            since_last += 1
+            error = y - sba * size / interval
+            if t >= warmup:
+                croston_sse += error * error
+            # Update size and interval only on demand days (masked arithmetic beats fancy indexing)
+            step = alpha * hit[:, t]
+            size += step * (y - size)
+            interval += step * (since_last - interval)
+            since_last *= no_hit[:, t]
+
+        scored_days = max(1, n_days - warmup)
+        rate = np.where(intermittent, sba * size / interval, level)
+        sigma = np.sqrt(np.where(intermittent, croston_sse, ses_sse) / scored_days)
+        safety_stock = self.z * sigma * math.sqrt(self.lead_time_days)
+
+        # Backtest: what the model said one horizon ago vs what was actually used since
+        actual = demand[:, backtest_at:].sum(axis=1)
+        predicted_then = past_rate * (n_days - backtest_at)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            item_accuracy = np.where(
+                actual > 0, 1 - np.abs(actual - predicted_then) / actual, np.where(predicted_then > 0, 0.0, 1.0)
+            )
+            change = np.where(past_rate > 0, (rate - past_rate) / past_rate, np.where(rate > 0, 1.0, 0.0))
+
+        total_actual = actual.sum()
+        overall_accuracy = (
+            1 - np.abs(actual - predicted_then).sum() / total_actual if total_actual > 0 else 1.0
+        )
+
+        return {
+            "daily_rate": rate,
+            "predicted_demand": rate * horizon_days,
+            "sigma": sigma,
+            "safety_stock": safety_stock,
+            "reorder_point": rate * self.lead_time_days + safety_stock,
+            "intermittent": intermittent,
+            "accuracy": np.clip(item_accuracy, 0, 1),
+            "change": change,
+            "overall_accuracy": np.float64(max(0.0, overall_accuracy)),
+        }
+
+    def build_forecast(
+        self,
+        items: List[Dict[str, Any]],
+        demand: np.ndarray,
+        forecast_period: str = "30d",
+    ) -> Dict[str, Any]:
+        """Forecast document in the same shape the AI forecast uses, for every item in `items`"""
+        horizon_days = PERIOD_DAYS.get(forecast_period, 30)
+        result = self.forecast(demand, horizon_days)
+
+        stock = np.array([item.get("quantity") or 0 for item in items], dtype=np.float64)
+        predicted = np.ceil(result["predicted_demand"]).astype(np.int64)
+        safety_stock = np.ceil(result["safety_stock"]).astype(np.int64)
+        reorder_point = np.ceil(result["reorder_point"]).astype(np.int64)
+        order_quantity = np.maximum(0, reorder_point + predicted - stock).astype(np.int64)
+        risk = np.where(stock <= safety_stock, "high", np.where(stock <= reorder_point, "medium", "low"))
+        trend = np.where(
+            result["change"] > TREND_THRESHOLD, "increasing",
+            np.where(result["change"] < -TREND_THRESHOLD, "decreasing", "stable")
+        )
+        method = np.where(result["intermittent"], "croston", "ses")
+        confidence = np.rint(result["accuracy"] * 100).astype(np.int64)
+
+        # Plain Python lists: indexing NumPy arrays per element is several times slower
+        columns = zip(
+            items, stock.astype(np.int64).tolist(), predicted.tolist(), confidence.tolist(), risk.tolist(),
+            order_quantity.tolist(), trend.tolist(), safety_stock.tolist(), reorder_point.tolist(),
+            np.round(result["daily_rate"], 3).tolist(), method.tolist(),
+        )
+        forecasts = [
+            {
+                "item_id": item.get("id"),
+                "item_name": item.get("name", "Unknown"),
+                "item_category": item.get("category", "Unknown"),
+                "current_stock": current,
+                "predicted_demand": demand_,
+                "confidence_score": score,
+                "risk_level": level,
+                "recommendation": f"Order {order} units" if level != "low" else "Stock levels adequate",
+                "trend": direction,
+                "difference": current - demand_,
+                "safety_stock": safety,
+                "reorder_point": reorder,
+                "daily_demand": daily,
+                "method": model,
+            }
+            for (item, current, demand_, score, level, order, direction, safety, reorder, daily, model) in columns
+        ]
+
+        high = int((risk == "high").sum())
+        medium = int((risk == "medium").sum())
+        intermittent = int(result["intermittent"].sum())
+        insights = [
+            {
+                "type": "Stock Alert",
+                "title": "Below Safety Stock" if high else "Stock Levels",
+                "description": f"{high} items are below safety stock, {medium} more are at or below their reorder point",
+                "priority": "high" if high else "low",
+                "category": "Stock Alert",
+                "action_required": bool(high or medium),
+                "action_description": "Reorder items at or below their reorder point",
+            },
+            {
+                "type": "Demand Pattern",
+                "title": "Intermittent Demand",
+                "description": f"{intermittent} of {len(items)} items have intermittent demand and use Croston's method",
+                "priority": "low",
+                "category": "Demand Pattern",
+                "action_required": False,
+                "action_description": "",
+            },
+        ]
+
+        # Largest expected consumers first in the overview chart
+        top = np.argsort(-result["predicted_demand"], kind="stable")[:10]
+        chart_data = {
+            "demand_overview": [
+                {"name": forecasts[i]["item_name"], "forecast": forecasts[i]["predicted_demand"],
+                 "actual": forecasts[i]["current_stock"]}
+                for i in top
+            ],
+            "reorder_points": [
+                {"name": forecasts[i]["item_name"], "reorder_point": forecasts[i]["reorder_point"],
+                 "safety_stock": forecasts[i]["safety_stock"]}
+                for i in top
+            ],
+        }
+
+        return {
+            "forecasts": forecasts,
+            "insights": insights,
+            "chart_data": chart_data,
+            "overall_accuracy": round(float(result["overall_accuracy"]) * 100, 2),
+            "total_items_forecasted": len(forecasts),
+            "ai_model_version": "statistical",
+            "stock_alerts": {
+                "critical_items": high,
+                "high_risk_items": medium,
+                "total_alerts": high + medium,
+                "immediate_actions": [
+                    f"Order {order_quantity[i]} units of {forecasts[i]['item_name']}"
+                    for i in np.flatnonzero(risk == "high")[:10]
+                ],
+            },
+        }
+
+
+# Global engine instance
+statistical_forecast_engine = StatisticalForecastEngine(
+    alpha=settings.FORECAST_SMOOTHING_ALPHA,
+    service_level=settings.FORECAST_SERVICE_LEVEL,
+    lead_time_days=settings.FORECAST_LEAD_TIME_DAYS,
+)
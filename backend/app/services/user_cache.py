@@ -0,0 +1,97 @@
+"""
+Authenticated user cache for MedInventory.
+Keeps recently authenticated user rows in memory so get_current_user does not hit the database on every request.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.config import settings
+
+CacheKey = Tuple[str, Optional[int]]
+
+
+class UserPrincipalCache:
+    """TTL + LRU cache of user rows keyed by (user_id, token iat)
+
+    Entries are per worker. Explicit invalidation covers changes made through
+    this worker; the TTL bounds how long another worker can serve a stale row.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._keys_by_user: Dict[str, Set[CacheKey]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, user_id: str, issued_at: Optional[int]) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached user row, or None on miss/expiry"""
+        key = (user_id, issued_at)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, user = entry
+        if expires_at < time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(user)
+
+    def set(self, user_id: str, issued_at: Optional[int], user: Dict[str, Any]):
+        """Cache a user row for this token"""
+        if self.max_entries <= 0:
+            return
+        key = (user_id, issued_at)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, dict(user))
+        self._entries.move_to_end(key)
+        self._keys_by_user.setdefault(user_id, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def invalidate_user(self, user_id: str):
+        """Drop every cached entry for a user (all tokens)"""
+        for key in list(self._keys_by_user.get(user_id, ())):
+            self._remove(key)
+
+    def clear(self):
+        self._entries.clear()
+        self._keys_by_user.clear()
+
+    def _remove(self, key: CacheKey):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# Global cache instance
+user_cache = UserPrincipalCache(
+    max_entries=settings.USER_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.USER_CACHE_TTL_SECONDS,
+)
@@ -272,13 +272,25 @@ CREATE INDEX idx_user_audit_log_organization_id ON user_audit_log(organization_i
 CREATE INDEX idx_user_audit_log_action ON user_audit_log(action);
 CREATE INDEX idx_user_audit_log_resource_type ON user_audit_log(resource_type);
 CREATE INDEX idx_user_audit_log_created_at ON user_audit_log(created_at);
+CREATE INDEX idx_user_audit_log_org_created_id ON user_audit_log(organization_id, created_at, id);
 
 -- Multi-tenancy indexes for existing tables
-CREATE INDEX idx_inventory_items_organization_id ON inventory_items(organization_id);
-CREATE INDEX idx_suppliers_organization_id ON suppliers(organization_id);
-CREATE INDEX idx_equipment_organization_id ON equipment(organization_id);
-CREATE INDEX idx_bid_requests_organization_id ON bid_requests(organization_id);
-CREATE INDEX idx_inventory_transactions_organization_id ON inventory_transactions(organization_id);
+-- Every read is scoped to one organization, so organization_id leads each index and the
+-- rest follows the filters and sort orders the API uses; a tenant's page never touches
+-- other tenants' rows however many organizations share the table.
+CREATE INDEX idx_inventory_items_org_name_id ON inventory_items(organization_id, name, id);
+CREATE INDEX idx_inventory_items_org_category_status ON inventory_items(organization_id, category, status);
+CREATE INDEX idx_inventory_items_org_status ON inventory_items(organization_id, status);
+CREATE INDEX idx_inventory_items_org_expiry_id ON inventory_items(organization_id, expiry_date, id);
+-- Superseded by the tenant-scoped index above; left in place, the planner prefers it for the
+-- expiry report and filters out other tenants' rows
+DROP INDEX IF EXISTS idx_inventory_items_expiry;
+CREATE INDEX idx_suppliers_org_name ON suppliers(organization_id, name);
+CREATE INDEX idx_equipment_org_name_id ON equipment(organization_id, name, id);
+CREATE INDEX idx_equipment_org_status ON equipment(organization_id, status);
+CREATE INDEX idx_bid_requests_org_created_id ON bid_requests(organization_id, created_at, id);
+CREATE INDEX idx_bid_requests_org_status ON bid_requests(organization_id, status);
+CREATE INDEX idx_inventory_transactions_org_created_id ON inventory_transactions(organization_id, created_at, id);
 
 -- =====================================================
 -- TRIGGERS FOR UPDATED_AT TIMESTAMPS
@@ -439,6 +451,395 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql SECURITY DEFINER;
 
+-- Function to write batched activity timestamps in one round-trip
+-- p_users:    [{"id": "<user uuid>", "seen_at": "<timestamptz>", "login_at": "<timestamptz or null>"}, ...]
+-- p_sessions: [{"id": "<session uuid>", "seen_at": "<timestamptz>"}, ...]
+CREATE OR REPLACE FUNCTION flush_activity(p_users JSONB, p_sessions JSONB)
+RETURNS INTEGER AS $$
+DECLARE
+    user_count INTEGER;
+    session_count INTEGER;
+BEGIN
+    UPDATE users u
+    SET last_activity_at = GREATEST(u.last_activity_at, a.seen_at),
+        last_login_at = GREATEST(u.last_login_at, a.login_at)
+    FROM jsonb_to_recordset(p_users) AS a(id UUID, seen_at TIMESTAMPTZ, login_at TIMESTAMPTZ)
+    WHERE u.id = a.id;
+    GET DIAGNOSTICS user_count = ROW_COUNT;
+    
+    UPDATE user_sessions s
+    SET last_activity_at = GREATEST(s.last_activity_at, a.seen_at)
+    FROM jsonb_to_recordset(p_sessions) AS a(id UUID, seen_at TIMESTAMPTZ)
+    WHERE s.id = a.id;
+    GET DIAGNOSTICS session_count = ROW_COUNT;
+    
+    RETURN user_count + session_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- =====================================================
+-- INVENTORY EXPIRY REPORT
+-- =====================================================
+
+-- Items per (organization, expiry date), so the report's bucket counts add up at most one row
+-- per distinct date instead of scanning every item. Kept current by statement-level triggers,
+-- which fold a bulk insert or update into one upsert per date; updates that leave expiry_date
+-- and organization_id alone cancel out and write nothing.
+CREATE TABLE inventory_expiry_counts (
+    organization_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+    expiry_date DATE NOT NULL,
+    items INTEGER NOT NULL,
+    PRIMARY KEY (organization_id, expiry_date)
+);
+
+CREATE OR REPLACE FUNCTION refresh_inventory_expiry_counts()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO inventory_expiry_counts (organization_id, expiry_date, items)
+        SELECT organization_id, expiry_date, count(*) FROM new_rows
+        WHERE organization_id IS NOT NULL AND expiry_date IS NOT NULL
+        GROUP BY organization_id, expiry_date
+        ON CONFLICT (organization_id, expiry_date) DO UPDATE SET items = inventory_expiry_counts.items + EXCLUDED.items;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE inventory_expiry_counts c SET items = c.items - o.items
+        FROM (SELECT organization_id, expiry_date, count(*) AS items FROM old_rows
+              WHERE organization_id IS NOT NULL AND expiry_date IS NOT NULL
+              GROUP BY organization_id, expiry_date) o
+        WHERE c.organization_id = o.organization_id AND c.expiry_date = o.expiry_date;
+    ELSE
+        INSERT INTO inventory_expiry_counts (organization_id, expiry_date, items)
+        SELECT organization_id, expiry_date, sum(delta) FROM (
+            SELECT organization_id, expiry_date, -1 AS delta FROM old_rows
+            UNION ALL
+            SELECT organization_id, expiry_date, 1 FROM new_rows
+        ) changes
+        WHERE organization_id IS NOT NULL AND expiry_date IS NOT NULL
+        GROUP BY organization_id, expiry_date
+        HAVING sum(delta) <> 0
+        ON CONFLICT (organization_id, expiry_date) DO UPDATE SET items = inventory_expiry_counts.items + EXCLUDED.items;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER refresh_inventory_expiry_counts_insert AFTER INSERT ON inventory_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_inventory_expiry_counts();
+CREATE TRIGGER refresh_inventory_expiry_counts_update AFTER UPDATE ON inventory_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_inventory_expiry_counts();
+CREATE TRIGGER refresh_inventory_expiry_counts_delete AFTER DELETE ON inventory_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_inventory_expiry_counts();
+
+-- Count the items that existed before the triggers
+INSERT INTO inventory_expiry_counts (organization_id, expiry_date, items)
+SELECT organization_id, expiry_date, count(*) FROM inventory_items
+WHERE organization_id IS NOT NULL AND expiry_date IS NOT NULL
+GROUP BY organization_id, expiry_date;
+
+-- First and last-plus-one expiry date of an expiry bucket (NULL p_status: every date)
+CREATE OR REPLACE FUNCTION expiry_bucket_start(p_status TEXT, p_today DATE, p_days_threshold INTEGER)
+RETURNS DATE AS $$
+    SELECT CASE p_status WHEN 'expiring-soon' THEN p_today
+                         WHEN 'ok' THEN p_today + p_days_threshold + 1
+                         ELSE '-infinity'::date END;
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION expiry_bucket_end(p_status TEXT, p_today DATE, p_days_threshold INTEGER)
+RETURNS DATE AS $$
+    SELECT CASE p_status WHEN 'expired' THEN p_today
+                         WHEN 'expiring-soon' THEN p_today + p_days_threshold + 1
+                         ELSE 'infinity'::date END;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- One page of an organization's dated items, soonest expiry first, with each item's bucket
+-- (expired, expiring-soon within p_days_threshold days, ok) and the three bucket counts (from
+-- inventory_expiry_counts) on every row. p_status limits the page to one bucket, which is a
+-- date range, so the page is a range scan of idx_inventory_items_org_expiry_id; the page after
+-- a cursor starts after (p_after_date, p_after_id). An empty page still returns one row, with
+-- a NULL id, for the counts.
+CREATE OR REPLACE FUNCTION inventory_expiry(
+    p_organization_id UUID,
+    p_today DATE,
+    p_days_threshold INTEGER DEFAULT 30,
+    p_status TEXT DEFAULT NULL,
+    p_after_date DATE DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT 50
+)
+RETURNS TABLE (
+    expired_count BIGINT, expiring_soon_count BIGINT, ok_count BIGINT,
+    id UUID, name VARCHAR, category VARCHAR, batch_number VARCHAR, expiry_date DATE, quantity INTEGER,
+    unit VARCHAR, location VARCHAR, supplier_name VARCHAR, expiry_status TEXT, days_until_expiry INTEGER
+) AS $$
+    WITH counts AS (
+        SELECT COALESCE(sum(e.items) FILTER (WHERE e.expiry_date < p_today), 0)::BIGINT AS expired_count,
+               COALESCE(sum(e.items) FILTER (WHERE e.expiry_date >= p_today AND e.expiry_date <= p_today + p_days_threshold), 0)::BIGINT AS expiring_soon_count,
+               COALESCE(sum(e.items) FILTER (WHERE e.expiry_date > p_today + p_days_threshold), 0)::BIGINT AS ok_count
+        FROM inventory_expiry_counts e
+        WHERE e.organization_id = p_organization_id
+    ),
+    page AS (
+        SELECT i.id, i.name, i.category, i.batch_number, i.expiry_date, i.quantity, i.unit, i.location,
+               s.name AS supplier_name,
+               CASE WHEN i.expiry_date < p_today THEN 'expired'
+                    WHEN i.expiry_date <= p_today + p_days_threshold THEN 'expiring-soon'
+                    ELSE 'ok' END AS expiry_status,
+               i.expiry_date - p_today AS days_until_expiry
+        FROM inventory_items i
+        LEFT JOIN suppliers s ON s.id = i.supplier_id
+        WHERE i.organization_id = p_organization_id
+        -- The bucket start and the cursor make a single lower bound, so the index scan
+        -- starts at whichever is later instead of at the first date
+        AND (i.expiry_date, i.id) > (
+            GREATEST(p_after_date, expiry_bucket_start(p_status, p_today, p_days_threshold) - 1),
+            CASE WHEN p_after_date >= expiry_bucket_start(p_status, p_today, p_days_threshold) THEN p_after_id
+                 ELSE 'ffffffff-ffff-ffff-ffff-ffffffffffff'::uuid END
+        )
+        AND i.expiry_date < expiry_bucket_end(p_status, p_today, p_days_threshold)
+        ORDER BY i.expiry_date, i.id
+        LIMIT p_limit
+    )
+    SELECT c.expired_count, c.expiring_soon_count, c.ok_count, p.*
+    FROM counts c
+    LEFT JOIN page p ON TRUE
+    ORDER BY p.expiry_date, p.id;
+$$ LANGUAGE sql STABLE;
+
+-- =====================================================
+-- INVENTORY STOCK MOVEMENTS
+-- =====================================================
+
+-- Apply a quantity change to one of an organization's items in a single call: the row is
+-- locked, the new quantity (floored at 0) and status (against reorder_level) are written, the
+-- movement is logged in inventory_transactions, and the updated item is returned. Concurrent
+-- changes to the same item queue on the row lock, so none is lost. No row is returned when the
+-- item does not exist or belongs to another organization.
+DROP FUNCTION IF EXISTS adjust_inventory_quantity(UUID, INTEGER, TEXT, TEXT);  -- the unscoped version
+CREATE OR REPLACE FUNCTION adjust_inventory_quantity(
+    p_organization_id UUID,
+    p_item_id UUID,
+    p_quantity_change INTEGER,
+    p_transaction_type TEXT,
+    p_reference_type TEXT DEFAULT NULL
+) RETURNS SETOF inventory_items AS $$
+DECLARE
+    old_quantity INTEGER;
+    item inventory_items;
+BEGIN
+    SELECT quantity INTO old_quantity FROM inventory_items
+    WHERE id = p_item_id AND organization_id = p_organization_id
+    FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    UPDATE inventory_items
+    SET quantity = GREATEST(0, old_quantity + p_quantity_change),
+        status = CASE WHEN GREATEST(0, old_quantity + p_quantity_change) = 0 THEN 'out_of_stock'
+                      WHEN GREATEST(0, old_quantity + p_quantity_change) <= reorder_level THEN 'low_stock'
+                      ELSE 'in_stock' END,
+        updated_at = NOW()
+    WHERE id = p_item_id AND organization_id = p_organization_id
+    RETURNING * INTO item;
+
+    INSERT INTO inventory_transactions (item_id, organization_id, transaction_type, quantity, reference_type, notes)
+    -- The applied change: a decrement floored at 0 moved less stock than was asked for
+    VALUES (p_item_id, p_organization_id, p_transaction_type, abs(item.quantity - old_quantity),
+            COALESCE(p_reference_type, 'manual'),
+            'Quantity changed from ' || old_quantity || ' to ' || item.quantity);
+
+    RETURN NEXT item;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Apply a batch of quantity changes (a ward restock, a goods receipt) in one call with
+-- set-based statements: the batch's items are locked in id order, so concurrent batches cannot
+-- deadlock, every item is written once and every line is logged by one multi-row insert.
+-- p_movements: [{"item_id": "<uuid>", "quantity_change": <int, non-zero>, "transaction_type": "add|subtract|adjust",
+--                "reference_type": "<text or null>", "reference_id": "<text or null>", "notes": "<text or null>"}, ...]
+-- Lines apply in order with the same floor at 0 as adjust_inventory_quantity(). Returns one row
+-- per line; when any line's item is missing from the organization, nothing is written and
+-- those lines come back with found = false.
+CREATE OR REPLACE FUNCTION apply_stock_movements(p_organization_id UUID, p_movements JSONB)
+RETURNS TABLE (
+    line INTEGER, item_id UUID, found BOOLEAN, quantity_before INTEGER, quantity_after INTEGER,
+    status VARCHAR, transaction_id UUID
+) AS $$
+BEGIN
+    PERFORM 1 FROM inventory_items i
+    WHERE i.organization_id = p_organization_id
+    AND i.id IN (SELECT (m->>'item_id')::uuid FROM jsonb_array_elements(p_movements) m)
+    ORDER BY i.id
+    FOR UPDATE;
+
+    RETURN QUERY
+    WITH lines AS (
+        SELECT m.ordinality::INTEGER AS line, m.item_id, m.quantity_change, m.transaction_type,
+               m.reference_type, m.reference_id, m.notes, uuid_generate_v4() AS transaction_id
+        FROM ROWS FROM (jsonb_to_recordset(p_movements) AS (
+            item_id UUID, quantity_change INTEGER, transaction_type TEXT,
+            reference_type TEXT, reference_id TEXT, notes TEXT
+        )) WITH ORDINALITY AS m
+    ),
+    running AS (
+        -- Quantity after each line if nothing were floored
+        SELECT l.*, i.id IS NOT NULL AS found, i.quantity AS start_quantity, i.reorder_level,
+               i.quantity + sum(l.quantity_change) OVER (PARTITION BY l.item_id ORDER BY l.line) AS unfloored
+        FROM lines l
+        LEFT JOIN inventory_items i ON i.id = l.item_id AND i.organization_id = p_organization_id
+    ),
+    floored AS (
+        -- Flooring at 0 after every line equals subtracting the lowest negative running total so far
+        SELECT r.*, r.unfloored - LEAST(0, min(r.unfloored) OVER (PARTITION BY r.item_id ORDER BY r.line)) AS after
+        FROM running r
+    ),
+    moved AS (
+        SELECT f.*,
+               COALESCE(lag(f.after) OVER (PARTITION BY f.item_id ORDER BY f.line), f.start_quantity) AS before,
+               CASE WHEN f.after = 0 THEN 'out_of_stock'
+                    WHEN f.after <= f.reorder_level THEN 'low_stock'
+                    ELSE 'in_stock' END AS new_status,
+               bool_and(f.found) OVER () AS all_found
+        FROM floored f
+    ),
+    updated AS (
+        UPDATE inventory_items i
+        SET quantity = last.after, status = last.new_status, updated_at = NOW()
+        FROM (SELECT DISTINCT ON (m.item_id) m.item_id, m.after, m.new_status
+              FROM moved m WHERE m.all_found
+              ORDER BY m.item_id, m.line DESC) last
+        WHERE i.id = last.item_id
+    ),
+    logged AS (
+        INSERT INTO inventory_transactions
+            (id, item_id, organization_id, transaction_type, quantity, reference_type, reference_id, notes)
+        -- The applied change per line (a floored decrement moves less than was asked for)
+        SELECT m.transaction_id, m.item_id, p_organization_id, m.transaction_type, abs(m.after - m.before),
+               COALESCE(m.reference_type, 'manual'), m.reference_id,
+               COALESCE(m.notes, 'Quantity changed from ' || m.before || ' to ' || m.after)
+        FROM moved m WHERE m.all_found
+        ORDER BY m.line
+    )
+    SELECT m.line, m.item_id, m.found, m.before::INTEGER, m.after::INTEGER,
+           CASE WHEN m.found THEN m.new_status END::VARCHAR,
+           CASE WHEN m.all_found THEN m.transaction_id END
+    FROM moved m
+    ORDER BY m.line;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- INVENTORY DASHBOARD STATS
+-- =====================================================
+
+-- Items, stock and stock value per (organization, category), so the dashboard adds up one row
+-- per category instead of scanning the organization's items. Kept current by statement-level
+-- triggers like inventory_expiry_counts: a statement's old rows count -1 and its new rows +1,
+-- so a stock movement (one UPDATE, however many items) writes one upsert per category it
+-- touched, moving the totals and status counts by the difference. The counter row is held
+-- until the writing transaction commits, so concurrent movements in one category serialize
+-- on it; keep those transactions short.
+CREATE TABLE inventory_category_stats (
+    organization_id UUID NOT NULL REFERENCES organizations(id) ON DELETE CASCADE,
+    category VARCHAR(100) NOT NULL,
+    item_count INTEGER NOT NULL DEFAULT 0,
+    total_quantity BIGINT NOT NULL DEFAULT 0,
+    total_value NUMERIC(16,2) NOT NULL DEFAULT 0,
+    low_stock_count INTEGER NOT NULL DEFAULT 0,
+    out_of_stock_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (organization_id, category)
+);
+
+CREATE OR REPLACE FUNCTION refresh_inventory_category_stats()
+RETURNS TRIGGER AS $$
+DECLARE
+    old_changes TEXT := 'SELECT organization_id, category, quantity, price, status, -1 AS delta FROM old_rows';
+    new_changes TEXT := 'SELECT organization_id, category, quantity, price, status, 1 AS delta FROM new_rows';
+    changes TEXT := CASE TG_OP WHEN 'INSERT' THEN new_changes
+                               WHEN 'DELETE' THEN old_changes
+                               ELSE old_changes || ' UNION ALL ' || new_changes END;
+BEGIN
+    -- Transition tables are visible to EXECUTE, so the three cases share one upsert
+    EXECUTE format($sql$
+        INSERT INTO inventory_category_stats AS s (organization_id, category, item_count, total_quantity,
+                                                   total_value, low_stock_count, out_of_stock_count)
+        SELECT * FROM (
+            SELECT organization_id, category, sum(delta) AS item_count, sum(delta * quantity) AS total_quantity,
+                   sum(delta * quantity * COALESCE(price, 0)) AS total_value,
+                   COALESCE(sum(delta) FILTER (WHERE status = 'low_stock'), 0) AS low_stock_count,
+                   COALESCE(sum(delta) FILTER (WHERE status = 'out_of_stock'), 0) AS out_of_stock_count
+            FROM (%s) changes
+            WHERE organization_id IS NOT NULL
+            GROUP BY organization_id, category
+        ) d
+        -- Rows an update left as they were cancel out
+        WHERE (item_count, total_quantity, total_value, low_stock_count, out_of_stock_count) <> (0, 0, 0, 0, 0)
+        -- Lock the counter rows in key order, so concurrent statements queue instead of deadlocking
+        ORDER BY organization_id, category
+        ON CONFLICT (organization_id, category) DO UPDATE SET
+            item_count = s.item_count + EXCLUDED.item_count,
+            total_quantity = s.total_quantity + EXCLUDED.total_quantity,
+            total_value = s.total_value + EXCLUDED.total_value,
+            low_stock_count = s.low_stock_count + EXCLUDED.low_stock_count,
+            out_of_stock_count = s.out_of_stock_count + EXCLUDED.out_of_stock_count
+    $sql$, changes);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER refresh_inventory_category_stats_insert AFTER INSERT ON inventory_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_inventory_category_stats();
+CREATE TRIGGER refresh_inventory_category_stats_update AFTER UPDATE ON inventory_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_inventory_category_stats();
+CREATE TRIGGER refresh_inventory_category_stats_delete AFTER DELETE ON inventory_items
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_inventory_category_stats();
+
+-- Count the items that existed before the triggers
+INSERT INTO inventory_category_stats (organization_id, category, item_count, total_quantity, total_value,
+                                      low_stock_count, out_of_stock_count)
+SELECT organization_id, category, count(*), sum(quantity), sum(quantity * COALESCE(price, 0)),
+       count(*) FILTER (WHERE status = 'low_stock'), count(*) FILTER (WHERE status = 'out_of_stock')
+FROM inventory_items
+WHERE organization_id IS NOT NULL
+GROUP BY organization_id, category;
+
+-- An organization's dashboard: one row per stocked category (from inventory_category_stats)
+-- with the organization-wide counts on every row. The expiry counts come from
+-- inventory_expiry_counts and the rest are counts on the (organization_id, status) indexes.
+-- An organization without items still returns one row, with a NULL category, for the counts.
+CREATE OR REPLACE FUNCTION inventory_dashboard(
+    p_organization_id UUID,
+    p_today DATE,
+    p_days_threshold INTEGER DEFAULT 30
+)
+RETURNS TABLE (
+    expired_items BIGINT, expiring_soon_items BIGINT, suppliers_count BIGINT, active_bids BIGINT,
+    equipment_operational BIGINT, category VARCHAR, item_count INTEGER, total_quantity BIGINT,
+    total_value NUMERIC, low_stock_count INTEGER, out_of_stock_count INTEGER
+) AS $$
+    WITH counts AS (
+        SELECT e.expired_count AS expired_items, e.expiring_soon_count AS expiring_soon_items,
+               (SELECT count(*) FROM suppliers s
+                WHERE s.organization_id = p_organization_id AND s.status = 'active') AS suppliers_count,
+               (SELECT count(*) FROM bid_requests b
+                WHERE b.organization_id = p_organization_id AND b.status = 'active') AS active_bids,
+               (SELECT count(*) FROM equipment q
+                WHERE q.organization_id = p_organization_id AND q.status = 'operational') AS equipment_operational
+        -- An empty page of the expiry report is its counts alone
+        FROM inventory_expiry(p_organization_id, p_today, p_days_threshold, NULL, NULL, NULL, 0) e
+    )
+    SELECT c.*, s.category, s.item_count, s.total_quantity, s.total_value, s.low_stock_count, s.out_of_stock_count
+    FROM counts c
+    LEFT JOIN inventory_category_stats s ON s.organization_id = p_organization_id AND s.item_count > 0
+    ORDER BY s.category;
+$$ LANGUAGE sql STABLE;
+
 -- =====================================================
 -- ROW LEVEL SECURITY POLICIES (Optional - can be enabled later)
 -- =====================================================
@@ -169,9 +169,18 @@ CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
 CREATE INDEX IF NOT EXISTS idx_user_sessions_user_id ON user_sessions(user_id);
 CREATE INDEX IF NOT EXISTS idx_user_sessions_token_hash ON user_sessions(token_hash);
-CREATE INDEX IF NOT EXISTS idx_inventory_items_organization_id ON inventory_items(organization_id);
-CREATE INDEX IF NOT EXISTS idx_suppliers_organization_id ON suppliers(organization_id);
-CREATE INDEX IF NOT EXISTS idx_equipment_organization_id ON equipment(organization_id);
+-- Tenant-scoped reads: organization_id leads, then the API's filters and sort orders
+CREATE INDEX IF NOT EXISTS idx_inventory_items_org_name_id ON inventory_items(organization_id, name, id);
+CREATE INDEX IF NOT EXISTS idx_inventory_items_org_category_status ON inventory_items(organization_id, category, status);
+CREATE INDEX IF NOT EXISTS idx_inventory_items_org_status ON inventory_items(organization_id, status);
+CREATE INDEX IF NOT EXISTS idx_inventory_items_org_expiry_id ON inventory_items(organization_id, expiry_date, id);
+DROP INDEX IF EXISTS idx_inventory_items_expiry;
+CREATE INDEX IF NOT EXISTS idx_suppliers_org_name ON suppliers(organization_id, name);
+CREATE INDEX IF NOT EXISTS idx_equipment_org_name_id ON equipment(organization_id, name, id);
+CREATE INDEX IF NOT EXISTS idx_equipment_org_status ON equipment(organization_id, status);
+CREATE INDEX IF NOT EXISTS idx_bid_requests_org_created_id ON bid_requests(organization_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_bid_requests_org_status ON bid_requests(organization_id, status);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_org_created_id ON inventory_transactions(organization_id, created_at, id);
 
 -- 10. Create updated_at trigger for new tables
 CREATE TRIGGER update_organizations_updated_at 
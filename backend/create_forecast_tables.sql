@@ -63,6 +63,58 @@ CREATE INDEX IF NOT EXISTS idx_forecast_items_forecast_id ON forecast_items(fore
 CREATE INDEX IF NOT EXISTS idx_forecast_insights_forecast_id ON forecast_insights(forecast_id);
 CREATE INDEX IF NOT EXISTS idx_forecast_charts_forecast_id ON forecast_charts(forecast_id);
 
+-- 5b. Precomputed forecast document, returned as-is on cache hits
+ALTER TABLE forecast_data ADD COLUMN IF NOT EXISTS snapshot JSONB;
+
+-- 5b2. Which path produced a forecast, and a digest of the inventory it was generated from
+-- (the nightly scheduler carries a forecast over to the next day when the digest is unchanged)
+ALTER TABLE forecast_data ADD COLUMN IF NOT EXISTS generated_by VARCHAR(20) DEFAULT 'request'; -- 'request', 'scheduler', 'carry_over'
+ALTER TABLE forecast_data ADD COLUMN IF NOT EXISTS inventory_fingerprint VARCHAR(64);
+
+-- 5c. Return the latest forecast document for a day in a single call
+-- Uses the stored snapshot when present, otherwise assembles it from the child tables
+CREATE OR REPLACE FUNCTION get_forecast_document(
+    p_organization_id UUID,
+    p_forecast_date DATE,
+    p_forecast_period VARCHAR,
+    p_category_filter VARCHAR DEFAULT NULL
+)
+RETURNS JSONB AS $$
+    SELECT COALESCE(
+        fd.snapshot,
+        jsonb_build_object(
+            'forecasts', COALESCE((
+                SELECT jsonb_agg(to_jsonb(fi) ORDER BY fi.created_at, fi.id)
+                FROM forecast_items fi WHERE fi.forecast_id = fd.id
+            ), '[]'::jsonb),
+            'insights', COALESCE((
+                -- Most urgent first, as PRIORITY_RANK orders documents built in Python
+                SELECT jsonb_agg(to_jsonb(fin) ORDER BY
+                    CASE fin.priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 WHEN 'low' THEN 2 ELSE 1 END,
+                    fin.created_at)
+                FROM forecast_insights fin WHERE fin.forecast_id = fd.id
+            ), '[]'::jsonb),
+            'chart_data', COALESCE((
+                SELECT jsonb_object_agg(fc.chart_type,
+                    -- Older rows stored the chart as a JSON-encoded string
+                    CASE WHEN jsonb_typeof(fc.chart_data) = 'string'
+                         THEN (fc.chart_data #>> '{}')::jsonb ELSE fc.chart_data END)
+                FROM forecast_charts fc WHERE fc.forecast_id = fd.id
+            ), '{}'::jsonb),
+            'overall_accuracy', COALESCE(fd.overall_accuracy, 0)::float8,
+            'total_items_forecasted', fd.total_items_forecasted,
+            'source', 'database'
+        )
+    )
+    FROM forecast_data fd
+    WHERE fd.organization_id = p_organization_id
+      AND fd.forecast_date = p_forecast_date
+      AND fd.forecast_period = p_forecast_period
+      AND fd.category_filter IS NOT DISTINCT FROM p_category_filter
+    ORDER BY fd.created_at DESC
+    LIMIT 1;
+$$ LANGUAGE sql STABLE;
+
 -- 6. Create updated_at trigger function if not exists
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
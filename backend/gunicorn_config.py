@@ -1,12 +1,20 @@
 # Gunicorn configuration for production deployment
 import multiprocessing
+import os
 
 # Server socket
 bind = "0.0.0.0:10000"  # Render uses port 10000
 backlog = 2048
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1
+# Each worker owns its own Postgres pool (PG_POOL_MAX_SIZE connections), so the
+# worker count is capped to keep workers * pool size under the database limit,
+# leaving DB_RESERVED_CONNECTIONS for migrations, admin sessions and PostgREST.
+cpu_workers = multiprocessing.cpu_count() * 2 + 1
+pg_pool_max_size = int(os.getenv("PG_POOL_MAX_SIZE", "10"))
+db_available_connections = int(os.getenv("DB_MAX_CONNECTIONS", "60")) - int(os.getenv("DB_RESERVED_CONNECTIONS", "10"))
+db_bound_workers = max(1, db_available_connections // pg_pool_max_size)
+workers = int(os.getenv("WEB_CONCURRENCY", min(cpu_workers, db_bound_workers)))
 worker_class = "uvicorn.workers.UvicornWorker"
 worker_connections = 1000
 max_requests = 1000
@@ -36,6 +44,10 @@ certfile = None
 # Server hooks
 def on_starting(server):
     server.log.info("Starting MedInventory API server")
+    server.log.info(
+        "Workers: %s (cpu bound %s, db bound %s at %s connections per worker)",
+        workers, cpu_workers, db_bound_workers, pg_pool_max_size
+    )
 
 def on_reload(server):
     server.log.info("Reloading MedInventory API server")
@@ -195,6 +195,42 @@ CREATE TABLE IF NOT EXISTS ai_agent_logs (
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
+-- ========================
+-- BACKGROUND JOBS TABLE
+-- ========================
+
+-- Job queue shared by the API (enqueue) and worker.py processes (claim with FOR UPDATE SKIP LOCKED)
+CREATE TABLE IF NOT EXISTS background_jobs (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    job_type VARCHAR(100) NOT NULL, -- 'forecast.regenerate', 'bidding.email_suppliers', ...
+    payload JSONB NOT NULL DEFAULT '{}',
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')),
+    priority INTEGER NOT NULL DEFAULT 0, -- higher runs first
+    idempotency_key VARCHAR(255),
+    organization_id UUID,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    run_after TIMESTAMPTZ NOT NULL DEFAULT NOW(), -- retry backoff / delayed jobs
+    locked_by VARCHAR(255),
+    locked_until TIMESTAMPTZ, -- worker lease; expired leases are re-queued
+    progress JSONB, -- reported by the handler while it runs (e.g. rows imported so far)
+    result JSONB,
+    last_error TEXT,
+    created_at TIMESTAMPTZ DEFAULT NOW(),
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ
+);
+
+-- Inventory import uploads waiting for their inventory.import job (workers need not share the API's disk)
+CREATE TABLE IF NOT EXISTS import_uploads (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    organization_id UUID NOT NULL,
+    file_type VARCHAR(10) NOT NULL, -- 'csv' or 'xlsx'
+    content BYTEA NOT NULL, -- at most MAX_FILE_SIZE; removed when the job takes it
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
 -- ========================
 -- INDEXES FOR PERFORMANCE
 -- ========================
@@ -204,13 +240,18 @@ CREATE INDEX IF NOT EXISTS idx_inventory_items_category ON inventory_items(categ
 CREATE INDEX IF NOT EXISTS idx_inventory_items_status ON inventory_items(status);
 CREATE INDEX IF NOT EXISTS idx_inventory_items_supplier ON inventory_items(supplier_id);
 CREATE INDEX IF NOT EXISTS idx_inventory_items_expiry ON inventory_items(expiry_date);
+-- Keyset pagination: (sort key, id) so a cursor seeks straight to the next page
+CREATE INDEX IF NOT EXISTS idx_inventory_items_name_id ON inventory_items(name, id);
 CREATE INDEX IF NOT EXISTS idx_inventory_transactions_item ON inventory_transactions(item_id);
 CREATE INDEX IF NOT EXISTS idx_inventory_transactions_date ON inventory_transactions(created_at);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_created_id ON inventory_transactions(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_inventory_transactions_item_created_id ON inventory_transactions(item_id, created_at, id);
 
 -- Bidding indexes
 CREATE INDEX IF NOT EXISTS idx_bid_requests_status ON bid_requests(status);
 CREATE INDEX IF NOT EXISTS idx_bid_requests_category ON bid_requests(category);
 CREATE INDEX IF NOT EXISTS idx_bid_requests_deadline ON bid_requests(deadline);
+CREATE INDEX IF NOT EXISTS idx_bid_requests_created_id ON bid_requests(created_at, id);
 CREATE INDEX IF NOT EXISTS idx_bids_request ON bids(request_id);
 CREATE INDEX IF NOT EXISTS idx_bids_supplier ON bids(supplier_id);
 CREATE INDEX IF NOT EXISTS idx_bids_status ON bids(status);
@@ -218,6 +259,7 @@ CREATE INDEX IF NOT EXISTS idx_bids_status ON bids(status);
 -- Equipment indexes
 CREATE INDEX IF NOT EXISTS idx_equipment_status ON equipment(status);
 CREATE INDEX IF NOT EXISTS idx_equipment_type ON equipment(type);
+CREATE INDEX IF NOT EXISTS idx_equipment_name_id ON equipment(name, id);
 CREATE INDEX IF NOT EXISTS idx_equipment_next_maintenance ON equipment(next_maintenance);
 CREATE INDEX IF NOT EXISTS idx_maintenance_tasks_equipment ON maintenance_tasks(equipment_id);
 CREATE INDEX IF NOT EXISTS idx_maintenance_tasks_status ON maintenance_tasks(status);
@@ -228,6 +270,13 @@ CREATE INDEX IF NOT EXISTS idx_ai_logs_agent_type ON ai_agent_logs(agent_type);
 CREATE INDEX IF NOT EXISTS idx_ai_logs_reference ON ai_agent_logs(reference_type, reference_id);
 CREATE INDEX IF NOT EXISTS idx_ai_logs_created ON ai_agent_logs(created_at);
 
+-- Background job indexes
+CREATE INDEX IF NOT EXISTS idx_background_jobs_dequeue ON background_jobs(priority DESC, run_after, created_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_background_jobs_org ON background_jobs(organization_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_background_jobs_lease ON background_jobs(locked_until) WHERE status = 'running';
+-- At most one live job per idempotency key
+CREATE UNIQUE INDEX IF NOT EXISTS idx_background_jobs_idempotency ON background_jobs(idempotency_key) WHERE status IN ('queued', 'running');
+
 -- ========================
 -- SAMPLE DATA INSERTION
 -- ========================
@@ -286,6 +335,126 @@ CREATE TRIGGER update_bid_requests_updated_at BEFORE UPDATE ON bid_requests FOR
 CREATE TRIGGER update_bids_updated_at BEFORE UPDATE ON bids FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_equipment_updated_at BEFORE UPDATE ON equipment FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
 CREATE TRIGGER update_maintenance_tasks_updated_at BEFORE UPDATE ON maintenance_tasks FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+CREATE TRIGGER update_background_jobs_updated_at BEFORE UPDATE ON background_jobs FOR EACH ROW EXECUTE FUNCTION update_updated_at_column();
+
+-- ========================
+-- INVENTORY SEARCH
+-- ========================
+
+-- Full-text search over item name, category, batch number and supplier name. The vectors live
+-- in a side table kept current by triggers, so SELECT * on inventory_items is unchanged. The
+-- 'simple' configuration leaves drug names and batch numbers unstemmed; searches are word-prefix
+-- queries ('amox:* & 250:*'), ranked with name matches first.
+CREATE TABLE IF NOT EXISTS inventory_item_search (
+    item_id UUID PRIMARY KEY REFERENCES inventory_items(id) ON DELETE CASCADE,
+    organization_id UUID, -- copied from the item so searches stay within one tenant
+    name_vector TSVECTOR NOT NULL, -- name words alone, for typeahead's name-first pass
+    search_vector TSVECTOR NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_inventory_item_search_name ON inventory_item_search USING GIN (name_vector);
+CREATE INDEX IF NOT EXISTS idx_inventory_item_search_vector ON inventory_item_search USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_inventory_item_search_org ON inventory_item_search(organization_id);
+
+-- Words are runs of letters and digits ('BATCH-00042' → batch, 00042; '10mg/ml' → 10mg, ml),
+-- the same split app/search.py applies to search terms
+CREATE OR REPLACE FUNCTION search_words(p_text TEXT)
+RETURNS TSVECTOR AS $$
+    SELECT to_tsvector('simple', regexp_replace(coalesce(p_text, ''), '[^[:alnum:]]+', ' ', 'g'));
+$$ language 'sql' IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION inventory_search_vector(p_name TEXT, p_category TEXT, p_batch_number TEXT, p_supplier_id UUID)
+RETURNS TSVECTOR AS $$
+    SELECT setweight(search_words(p_name), 'A')
+        || setweight(search_words(p_category), 'B')
+        || setweight(search_words(p_batch_number), 'C')
+        || setweight(search_words((SELECT name FROM suppliers WHERE id = p_supplier_id)), 'D');
+$$ language 'sql' STABLE;
+
+-- organization_id is read through to_jsonb() because the multi-tenancy migration adds it later.
+-- Statement-level, so a bulk insert or an import indexes all its rows in one pass.
+CREATE OR REPLACE FUNCTION refresh_inventory_item_search()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO inventory_item_search (item_id, organization_id, name_vector, search_vector)
+        SELECT n.id, (to_jsonb(n)->>'organization_id')::uuid, search_words(n.name),
+               inventory_search_vector(n.name, n.category, n.batch_number, n.supplier_id)
+        FROM new_rows n;
+    ELSE
+        -- Quantity/status updates leave the index alone. EXCEPT rather than a join: transition
+        -- tables have no statistics, and a nested loop over a bulk update's rows is quadratic.
+        INSERT INTO inventory_item_search (item_id, organization_id, name_vector, search_vector)
+        SELECT c.id, c.organization_id, search_words(c.name),
+               inventory_search_vector(c.name, c.category, c.batch_number, c.supplier_id)
+        FROM (
+            SELECT id, name, category, batch_number, supplier_id, (to_jsonb(n)->>'organization_id')::uuid AS organization_id
+            FROM new_rows n
+            EXCEPT
+            SELECT id, name, category, batch_number, supplier_id, (to_jsonb(o)->>'organization_id')::uuid
+            FROM old_rows o
+        ) c
+        ON CONFLICT (item_id) DO UPDATE
+        SET organization_id = EXCLUDED.organization_id,
+            name_vector = EXCLUDED.name_vector,
+            search_vector = EXCLUDED.search_vector;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- A renamed supplier re-indexes its items
+CREATE OR REPLACE FUNCTION refresh_supplier_item_search()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE inventory_item_search s
+    SET search_vector = inventory_search_vector(i.name, i.category, i.batch_number, i.supplier_id)
+    FROM inventory_items i
+    WHERE i.id = s.item_id AND i.supplier_id = NEW.id;
+    RETURN NEW;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS refresh_inventory_item_search ON inventory_items; -- the former row-level trigger
+CREATE TRIGGER refresh_inventory_item_search_insert AFTER INSERT ON inventory_items
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_inventory_item_search();
+CREATE TRIGGER refresh_inventory_item_search_update AFTER UPDATE ON inventory_items
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION refresh_inventory_item_search();
+CREATE TRIGGER refresh_supplier_item_search AFTER UPDATE OF name ON suppliers FOR EACH ROW EXECUTE FUNCTION refresh_supplier_item_search();
+
+-- Index the rows that existed before the triggers
+INSERT INTO inventory_item_search (item_id, organization_id, name_vector, search_vector)
+SELECT id, (to_jsonb(i)->>'organization_id')::uuid, search_words(name),
+       inventory_search_vector(name, category, batch_number, supplier_id)
+FROM inventory_items i
+ON CONFLICT (item_id) DO NOTHING;
+
+-- Ranked top-k matches for typeahead (called directly or as a PostgREST RPC). p_query is a
+-- prefix tsquery. Short prefixes can match a large share of a tenant's items, so only a bounded
+-- set of candidates is ranked: up to p_candidates name matches plus up to p_candidates
+-- matches on any field. Name matches always reach the ranking that way.
+CREATE OR REPLACE FUNCTION search_inventory_items(
+    p_organization_id UUID, p_query TEXT, p_limit INTEGER DEFAULT 10, p_candidates INTEGER DEFAULT 200
+)
+RETURNS TABLE (id UUID, name VARCHAR, category VARCHAR, batch_number VARCHAR, quantity INTEGER, unit VARCHAR, status VARCHAR, rank REAL) AS $$
+    WITH candidates AS (
+        (SELECT s.item_id, s.search_vector FROM inventory_item_search s
+         WHERE s.organization_id = p_organization_id AND s.name_vector @@ to_tsquery('simple', p_query)
+         LIMIT p_candidates)
+        UNION
+        (SELECT s.item_id, s.search_vector FROM inventory_item_search s
+         WHERE s.organization_id = p_organization_id AND s.search_vector @@ to_tsquery('simple', p_query)
+         LIMIT p_candidates)
+    )
+    SELECT i.id, i.name, i.category, i.batch_number, i.quantity, i.unit, i.status,
+           ts_rank(c.search_vector, to_tsquery('simple', p_query)) AS rank
+    FROM candidates c
+    JOIN inventory_items i ON i.id = c.item_id
+    ORDER BY rank DESC, i.name, i.id
+    LIMIT p_limit;
+$$ language 'sql' STABLE;
 
 -- Success message
 SELECT 'MedInventory database schema created successfully!' as status;
\ No newline at end of file
@@ -251,7 +251,7 @@ async def add_sample_inventory_data():
             
             # Insert into database
             try:
-                result = db.client.table('inventory_items').insert(item_data).execute()
+                result = await db.client.table('inventory_items').insert(item_data).execute()
                 print(f"✅ Added: {item_data['name']} (Expires: {item_data['expiry_date']})")
             except Exception as e:
                 print(f"❌ Failed to add {item_data['name']}: {e}")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+HTTP load benchmark for the MedInventory API
+Measures requests per second and latency percentiles under concurrent load
+
+Per-worker throughput against a local Postgres:
+    supabase start                                   # local Postgres + PostgREST on :54321
+    export SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_ROLE_KEY=...
+    uvicorn app.main:app --port 8000 --workers 1
+    python3 scripts/benchmark_http_load.py --user-id <uuid> --org-id <uuid> --concurrency 64
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def mint_access_token(user_id: str, organization_id: str, role: str = "hospital_admin") -> str:
+    """Create a signed access token for an existing user (uses the server's SECRET_KEY)"""
+    from app.models.auth import UserRole
+    from app.services.auth_service import auth_service
+
+    return auth_service.create_access_token(
+        user_id=user_id,
+        organization_id=organization_id,
+        role=UserRole(role),
+    )
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_load(
+    base_url: str,
+    path: str,
+    concurrency: int,
+    duration: float,
+    headers: Dict[str, str],
+    method: str = "GET",
+    json_body: Optional[dict] = None,
+) -> Dict[str, float]:
+    """Fire requests from `concurrency` workers for `duration` seconds"""
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60.0) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=json_body)
+                    if response.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "mean_ms": statistics.fmean(latencies) if latencies else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+    }
+
+
+def print_report(label: str, result: Dict[str, float], workers: int = 1):
+    """Print a benchmark result"""
+    print(f"📊 {label}")
+    print(f"   Requests:        {result['requests']} ({result['errors']} errors)")
+    print(f"   Throughput:      {result['rps']:.1f} req/s ({result['rps'] / workers:.1f} req/s per worker)")
+    print(f"   Latency mean:    {result['mean_ms']:.1f} ms")
+    print(f"   Latency p50/95/99: {result['p50_ms']:.1f} / {result['p95_ms']:.1f} / {result['p99_ms']:.1f} ms")
+
+
+async def main():
+    """Main function to run the benchmark"""
+    parser = argparse.ArgumentParser(description="MedInventory HTTP load benchmark")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--path", default="/api/inventory/items?limit=20", help="Endpoint to benchmark")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per concurrency level")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker count, for per-worker figures")
+    parser.add_argument("--token", help="Bearer token (otherwise minted from --user-id/--org-id)")
+    parser.add_argument("--user-id")
+    parser.add_argument("--org-id")
+    args = parser.parse_args()
+
+    print("🚀 MedInventory HTTP Load Benchmark")
+    print("=" * 50)
+
+    token = args.token
+    if not token and args.user_id and args.org_id:
+        token = mint_access_token(args.user_id, args.org_id)
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+
+    for concurrency in args.concurrency:
+        result = await run_load(args.url, args.path, concurrency, args.duration, headers, args.method)
+        print_report(f"{args.method} {args.path} @ concurrency {concurrency}", result, args.workers)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark the statistical forecasting engine on synthetic transaction history
+Generates N items x D days of usage transactions (a mix of regular and intermittent demand)
+and times each stage: building the demand matrix, forecasting every item, and serializing.
+
+    python3 scripts/benchmark_statistical_forecast.py --items 10000 --days 730
+
+With DATABASE_URL set and --org-id, also times the full path against an organization's real data:
+    python3 scripts/benchmark_statistical_forecast.py --org-id <uuid>
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.statistical_forecast import demand_matrix, statistical_forecast_engine
+
+
+def synthetic_history(
+    n_items: int, n_days: int, intermittent_share: float, seed: int
+) -> Tuple[List[Dict], pd.DataFrame]:
+    """Items plus one usage transaction row per item and day with demand"""
+    rng = np.random.default_rng(seed)
+    end = date.today()
+    intermittent = rng.random(n_items) < intermittent_share
+    rate = rng.lognormal(mean=2.0, sigma=1.0, size=n_items)
+
+    # Yearly seasonality with a per-item phase, plus weekly dips
+    day = np.arange(n_days)
+    phase = rng.uniform(0, 2 * np.pi, size=(n_items, 1))
+    seasonal = 1 + 0.3 * np.sin(2 * np.pi * day / 365 + phase)
+    weekly = np.where((day + end.weekday()) % 7 >= 5, 0.6, 1.0)
+
+    regular = rng.poisson(rate[:, None] * seasonal * weekly)
+    occurs = rng.random((n_items, n_days)) < rng.uniform(0.05, 0.3, size=(n_items, 1))
+    sporadic = occurs * (1 + rng.poisson(rate[:, None]))
+    demand = np.where(intermittent[:, None], sporadic, regular)
+
+    item_ids = [f"00000000-0000-4000-8000-{i:012d}" for i in range(n_items)]
+    rows, columns = np.nonzero(demand)
+    start = pd.Timestamp(end - timedelta(days=n_days - 1), tz="UTC")
+    transactions = pd.DataFrame({
+        "item_id": np.asarray(item_ids)[rows],
+        "day": start + pd.to_timedelta(columns, unit="D") + pd.to_timedelta(rng.integers(0, 86400, rows.size), unit="s"),
+        "quantity": demand[rows, columns],
+    })
+
+    stock = (rate * rng.uniform(3, 40, size=n_items)).astype(int)
+    items = [
+        {"id": item_ids[i], "name": f"Benchmark Item {i:05d}", "category": f"Category {i % 12}",
+         "quantity": int(stock[i]), "reorder_level": 0}
+        for i in range(n_items)
+    ]
+    return items, transactions
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, (time.perf_counter() - started) * 1000
+
+
+async def benchmark_database(org_id: str, period: str, runs: int):
+    """Time the ForecastService statistical path (pooled Postgres when DATABASE_URL is set)"""
+    from app.pg_pool import pg_pool
+    from app.services.forecast_service import forecast_service
+
+    await pg_pool.connect()
+    try:
+        latencies = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            forecast_json = await forecast_service._generate_statistical_forecast(org_id, period, None)
+            latencies.append((time.perf_counter() - started) * 1000)
+        items = len(json.loads(forecast_json)["forecasts"]) if forecast_json else 0
+        print(f"\n🗄️  Database path for {org_id}: {items} items, "
+              f"median {statistics.median(latencies):.0f}ms over {runs} runs")
+    finally:
+        await pg_pool.close()
+
+
+def main():
+    """Main function to run the benchmark"""
+    parser = argparse.ArgumentParser(description="Statistical forecast engine benchmark")
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--intermittent-share", type=float, default=0.4)
+    parser.add_argument("--period", default="30d")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--org-id", help="Also benchmark the database path for this organization")
+    args = parser.parse_args()
+
+    print("🚀 Statistical Forecast Benchmark")
+    print("=" * 50)
+    items, transactions = synthetic_history(args.items, args.days, args.intermittent_share, args.seed)
+    print(f"📦 {len(items)} items, {len(transactions):,} transactions over {args.days} days")
+
+    stages = {"demand matrix": [], "forecast": [], "json": []}
+    item_ids = [item["id"] for item in items]
+    for _ in range(args.runs):
+        demand, elapsed = timed(demand_matrix, item_ids, transactions, date.today(), args.days)
+        stages["demand matrix"].append(elapsed)
+        # Smoothing, safety stock and reorder points plus the per-item documents
+        forecast, elapsed = timed(statistical_forecast_engine.build_forecast, items, demand, args.period)
+        stages["forecast"].append(elapsed)
+        _, elapsed = timed(json.dumps, forecast)
+        stages["json"].append(elapsed)
+
+    print(f"\n{'stage':<15}{'median ms':>12}{'min ms':>10}")
+    for stage, latencies in stages.items():
+        print(f"{stage:<15}{statistics.median(latencies):>12.1f}{min(latencies):>10.1f}")
+    total = statistics.median([sum(run) for run in zip(*stages.values())])
+    print(f"{'total':<15}{total:>12.1f}")
+
+    methods = pd.Series([row["method"] for row in forecast["forecasts"]]).value_counts().to_dict()
+    risks = pd.Series([row["risk_level"] for row in forecast["forecasts"]]).value_counts().to_dict()
+    print(f"\n📈 Backtest accuracy {forecast['overall_accuracy']}%, methods {methods}, risk {risks}")
+
+    if args.org_id:
+        asyncio.run(benchmark_database(args.org_id, args.period, args.runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Local mock of the Together AI chat completions API
+Lets the AI integration (test_ai.py, forecasts, bid emails) run without network access or API keys
+
+    python3 scripts/mock_completion_server.py --port 8001 --latency 0.2
+    TOGETHER_BASE_URL=http://127.0.0.1:8001 python3 test_ai.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Add the backend directory to the path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+app = FastAPI(title="Mock Completion Server")
+app.state.latency = 0.0
+app.state.error_rate = 0.0
+app.state.error_status = 503
+app.state.chunk_size = 16
+app.state.chunk_delay = 0.0
+app.state.requests = 0
+
+
+def mock_forecast() -> Dict[str, Any]:
+    """Forecast JSON in the shape generate_demand_forecast asks for"""
+    from app.services.forecast_service import forecast_service
+
+    forecast = forecast_service._generate_fallback_forecast()
+    forecast.pop("source", None)
+    return forecast
+
+
+def mock_parsed_response() -> Dict[str, Any]:
+    return {
+        "supplier_name": "MedSupply Co",
+        "quoted_price": 4.75,
+        "quantity_available": 1000,
+        "delivery_time": "7 days",
+        "terms": "Net 30",
+        "notes": "Mock response",
+    }
+
+
+def completion_content(messages: list) -> str:
+    """Pick a canned answer from what the prompt asks for"""
+    prompt = " ".join(message.get("content", "") for message in messages)
+    if "demand forecast" in prompt:
+        return json.dumps(mock_forecast())
+    if "Parse this supplier email" in prompt:
+        return json.dumps(mock_parsed_response())
+    if "health check" in prompt:
+        return "OK"
+    return "Dear Supplier,\n\nPlease send us your best quotation for the items listed.\n\nBest regards,\nMedInventory"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    app.state.requests += 1
+    payload = await request.json()
+    if app.state.latency:
+        await asyncio.sleep(app.state.latency)
+    if random.random() < app.state.error_rate:
+        return JSONResponse(status_code=app.state.error_status, content={"error": {"message": "mock error"}})
+
+    content = completion_content(payload.get("messages", []))
+    if payload.get("stream"):
+        return StreamingResponse(stream_chunks(payload, content), media_type="text/event-stream")
+    return {
+        "id": f"mock-{app.state.requests}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": payload.get("model", "mock"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(json.dumps(payload)) // 4, "completion_tokens": len(content) // 4},
+    }
+
+
+async def stream_chunks(payload: Dict[str, Any], content: str):
+    """Server-sent events in the OpenAI streaming format, a few characters per chunk"""
+    base = {
+        "id": f"mock-{app.state.requests}",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": payload.get("model", "mock"),
+    }
+    for start in range(0, len(content), app.state.chunk_size):
+        delta = {"content": content[start:start + app.state.chunk_size]}
+        yield f"data: {json.dumps({**base, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': None}]})}\n\n"
+        if app.state.chunk_delay:
+            await asyncio.sleep(app.state.chunk_delay)
+    usage = {"prompt_tokens": len(json.dumps(payload)) // 4, "completion_tokens": len(content) // 4}
+    usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+    final = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+    yield f"data: {json.dumps(final)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def main():
+    """Main function to run the mock server"""
+    parser = argparse.ArgumentParser(description="Mock Together AI completion server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before responding")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="Status code for failed requests")
+    parser.add_argument("--chunk-size", type=int, default=16, help="Characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="Seconds between streamed chunks")
+    args = parser.parse_args()
+
+    app.state.latency = args.latency
+    app.state.error_rate = args.error_rate
+    app.state.error_status = args.error_status
+    app.state.chunk_size = args.chunk_size
+    app.state.chunk_delay = args.chunk_delay
+
+    print(f"🤖 Mock completion server on http://{args.host}:{args.port}")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,18 @@
 #!/usr/bin/env python3
 """
 Test script for AI integration
+
+Run against the local mock instead of Together AI:
+    python3 scripts/mock_completion_server.py --port 8001 &
+    TOGETHER_BASE_URL=http://127.0.0.1:8001 python3 test_ai.py
+
+Add --chunk-delay 0.01 to the mock server to see items arrive before the forecast is complete.
 """
 
 import asyncio
 import sys
 import os
+import time
 
 # Add the app directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
@@ -21,7 +28,7 @@ async def test_ai_service():
     print("1. Testing AI Health Check...")
     try:
         test_prompt = "Hello, this is a health check. Please respond with 'OK' if you're working."
-        response = await ai_service._call_openrouter(test_prompt)
+        response = await ai_service._call_together_ai(test_prompt)
         if response:
             print(f"✅ AI Service Working: {response[:100]}...")
         else:
@@ -58,8 +65,25 @@ async def test_ai_service():
     except Exception as e:
         print(f"❌ Forecast Error: {e}")
     
-    # Test 3: Bid request email generation
-    print("\n3. Testing Bid Request Email Generation...")
+    # Test 3: Streamed demand forecast
+    print("\n3. Testing Streamed Demand Forecast...")
+    try:
+        started = time.perf_counter()
+        first_item = None
+        item_count = 0
+        async for event in ai_service.stream_demand_forecast(inventory_data, force_regenerate=True):
+            if event["type"] == "item":
+                item_count += 1
+                first_item = first_item or time.perf_counter() - started
+        print(f"✅ Forecast Streamed: {item_count} items")
+        if first_item is not None:
+            print(f"   First item after {first_item:.2f}s, complete after {time.perf_counter() - started:.2f}s")
+        
+    except Exception as e:
+        print(f"❌ Streaming Error: {e}")
+    
+    # Test 4: Bid request email generation
+    print("\n4. Testing Bid Request Email Generation...")
     try:
         bid_request = {
             "title": "Medical Supply Procurement",
@@ -83,6 +107,12 @@ async def test_ai_service():
     except Exception as e:
         print(f"❌ Email Generation Error: {e}")
     
+    # Connection reuse and latency across the calls above
+    stats = ai_service.http_stats()
+    print(f"\n📊 {stats['calls']} calls, {stats['failed_calls']} failed, "
+          f"mean TTFB {stats['ttfb']['mean_ms']}ms, mean total {stats['total_latency']['mean_ms']}ms")
+    await ai_service.close()
+    
     print("\n" + "=" * 50)
     print("🎉 AI Service Testing Complete!")
 
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+MedInventory Background Job Worker
+Runs queued jobs (forecast regeneration, AI bidding agents) separately from the API processes.
+Also schedules the nightly forecast pre-computation (FORECAST_PRECOMPUTE_*).
+Needs JOB_QUEUE_BACKEND=postgres and DATABASE_URL; run as many workers as the load needs.
+
+    python worker.py [--concurrency 4] [--job-type forecast.regenerate ...] [--precompute-now]
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+import os
+
+# Add the app directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.config import settings
+from app.database import SupabaseClient
+from app.pg_pool import pg_pool
+from app.services.ai_service import ai_service
+from app.services.forecast_cache import forecast_cache
+from app.services.llm_cache import llm_cache
+from app.services.job_queue import job_queue
+from app.services.forecast_scheduler import forecast_scheduler
+from app.services import job_handlers  # noqa: F401 (registers job types)
+
+
+async def run_worker(concurrency: int, job_types, precompute_now: bool):
+    """Work the queue until SIGINT/SIGTERM, then let in-flight jobs' leases lapse and exit"""
+    await pg_pool.connect()
+    if not pg_pool.enabled:
+        print("❌ The worker needs DATABASE_URL: jobs are shared with the API through the background_jobs table")
+        return 1
+    await ai_service.startup()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    print(f"👷 MedInventory job worker {job_queue.worker_id} starting (concurrency={concurrency})")
+    job_queue.start(job_types=job_types, concurrency=concurrency)
+    if settings.FORECAST_PRECOMPUTE_ENABLED:
+        forecast_scheduler.start()
+    if precompute_now:
+        await forecast_scheduler.enqueue_run()
+    try:
+        await stop.wait()
+    finally:
+        print("🛑 Job worker shutting down...")
+        await forecast_scheduler.stop()
+        await job_queue.stop()
+        await forecast_cache.close()
+        await ai_service.close()
+        llm_cache.close()
+        await pg_pool.close()
+        await SupabaseClient.close()
+    return 0
+
+
+def main():
+    """Main function to run the worker"""
+    parser = argparse.ArgumentParser(description="MedInventory background job worker")
+    parser.add_argument("--concurrency", type=int, default=settings.JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--job-type", action="append", dest="job_types",
+                        help="Only run jobs of this type (repeatable; default all)")
+    parser.add_argument("--precompute-now", action="store_true",
+                        help="Queue today's forecast pre-computation immediately")
+    args = parser.parse_args()
+
+    if settings.JOB_QUEUE_BACKEND != "postgres":
+        print("❌ Set JOB_QUEUE_BACKEND=postgres to run a separate worker (the memory queue runs inside the API)")
+        sys.exit(1)
+
+    sys.exit(asyncio.run(run_worker(args.concurrency, args.job_types, args.precompute_now)))
+
+
+if __name__ == "__main__":
+    main()